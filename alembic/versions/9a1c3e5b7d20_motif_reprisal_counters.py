@@ -0,0 +1,46 @@
+"""motif reprisal counters
+
+Revision ID: 9a1c3e5b7d20
+Revises: 44f2a7ba7442
+Create Date: 2025-05-03 10:12:41.518204
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9a1c3e5b7d20"
+down_revision: Union[str, None] = "44f2a7ba7442"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "motif",
+        sa.Column("reprisal_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column("motif", sa.Column("last_reprised_at", sa.DateTime(), nullable=True))
+
+    # backfill the counters from existing reprisal history
+    op.execute(
+        """UPDATE motif SET
+        reprisal_count = (
+            SELECT COUNT(*) FROM reprisal WHERE reprisal.motif_uuid = motif.uuid
+        ),
+        last_reprised_at = (
+            SELECT MAX(created_at) FROM reprisal WHERE reprisal.motif_uuid = motif.uuid
+        );"""
+    )
+    op.create_index("ix_motif_reprisal_count", "motif", ["reprisal_count"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_motif_reprisal_count", table_name="motif")
+    with op.batch_alter_table("motif") as batch_op:
+        batch_op.drop_column("last_reprised_at")
+        batch_op.drop_column("reprisal_count")
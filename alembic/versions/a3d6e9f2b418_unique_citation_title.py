@@ -0,0 +1,53 @@
+"""unique_citation_title
+
+Revision ID: a3d6e9f2b418
+Revises: f4b9d3e1c852
+Create Date: 2025-06-09 09:14:37.218530
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a3d6e9f2b418"
+down_revision: Union[str, None] = "f4b9d3e1c852"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # fold duplicate titles into the oldest citation before they become unique
+    op.execute(
+        """
+        CREATE TEMPORARY TABLE citation_duplicate AS
+        SELECT citation.uuid AS uuid, original.uuid AS original_uuid
+        FROM citation
+        JOIN (
+            SELECT title, uuid, MIN(rowid) FROM citation GROUP BY title
+        ) AS original ON original.title = citation.title
+        WHERE citation.uuid != original.uuid
+        """
+    )
+    op.execute(
+        """
+        UPDATE motif SET citation_uuid = (
+            SELECT original_uuid FROM citation_duplicate
+            WHERE citation_duplicate.uuid = motif.citation_uuid
+        )
+        WHERE citation_uuid IN (SELECT uuid FROM citation_duplicate)
+        """
+    )
+    op.execute(
+        "DELETE FROM citation WHERE uuid IN (SELECT uuid FROM citation_duplicate)"
+    )
+    op.execute("DROP TABLE citation_duplicate")
+
+    op.drop_index("ix_citation_title", table_name="citation")
+    op.create_index("ix_citation_title", "citation", ["title"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_citation_title", table_name="citation")
+    op.create_index("ix_citation_title", "citation", ["title"])
@@ -0,0 +1,38 @@
+"""motif updated_at
+
+Revision ID: a4e7c1f9b362
+Revises: c8d4a2f7b193
+Create Date: 2025-06-17 09:41:27.604118
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a4e7c1f9b362"
+down_revision: Union[str, None] = "c8d4a2f7b193"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # left nullable, since NOT NULL would mean rebuilding motif, which drops the
+    # triggers on it
+    op.add_column("motif", sa.Column("updated_at", sa.DateTime(), nullable=True))
+
+    # backfill with the latest write we can still tell: creation or last reprisal
+    op.execute(
+        """UPDATE motif SET
+        updated_at = MAX(created_at, COALESCE(last_reprised_at, created_at));"""
+    )
+    op.create_index("ix_motif_updated_at", "motif", ["updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_motif_updated_at", table_name="motif")
+    # dropped in place, as rebuilding motif would break the triggers on it
+    op.execute("ALTER TABLE motif DROP COLUMN updated_at")
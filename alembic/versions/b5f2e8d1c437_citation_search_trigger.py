@@ -0,0 +1,47 @@
+"""citation search trigger
+
+Revision ID: b5f2e8d1c437
+Revises: a4e7c1f9b362
+Create Date: 2025-06-18 14:22:09.871346
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b5f2e8d1c437"
+down_revision: Union[str, None] = "a4e7c1f9b362"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_motif_citation_uuid", "motif", ["citation_uuid"])
+
+    # update each motif's search row through motif_search_update, which finds it by
+    # a match on motif_uuid, instead of comparing motif_uuid across the whole index
+    op.execute("DROP TRIGGER motif_search_citation_update")
+    op.execute(
+        """
+        CREATE TRIGGER motif_search_citation_update
+        AFTER UPDATE OF title ON citation BEGIN
+            UPDATE motif SET citation_uuid = citation_uuid WHERE citation_uuid = new.uuid;
+        END
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER motif_search_citation_update")
+    op.execute(
+        """
+        CREATE TRIGGER motif_search_citation_update
+        AFTER UPDATE OF title ON citation BEGIN
+            UPDATE motif_search SET citation = new.title
+            WHERE motif_uuid IN (SELECT uuid FROM motif WHERE citation_uuid = new.uuid);
+        END
+        """
+    )
+    op.drop_index("ix_motif_citation_uuid", table_name="motif")
@@ -0,0 +1,43 @@
+"""motif_schedule
+
+Revision ID: b7e2d4f61a93
+Revises: 9a1c3e5b7d20
+Create Date: 2025-05-10 14:31:07.204615
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e2d4f61a93"
+down_revision: Union[str, None] = "9a1c3e5b7d20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "motif_schedule",
+        sa.Column("motif_uuid", sa.String(length=36), nullable=False),
+        sa.Column("due_at", sa.DateTime(), nullable=False),
+        sa.Column("box", sa.Integer(), nullable=False),
+        sa.Column("repetitions", sa.Integer(), nullable=False),
+        sa.Column("interval_days", sa.Float(), nullable=False),
+        sa.Column("ease_factor", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["motif_uuid"],
+            ["motif.uuid"],
+        ),
+        sa.PrimaryKeyConstraint("motif_uuid"),
+    )
+    op.create_index("ix_motif_schedule_due_at", "motif_schedule", ["due_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_motif_schedule_due_at", table_name="motif_schedule")
+    op.drop_table("motif_schedule")
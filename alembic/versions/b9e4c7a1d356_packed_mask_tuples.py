@@ -0,0 +1,71 @@
+"""packed_mask_tuples
+
+Revision ID: b9e4c7a1d356
+Revises: a3d6e9f2b418
+Create Date: 2025-06-11 16:52:08.734912
+
+"""
+
+import json
+import struct
+from typing import Callable, Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import sqlite
+
+# revision identifiers, used by Alembic.
+revision: str = "b9e4c7a1d356"
+down_revision: Union[str, None] = "a3d6e9f2b418"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 10000
+
+
+def pack(mask_tuples: str) -> bytes:
+    indices = [index for pair in json.loads(mask_tuples) for index in pair]
+    return struct.pack(f"<{len(indices)}I", *indices)
+
+
+def unpack(mask_tuples: bytes) -> str:
+    indices = struct.unpack(f"<{len(mask_tuples) // 4}I", mask_tuples)
+    return json.dumps(
+        [list(pair) for pair in zip(indices[::2], indices[1::2], strict=True)]
+    )
+
+
+def convert(transform: Callable) -> None:
+    # rewrite the column in place a batch at a time; sqlite doesn't enforce its type
+    connection = op.get_bind()
+    last_uuid = ""
+    while rows := connection.execute(
+        sa.text(
+            "SELECT uuid, mask_tuples FROM cloze_deletion WHERE uuid > :last_uuid "
+            "ORDER BY uuid LIMIT :batch_size"
+        ),
+        {"last_uuid": last_uuid, "batch_size": BATCH_SIZE},
+    ).all():
+        connection.execute(
+            sa.text(
+                "UPDATE cloze_deletion SET mask_tuples = :mask_tuples WHERE uuid = :uuid"
+            ),
+            [{"uuid": uuid, "mask_tuples": transform(value)} for uuid, value in rows],
+        )
+        last_uuid = rows[-1].uuid
+
+
+def upgrade() -> None:
+    convert(pack)
+    with op.batch_alter_table("cloze_deletion") as batch_op:
+        batch_op.alter_column(
+            "mask_tuples", existing_type=sqlite.JSON(), type_=sa.LargeBinary()
+        )
+
+
+def downgrade() -> None:
+    convert(unpack)
+    with op.batch_alter_table("cloze_deletion") as batch_op:
+        batch_op.alter_column(
+            "mask_tuples", existing_type=sa.LargeBinary(), type_=sqlite.JSON()
+        )
@@ -0,0 +1,48 @@
+"""reprisal_queue
+
+Revision ID: c3f8a2e9d614
+Revises: b7e2d4f61a93
+Create Date: 2025-05-17 11:04:52.930718
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c3f8a2e9d614"
+down_revision: Union[str, None] = "b7e2d4f61a93"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "reprisal_queue",
+        sa.Column("uuid", sa.String(length=36), nullable=False),
+        sa.Column("set_uuid", sa.String(length=36), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("motif_uuid", sa.String(length=36), nullable=False),
+        sa.Column("cloze_deletion_uuid", sa.String(length=36), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["motif_uuid"],
+            ["motif.uuid"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["cloze_deletion_uuid"],
+            ["cloze_deletion.uuid"],
+        ),
+        sa.PrimaryKeyConstraint("uuid"),
+    )
+    op.create_index("ix_reprisal_queue_set_uuid", "reprisal_queue", ["set_uuid"])
+    op.create_index("ix_reprisal_queue_created_at", "reprisal_queue", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_reprisal_queue_created_at", table_name="reprisal_queue")
+    op.drop_index("ix_reprisal_queue_set_uuid", table_name="reprisal_queue")
+    op.drop_table("reprisal_queue")
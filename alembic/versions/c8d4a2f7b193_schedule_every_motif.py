@@ -0,0 +1,48 @@
+"""schedule every motif
+
+Revision ID: c8d4a2f7b193
+Revises: e7b3c9d2a4f6
+Create Date: 2025-06-16 11:04:52.318264
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c8d4a2f7b193"
+down_revision: Union[str, None] = "e7b3c9d2a4f6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TRIGGER motif_schedule_insert AFTER INSERT ON motif BEGIN
+            INSERT INTO motif_schedule (
+                motif_uuid, due_at, box, repetitions, interval_days, ease_factor,
+                updated_at
+            ) VALUES (new.uuid, new.created_at, 0, 0, 0, 2.5, new.created_at);
+        END
+        """
+    )
+
+    # schedule the motifs that have never been reprised, due since their creation
+    op.execute(
+        """
+        INSERT INTO motif_schedule (
+            motif_uuid, due_at, box, repetitions, interval_days, ease_factor,
+            updated_at
+        )
+        SELECT uuid, created_at, 0, 0, 0, 2.5, created_at FROM motif
+        WHERE uuid NOT IN (SELECT motif_uuid FROM motif_schedule)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER motif_schedule_insert")
+    # every recorded reprisal sets an interval, so these were never reprised
+    op.execute("DELETE FROM motif_schedule WHERE interval_days = 0")
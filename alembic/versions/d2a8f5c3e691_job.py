@@ -0,0 +1,45 @@
+"""job
+
+Revision ID: d2a8f5c3e691
+Revises: b9e4c7a1d356
+Create Date: 2025-06-14 10:21:46.305187
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d2a8f5c3e691"
+down_revision: Union[str, None] = "b9e4c7a1d356"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "job",
+        sa.Column("uuid", sa.String(length=36), nullable=False),
+        sa.Column("kind", sa.String(length=32), nullable=False),
+        sa.Column("motif_uuid", sa.String(length=36), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("run_after", sa.DateTime(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["motif_uuid"],
+            ["motif.uuid"],
+        ),
+        sa.PrimaryKeyConstraint("uuid"),
+    )
+    op.create_index("ix_job_status_run_after", "job", ["status", "run_after"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_job_status_run_after", table_name="job")
+    op.drop_table("job")
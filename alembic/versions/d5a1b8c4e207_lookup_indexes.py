@@ -0,0 +1,36 @@
+"""lookup_indexes
+
+Revision ID: d5a1b8c4e207
+Revises: c3f8a2e9d614
+Create Date: 2025-05-24 09:12:41.318204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d5a1b8c4e207"
+down_revision: Union[str, None] = "c3f8a2e9d614"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+indexes = [
+    ("ix_reprisal_motif_uuid", "reprisal", ["motif_uuid"]),
+    ("ix_reprisal_set_uuid", "reprisal", ["set_uuid"]),
+    ("ix_cloze_deletion_motif_uuid", "cloze_deletion", ["motif_uuid"]),
+    ("ix_citation_title", "citation", ["title"]),
+    ("ix_motif_created_at", "motif", ["created_at"]),
+    ("ix_reprisal_schedule_scheduled_for", "reprisal_schedule", ["scheduled_for"]),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in indexes:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(indexes):
+        op.drop_index(name, table_name=table)
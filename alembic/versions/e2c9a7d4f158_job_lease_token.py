@@ -0,0 +1,28 @@
+"""job lease token
+
+Revision ID: e2c9a7d4f158
+Revises: b5f2e8d1c437
+Create Date: 2025-06-18 16:47:33.129580
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e2c9a7d4f158"
+down_revision: Union[str, None] = "b5f2e8d1c437"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("job", sa.Column("lease_token", sa.String(length=36), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("job") as batch_op:
+        batch_op.drop_column("lease_token")
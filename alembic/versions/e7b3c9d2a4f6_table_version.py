@@ -0,0 +1,33 @@
+"""table version
+
+Revision ID: e7b3c9d2a4f6
+Revises: d2a8f5c3e691
+Create Date: 2025-06-15 09:12:38.540716
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e7b3c9d2a4f6"
+down_revision: Union[str, None] = "d2a8f5c3e691"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "table_version",
+        sa.Column("name", sa.String(length=64), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("table_version")
@@ -0,0 +1,27 @@
+"""motif_pagination_index
+
+Revision ID: e8c2f0a7b915
+Revises: d5a1b8c4e207
+Create Date: 2025-05-31 10:27:05.641893
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e8c2f0a7b915"
+down_revision: Union[str, None] = "d5a1b8c4e207"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_motif_created_at_uuid", "motif", ["created_at", "uuid"])
+    op.drop_index("ix_motif_created_at", table_name="motif")
+
+
+def downgrade() -> None:
+    op.create_index("ix_motif_created_at", "motif", ["created_at"])
+    op.drop_index("ix_motif_created_at_uuid", table_name="motif")
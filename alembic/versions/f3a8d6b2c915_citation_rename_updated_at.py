@@ -0,0 +1,46 @@
+"""citation rename updated_at
+
+Revision ID: f3a8d6b2c915
+Revises: e2c9a7d4f158
+Create Date: 2025-06-19 10:03:51.224187
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f3a8d6b2c915"
+down_revision: Union[str, None] = "e2c9a7d4f158"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # renaming a citation rewrites its motifs in SQL, so the ORM's onupdate never
+    # runs; bump updated_at in the trigger, as SQLAlchemy formats a local datetime
+    op.execute("DROP TRIGGER motif_search_citation_update")
+    op.execute(
+        """
+        CREATE TRIGGER motif_search_citation_update
+        AFTER UPDATE OF title ON citation BEGIN
+            UPDATE motif SET
+                citation_uuid = citation_uuid,
+                updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime') || '000'
+            WHERE citation_uuid = new.uuid;
+        END
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER motif_search_citation_update")
+    op.execute(
+        """
+        CREATE TRIGGER motif_search_citation_update
+        AFTER UPDATE OF title ON citation BEGIN
+            UPDATE motif SET citation_uuid = citation_uuid WHERE citation_uuid = new.uuid;
+        END
+        """
+    )
@@ -0,0 +1,83 @@
+"""motif_search
+
+Revision ID: f4b9d3e1c852
+Revises: e8c2f0a7b915
+Create Date: 2025-06-07 14:38:19.502716
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f4b9d3e1c852"
+down_revision: Union[str, None] = "e8c2f0a7b915"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE VIRTUAL TABLE motif_search USING fts5(
+            content, citation, motif_uuid, tokenize = 'porter unicode61'
+        )
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER motif_search_insert AFTER INSERT ON motif BEGIN
+            INSERT INTO motif_search (content, citation, motif_uuid) VALUES (
+                new.content,
+                (SELECT title FROM citation WHERE uuid = new.citation_uuid),
+                new.uuid
+            );
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER motif_search_update
+        AFTER UPDATE OF content, citation_uuid ON motif BEGIN
+            UPDATE motif_search SET
+                content = new.content,
+                citation = (SELECT title FROM citation WHERE uuid = new.citation_uuid)
+            WHERE motif_search MATCH 'motif_uuid:"' || old.uuid || '"';
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER motif_search_delete AFTER DELETE ON motif BEGIN
+            DELETE FROM motif_search
+            WHERE motif_search MATCH 'motif_uuid:"' || old.uuid || '"';
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER motif_search_citation_update
+        AFTER UPDATE OF title ON citation BEGIN
+            UPDATE motif_search SET citation = new.title
+            WHERE motif_uuid IN (SELECT uuid FROM motif WHERE citation_uuid = new.uuid);
+        END
+        """
+    )
+
+    # index the existing deck
+    op.execute(
+        """
+        INSERT INTO motif_search (content, citation, motif_uuid)
+        SELECT motif.content, citation.title, motif.uuid
+        FROM motif LEFT JOIN citation ON citation.uuid = motif.citation_uuid
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER motif_search_citation_update")
+    op.execute("DROP TRIGGER motif_search_delete")
+    op.execute("DROP TRIGGER motif_search_update")
+    op.execute("DROP TRIGGER motif_search_insert")
+    op.execute("DROP TABLE motif_search")
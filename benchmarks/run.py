@@ -0,0 +1,226 @@
+"""
+Benchmarks for the reprise hot paths at realistic deck sizes.
+
+Each size seeds (or tops up) a throwaway SQLite database, then times the
+benchmarks below and records their query counts and peak Python memory.
+
+    python -m benchmarks.run --sizes 1000 10000
+    python -m benchmarks.run --sizes 1000 10000 100000 1000000 --save-baseline
+
+With a stored baseline the run exits non-zero when a benchmark is slower or
+uses more memory than the baseline allows, or issues more queries.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+# dispatch targets far in the future, a day apart, so each run needs scheduling
+dispatch_days = itertools.count(365 * 10)
+
+
+def measure(benchmark, repeat: int) -> dict:
+    from reprise.profiling import record_queries
+
+    # a traced run for queries and memory, then untraced runs for timing
+    with record_queries() as query_stats:
+        tracemalloc.start()
+        benchmark()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        benchmark()
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "seconds": statistics.median(timings),
+        "queries": query_stats.count,
+        "peak_kib": peak // 1024,
+    }
+
+
+def selection_benchmarks() -> dict:
+    from reprise.db import database_session
+    from reprise.repository import sampling_terms_cache
+    from reprise.scheduler import WeightedScheduler
+    from reprise.service import Service
+
+    def reprise():
+        # roll back so every iteration sees the same deck
+        with database_session() as session:
+            Service(session).reprise()
+            session.rollback()
+
+    def weighted_select():
+        # weighs the whole deck from its cached sampling terms
+        with database_session(readonly=True) as session:
+            WeightedScheduler(session, seed=0).select(5)
+
+    def weighted_select_uncached():
+        # as after adding or editing motifs
+        sampling_terms_cache.clear()
+        weighted_select()
+
+    def weighted_reprise():
+        # committed, so each select follows the set recorded before it
+        with database_session() as session:
+            Service(session, WeightedScheduler(session, seed=0)).reprise(5)
+
+    return {
+        "service_reprise": reprise,
+        "weighted_select": weighted_select,
+        "weighted_select_uncached": weighted_select_uncached,
+        "weighted_reprise": weighted_reprise,
+    }
+
+
+def benchmarks(size: int) -> dict:
+    from reprise.api import app
+    from reprise.db import Motif, database_session
+    from reprise.dispatcher import MailgunDispatcher
+    from reprise.schemas import encode_cursor
+
+    client = app.test_client()
+    last_page = max(size // 50, 1)
+    with database_session(readonly=True) as session:
+        # the key of the last motif before the last page
+        created_at, uuid = (
+            session.query(Motif.created_at, Motif.uuid)
+            .order_by(Motif.created_at.desc(), Motif.uuid.desc())
+            .offset(max((last_page - 1) * 50 - 1, 0))
+            .first()
+        )
+    last_page_cursor = encode_cursor(created_at, uuid)
+    etag = client.get("/motifs?page=1&page_size=50").headers["ETag"]
+
+    def get_motifs_first_page():
+        client.get("/motifs?page=1&page_size=50")
+
+    def get_motifs_browse():
+        client.get("/motifs?page=1&page_size=50&fields=uuid,content,created_at")
+
+    def get_motifs_not_modified():
+        client.get("/motifs?page=1&page_size=50", headers={"If-None-Match": etag})
+
+    def get_motifs_last_page():
+        client.get(f"/motifs?page={last_page}&page_size=50")
+
+    def get_motifs_last_page_by_cursor():
+        client.get(f"/motifs?cursor={last_page_cursor}&page_size=50")
+
+    def search_motifs():
+        # every seeded word is common, so this is close to a worst case
+        client.get("/motifs/search?q=theorem proof")
+
+    def post_motif():
+        client.post("/motifs", json={"content": "benchmark motif", "citation": "bm"})
+
+    def dispatcher_schedule():
+        target_time = datetime.now() + timedelta(days=next(dispatch_days))
+        with patch.object(MailgunDispatcher, "_send_to_mailgun"):
+            MailgunDispatcher().schedule([target_time])
+
+    return {
+        **selection_benchmarks(),
+        "get_motifs_first_page": get_motifs_first_page,
+        "get_motifs_browse": get_motifs_browse,
+        "get_motifs_not_modified": get_motifs_not_modified,
+        "get_motifs_last_page": get_motifs_last_page,
+        "get_motifs_last_page_by_cursor": get_motifs_last_page_by_cursor,
+        "search_motifs": search_motifs,
+        "post_motif": post_motif,
+        "dispatcher_schedule": dispatcher_schedule,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for size, size_results in results.items():
+        for name, result in size_results.items():
+            expected = baseline.get(size, {}).get(name)
+            if not expected:
+                continue
+            if result["seconds"] > expected["seconds"] * (1 + tolerance):
+                regressions.append(
+                    f"{name} @ {size}: {result['seconds']:.4f}s vs "
+                    f"{expected['seconds']:.4f}s baseline"
+                )
+            if result["queries"] > expected["queries"]:
+                regressions.append(
+                    f"{name} @ {size}: {result['queries']} queries vs "
+                    f"{expected['queries']} baseline"
+                )
+            if result["peak_kib"] > expected["peak_kib"] * (1 + tolerance):
+                regressions.append(
+                    f"{name} @ {size}: {result['peak_kib']} KiB peak vs "
+                    f"{expected['peak_kib']} KiB baseline"
+                )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--database", help="SQLite file to seed and reuse")
+    args = parser.parse_args()
+
+    database = args.database or os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+
+    # reprise reads DATABASE_URL when it is first imported
+    from benchmarks.seed import seed_deck
+    from reprise.db import Base, database_session, engine
+
+    Base.metadata.create_all(engine)
+
+    results = {}
+    for size in sorted(args.sizes):
+        start = time.perf_counter()
+        with database_session() as session:
+            seed_deck(session, size)
+        print(f"seeded {size} motifs in {time.perf_counter() - start:.1f}s")
+
+        results[str(size)] = {}
+        for name, benchmark in benchmarks(size).items():
+            result = measure(benchmark, args.repeat)
+            results[str(size)][name] = result
+            print(
+                f"  {name:<32} {result['seconds'] * 1000:>10.2f} ms"
+                f" {result['queries']:>6} queries {result['peak_kib']:>8} KiB"
+            )
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"saved baseline to {args.baseline}")
+        return 0
+
+    if args.baseline.exists():
+        regressions = compare(
+            results, json.loads(args.baseline.read_text()), args.tolerance
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
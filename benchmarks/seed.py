@@ -0,0 +1,103 @@
+import random
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import func, insert
+
+from reprise.db import Citation, ClozeDeletion, Motif, Reprisal
+from reprise.service import Service
+
+WORDS = (
+    "memory practice recall spacing interval habit attention learning review "
+    "sentence passage chapter author idea argument example history science "
+    "language music poem theorem proof river mountain city letter"
+).split()
+
+CHUNK_SIZE = 10_000
+
+
+def _content(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 40)))
+
+
+def _mask_tuples(rng: random.Random, content: str) -> list[list[int]]:
+    start = rng.randrange(0, max(len(content) - 10, 1))
+    return [[start, start + rng.randint(2, 8)]]
+
+
+def seed_deck(session, n_motifs: int, history_rounds: int = 3, seed: int = 0) -> None:
+    """
+    Top the deck up to `n_motifs` motifs with citations, cloze deletions and a
+    reprisal history shaped like the balanced scheduler's: every motif has been
+    reprised `history_rounds` times, and the first part of the deck once more.
+
+    Rows are written with chunked executemany inserts so that seeding a million
+    motifs stays practical.
+    """
+    rng = random.Random(seed + n_motifs)
+    n_existing = session.query(func.count(Motif.uuid)).scalar()
+    n_new = n_motifs - n_existing
+    if n_new <= 0:
+        return
+
+    citation_uuids = [str(uuid4()) for _ in range(max(n_new // 100, 1))]
+    session.execute(
+        insert(Citation),
+        [
+            {"uuid": uuid, "title": _content(rng)[:60], "created_at": datetime.now()}
+            for uuid in citation_uuids
+        ],
+    )
+
+    now = datetime.now()
+    n_sets = history_rounds * n_motifs // Service.reprisal_count + 1
+    for chunk_start in range(0, n_new, CHUNK_SIZE):
+        motifs, cloze_deletions, reprisals = [], [], []
+        for _ in range(min(CHUNK_SIZE, n_new - chunk_start)):
+            motif_uuid = str(uuid4())
+            content = _content(rng)
+            rounds = history_rounds + (rng.random() < 0.3)
+            motif_cloze_uuids = [str(uuid4()) for _ in range(rng.choice((0, 1, 2, 3)))]
+            reprised_at = [
+                now - timedelta(days=rng.random() * 365) for _ in range(rounds)
+            ]
+
+            motifs.append(
+                {
+                    "uuid": motif_uuid,
+                    "content": content,
+                    "citation_uuid": rng.choice(citation_uuids)
+                    if rng.random() < 0.3
+                    else None,
+                    "created_at": now - timedelta(days=400 + rng.random() * 365),
+                    "reprisal_count": rounds,
+                    "last_reprised_at": max(reprised_at, default=None),
+                }
+            )
+            cloze_deletions += [
+                {
+                    "uuid": cloze_uuid,
+                    "motif_uuid": motif_uuid,
+                    "mask_tuples": _mask_tuples(rng, content),
+                    "created_at": now,
+                }
+                for cloze_uuid in motif_cloze_uuids
+            ]
+            reprisals += [
+                {
+                    "uuid": str(uuid4()),
+                    "motif_uuid": motif_uuid,
+                    "set_uuid": f"00000000-0000-0000-0000-{rng.randrange(n_sets):012d}",
+                    "cloze_deletion_uuid": rng.choice(motif_cloze_uuids)
+                    if motif_cloze_uuids
+                    else None,
+                    "created_at": created_at,
+                }
+                for created_at in reprised_at
+            ]
+
+        session.execute(insert(Motif), motifs)
+        if cloze_deletions:
+            session.execute(insert(ClozeDeletion), cloze_deletions)
+        session.execute(insert(Reprisal), reprisals)
+        session.commit()
@@ -1,34 +1,54 @@
-from typing import Any, Dict, List
+import io
+import json
+import logging
+import threading
+from dataclasses import asdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
 
 import logfire
-from flask import Flask, jsonify
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
 from flask_pydantic import validate
+from pydantic import TypeAdapter
+from werkzeug.http import is_resource_modified
 
-from reprise import settings
-from reprise.db import database_session
+from reprise import exporter, importer, jobs, operations, profiling, settings
+from reprise.db import ClozeDeletion, Motif, TableVersion, database_session
+from reprise.queue import ReprisalQueueWorker
 from reprise.repository import (
     CitationRepository,
-    ClozeDeletionRepository,
+    JobRepository,
     MotifRepository,
+    TableVersionRepository,
 )
 from reprise.schemas import (
+    BatchRequest,
+    BatchResponse,
     CitationCreate,
     CitationResponse,
     ClozeDeletionCreate,
-    ClozeDeletionResponse,
     ClozeDeletionUpdate,
-    DeleteResponse,
     ErrorResponse,
+    ExportParams,
+    ImportParams,
+    ImportResponse,
+    JobResponse,
     MotifCreate,
     MotifListResponse,
     MotifResponse,
+    MotifSearchResponse,
+    MotifSearchResult,
     MotifUpdate,
     PaginationParams,
+    SearchParams,
+    decode_cursor,
+    encode_cursor,
 )
 from reprise.service import Service
 
 app = Flask(__name__)
+logger = logging.getLogger(__name__)
 
 
 def configure_logfire():
@@ -37,127 +57,291 @@ def configure_logfire():
         logfire.instrument_openai()
 
 
+def start_job_workers():
+    workers = [jobs.JobWorker() for _ in range(settings.JOB_WORKERS)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def wake_job_workers():
+    for worker in job_workers or ():
+        worker.wake()
+
+
+def start_reprisal_queue_worker():
+    if settings.REPRISAL_QUEUE_WORKER:
+        worker = ReprisalQueueWorker()
+        worker.start()
+        return worker
+
+
 configure_logfire()
+reprisal_queue_worker = start_reprisal_queue_worker()
+# started by the first request rather than on import, so importing the app (the
+# ASGI entry, scripts, benchmarks) starts no threads
+job_workers: List[jobs.JobWorker] | None = None
+job_workers_lock = threading.Lock()
 CORS(app)
 
 
+@app.before_request
+def ensure_job_workers():
+    global job_workers
+    if job_workers is None:
+        with job_workers_lock:
+            if job_workers is None:
+                job_workers = start_job_workers()
+
+
+@app.before_request
+def start_query_stats():
+    g.query_stats_token = profiling.start_recording()
+
+
+@app.after_request
+def report_query_stats(response):
+    query_stats = profiling.stop_recording(g.query_stats_token)
+    # a request with slow queries is a warning, so it's reported without any
+    # logging configured; the line is only built if it will be emitted
+    level = logging.WARNING if query_stats.slowest else logging.INFO
+    if logger.isEnabledFor(level):
+        logger.log(
+            level,
+            json.dumps(
+                {
+                    "event": "request_queries",
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "query_count": query_stats.count,
+                    "db_ms": round(query_stats.total_milliseconds, 3),
+                    "slow_queries": [
+                        {
+                            "statement": slow_query.statement,
+                            "ms": round(slow_query.milliseconds, 3),
+                            "query_plan": slow_query.query_plan,
+                        }
+                        for slow_query in query_stats.slowest
+                    ],
+                }
+            ),
+        )
+    if app.debug:
+        response.headers["X-Query-Count"] = str(query_stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{query_stats.total_milliseconds:.3f}"
+    return response
+
+
 @app.errorhandler(400)
 def handle_bad_request(e):
     return jsonify({"error": str(e)}), 400
 
 
+def json_response(body: bytes, status: int = 200) -> Response:
+    """A response for JSON already serialized, e.g. by `model_dump_json`."""
+    return Response(body, status=status, mimetype="application/json")
+
+
+motif_list_adapter = TypeAdapter(List[MotifResponse])
+
+
+# cached by the motif table version it was counted at, so it's reused until a
+# write to the table, from any process
+motif_count_cache: Dict[int, int] = {}
+
+
+def get_motif_count(repository: MotifRepository, version: int) -> int:
+    if version not in motif_count_cache:
+        motif_count_cache.clear()
+        motif_count_cache[version] = repository.get_motifs_count()
+    return motif_count_cache[version]
+
+
+def get_validators(
+    versions: Dict[str, TableVersion], tables: Tuple[str, ...]
+) -> Tuple[str, datetime | None]:
+    """
+    The ETag and Last-Modified of a response built from `tables`, derived from
+    their persisted versions alone.
+    """
+    etag = "-".join(
+        str(versions[table].version if table in versions else 0) for table in tables
+    )
+    last_modified = max(
+        (version.updated_at for version in versions.values()), default=None
+    )
+    # stored as naive local time; headers are in UTC
+    return etag, last_modified.astimezone(timezone.utc) if last_modified else None
+
+
+def conditional_response(
+    response: Response | None, etag: str, last_modified: datetime | None
+) -> Response:
+    """
+    `response` with validators set, or an empty 304 if there's none because the
+    client's copy is current.
+    """
+    if response is None:
+        response = Response(status=304)
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    return response
+
+
+def is_modified(etag: str, last_modified: datetime | None) -> bool:
+    return is_resource_modified(request.environ, etag=etag, last_modified=last_modified)
+
+
+MOTIF_LIST_TABLES = ("motif", "citation", "cloze_deletion")
+
+
 @app.route("/motifs", methods=["GET"])
 @validate(query=PaginationParams)
-def get_motifs(query: PaginationParams) -> Dict[str, Any]:
-    with database_session() as session:
+def get_motifs(query: PaginationParams) -> Response:
+    with database_session(readonly=True) as session:
+        versions = TableVersionRepository(session).get_table_versions(MOTIF_LIST_TABLES)
+        etag, last_modified = get_validators(versions, MOTIF_LIST_TABLES)
+        if not is_modified(etag, last_modified):
+            return conditional_response(None, etag, last_modified)
+
+        # relationships that aren't asked for are never loaded
+        include = query.motif_relationships
         repository = MotifRepository(session)
-        motifs = repository.get_motifs_paginated(query.page, query.page_size)
-        total_count = repository.get_motifs_count()
-
-        motifs_list = [
-            MotifResponse(
-                uuid=motif.uuid,
-                content=motif.content,
-                created_at=motif.created_at.isoformat(),
-                citation=motif.citation.title if motif.citation else None,
-                cloze_deletions=[
-                    ClozeDeletionResponse(uuid=cd.uuid, mask_tuples=cd.mask_tuples)
-                    for cd in motif.cloze_deletions
-                ]
-                if motif.cloze_deletions
-                else None,
-            ).model_dump()
-            for motif in motifs
-        ]
-        return MotifListResponse(
-            motifs=motifs_list, total_count=total_count
-        ).model_dump()
+        if query.cursor:
+            after = decode_cursor(query.cursor)
+            motifs = repository.get_motifs_after(after, query.page_size, include)
+        else:
+            motifs = repository.get_motifs_paginated(
+                query.page, query.page_size, include
+            )
+        total_count = get_motif_count(
+            repository, versions["motif"].version if "motif" in versions else 0
+        )
+        next_cursor = (
+            encode_cursor(motifs[-1].created_at, motifs[-1].uuid)
+            if motifs and len(motifs) == query.page_size
+            else None
+        )
+
+        response = json_response(
+            MotifListResponse(
+                motifs=[
+                    operations.motif_response(motif, include=include)
+                    for motif in motifs
+                ],
+                total_count=total_count,
+                next_cursor=next_cursor,
+            ).model_dump_json(
+                include={
+                    "motifs": {"__all__": {*query.motif_fields, *include}},
+                    "total_count": True,
+                    "next_cursor": True,
+                }
+            )
+        )
+        return conditional_response(response, etag, last_modified)
 
 
 @app.route("/motifs", methods=["POST"])
 @validate(body=MotifCreate)
-def create_motif(body: MotifCreate) -> Dict[str, Any]:
+def create_motif(body: MotifCreate) -> Response:
     with database_session() as session:
+        # cloze deletions are generated in the background
+        response = operations.create_motif(session, body)
+
+    if response.job_uuid:
+        wake_job_workers()
+    return json_response(response.model_dump_json())
+
+
+@app.route("/jobs/<uuid>", methods=["GET"])
+def get_job(uuid: str) -> Dict[str, Any]:
+    with database_session(readonly=True) as session:
+        job = JobRepository(session).get_job(uuid)
+        if not job:
+            return ErrorResponse(error=f"Job {uuid} not found").model_dump(), 404
+        return JobResponse(
+            uuid=job.uuid,
+            kind=job.kind,
+            motif_uuid=job.motif_uuid,
+            status=job.status,
+            attempts=job.attempts,
+            error=job.error,
+            created_at=job.created_at.isoformat(),
+            finished_at=job.finished_at.isoformat() if job.finished_at else None,
+        ).model_dump()
+
+
+@app.route("/motifs/search", methods=["GET"])
+@validate(query=SearchParams)
+def search_motifs(query: SearchParams) -> Response:
+    with database_session(readonly=True) as session:
         repository = MotifRepository(session)
-        motif = repository.add_motif(body.content)
-        if body.citation:
-            citation_repository = CitationRepository(session)
-            citation = citation_repository.get_citation_by_title(body.citation)
-            if not citation:
-                citation = citation_repository.add_citation(body.citation)
-            motif = repository.add_citation(motif.uuid, citation)
-
-        # Generate cloze deletions for the motif
-        if body.auto_generate_cloze_deletions:
-            service = Service(session)
-            try:
-                service.cloze_delete_motif(motif.uuid, n_max=2)
-            except Exception as e:
-                app.logger.error(f"Error generating cloze deletions: {e}")
-                return jsonify({"error": str(e)}), 500
-
-            # Refresh motif to incorporate cloze deletions
-            session.refresh(motif)
-
-        response = MotifResponse(
-            uuid=motif.uuid,
-            content=motif.content,
-            citation=motif.citation.title if motif.citation else None,
-            cloze_deletions=[
-                ClozeDeletionResponse(uuid=cd.uuid, mask_tuples=cd.mask_tuples)
-                for cd in motif.cloze_deletions
-            ]
-            if motif.cloze_deletions
-            else None,
-            created_at=motif.created_at.isoformat(),
+        results = repository.search_motifs(query.q, query.limit)
+        return json_response(
+            MotifSearchResponse(
+                motifs=[
+                    operations.motif_response(
+                        motif, model=MotifSearchResult, snippet=snippet
+                    )
+                    for motif, snippet in results
+                ]
+            ).model_dump_json()
         )
-        return response.model_dump()
+
+
+@app.route("/motifs/export", methods=["GET"])
+@validate(query=ExportParams)
+def export_motifs(query: ExportParams) -> Response:
+    return Response(
+        stream_with_context(exporter.export_motifs(since=query.since)),
+        mimetype="application/x-ndjson",
+    )
+
+
+@app.route("/motifs/import", methods=["POST"])
+@validate(query=ImportParams)
+def import_motifs(query: ImportParams) -> Dict[str, Any]:
+    # stream the body rather than loading it whole
+    stream = io.TextIOWrapper(request.stream, encoding="utf-8", newline="")
+    try:
+        summary = importer.import_motifs(importer.read_records(stream, query.format))
+    except ValueError as e:
+        return ErrorResponse(error=str(e)).model_dump(), 400
+    return ImportResponse(**asdict(summary)).model_dump()
 
 
 @app.route("/motifs/<uuid>", methods=["PUT"])
 @validate(body=MotifUpdate)
-def update_motif(uuid: str, body: MotifUpdate) -> Dict[str, Any]:
-    with database_session() as session:
-        if body.citation:
-            citation_repository = CitationRepository(session)
-            citation = citation_repository.get_citation_by_title(body.citation)
-            if not citation:
-                return ErrorResponse(
-                    error=f"Citation {body.citation} not found"
-                ).model_dump(), 404
-
-        repository = MotifRepository(session)
-        motif = repository.update_motif_content(uuid, body.content)
-
-        if body.citation:
-            motif = repository.add_citation(motif.uuid, citation)
-
-        response = MotifResponse(
-            uuid=motif.uuid,
-            content=motif.content,
-            citation=motif.citation.title if motif.citation else None,
-            cloze_deletions=[
-                ClozeDeletionResponse(uuid=cd.uuid, mask_tuples=cd.mask_tuples)
-                for cd in motif.cloze_deletions
-            ]
-            if motif.cloze_deletions
-            else None,
-            created_at=motif.created_at.isoformat(),
-        )
-        return response.model_dump()
+def update_motif(uuid: str, body: MotifUpdate) -> Response:
+    try:
+        with database_session() as session:
+            response = operations.update_motif(session, uuid, body)
+    except LookupError as e:
+        return ErrorResponse(error=str(e)).model_dump(), 404
+    return json_response(response.model_dump_json())
 
 
 @app.route("/motifs/<uuid>", methods=["DELETE"])
 def delete_motif(uuid: str) -> Dict[str, str]:
-    with database_session() as session:
-        repository = MotifRepository(session)
-        repository.delete_motif(uuid)
-    return DeleteResponse(message="Motif deleted").model_dump()
+    try:
+        with database_session() as session:
+            response = operations.delete_motif(session, uuid)
+    except LookupError as e:
+        return ErrorResponse(error=str(e)).model_dump(), 404
+    return response.model_dump()
 
 
 @app.route("/citations", methods=["GET"])
-def get_citations() -> List[Dict[str, Any]]:
-    with database_session() as session:
+def get_citations() -> Response:
+    with database_session(readonly=True) as session:
+        versions = TableVersionRepository(session).get_table_versions(("citation",))
+        etag, last_modified = get_validators(versions, ("citation",))
+        if not is_modified(etag, last_modified):
+            return conditional_response(None, etag, last_modified)
+
         repository = CitationRepository(session)
         citations = repository.get_citations()
         citations_list = [
@@ -168,7 +352,7 @@ def get_citations() -> List[Dict[str, Any]]:
             ).model_dump()
             for citation in citations
         ]
-        return citations_list
+        return conditional_response(jsonify(citations_list), etag, last_modified)
 
 
 @app.route("/citations", methods=["POST"])
@@ -176,72 +360,121 @@ def get_citations() -> List[Dict[str, Any]]:
 def create_citation(body: CitationCreate) -> Dict[str, Any]:
     with database_session() as session:
         repository = CitationRepository(session)
-        citation = repository.add_citation(body.title)
         response = CitationResponse(
-            uuid=citation.uuid,
-            title=citation.title,
+            uuid=repository.get_or_create_citation_uuid(body.title),
+            title=body.title,
         )
         return response.model_dump()
 
 
+def reprisal_response(
+    motif: Motif, cloze_deletion: ClozeDeletion | None
+) -> MotifResponse:
+    return operations.motif_response(motif, [cloze_deletion] if cloze_deletion else [])
+
+
 @app.route("/reprise", methods=["POST"])
-def reprise() -> List[Dict[str, Any]]:
+def reprise() -> Response:
     with database_session() as session:
         service = Service(session)
         reprisals = service.reprise()
-        reprisals_list = [
-            MotifResponse(
-                uuid=reprisal.motif.uuid,
-                content=reprisal.motif.content,
-                cloze_deletions=[
-                    ClozeDeletionResponse(
-                        uuid=reprisal.cloze_deletion.uuid,
-                        mask_tuples=reprisal.cloze_deletion.mask_tuples,
-                    )
-                ]
-                if reprisal.cloze_deletion
-                else None,
-                created_at=reprisal.motif.created_at.isoformat(),
-                citation=reprisal.motif.citation.title
-                if reprisal.motif.citation
-                else None,
-            ).model_dump()
-            for reprisal in reprisals
-        ]
-        return reprisals_list
+        body = motif_list_adapter.dump_json(
+            [
+                reprisal_response(reprisal.motif, reprisal.cloze_deletion)
+                for reprisal in reprisals
+            ]
+        )
+
+    if reprisal_queue_worker:
+        reprisal_queue_worker.wake()
+    return json_response(body)
+
+
+# the tables a reprisal set is selected and served from
+REPRISE_PREVIEW_TABLES = (
+    "motif",
+    "citation",
+    "cloze_deletion",
+    "motif_schedule",
+    "reprisal",
+    "reprisal_queue",
+)
+
+# serialized, by the versions of the tables it was read from, so it's reused until
+# a write to them from any process or, for due date schedulers, until the next
+# motif is due; the entry is the body and when it expires
+reprise_preview_cache: Dict[str, Tuple[bytes, datetime | None]] = {}
+
+
+@app.route("/reprise/preview", methods=["GET"])
+def reprise_preview() -> Response:
+    now = datetime.now()
+    with database_session(readonly=True) as session:
+        versions = TableVersionRepository(session).get_table_versions(
+            REPRISE_PREVIEW_TABLES
+        )
+        key, _ = get_validators(versions, REPRISE_PREVIEW_TABLES)
+        if key in reprise_preview_cache:
+            body, expires_at = reprise_preview_cache[key]
+            if expires_at is None or now < expires_at:
+                return json_response(body)
+
+        service = Service(session)
+        body = motif_list_adapter.dump_json(
+            [
+                reprisal_response(motif, cloze_deletion)
+                for motif, cloze_deletion in service.preview(now)
+            ]
+        )
+        expires_at = service.scheduler.selection_expires_at(now)
+    reprise_preview_cache.clear()
+    reprise_preview_cache[key] = (body, expires_at)
+    return json_response(body)
 
 
 @app.route("/cloze_deletions", methods=["POST"])
 @validate(body=ClozeDeletionCreate)
 def create_cloze_deletion(body: ClozeDeletionCreate) -> Dict[str, Any]:
-    with database_session() as session:
-        repository = ClozeDeletionRepository(session)
-        cloze_deletion = repository.add_cloze_deletion(
-            body.motif_uuid, body.mask_tuples
-        )
-        response = ClozeDeletionResponse(
-            uuid=cloze_deletion.uuid,
-            mask_tuples=cloze_deletion.mask_tuples,
-        )
-        return response.model_dump()
+    try:
+        with database_session() as session:
+            response = operations.create_cloze_deletion(session, body)
+    except LookupError as e:
+        return ErrorResponse(error=str(e)).model_dump(), 404
+    return response.model_dump()
 
 
 @app.route("/cloze_deletions", methods=["PUT"])
 @validate(body=ClozeDeletionUpdate)
 def update_cloze_deletion(body: ClozeDeletionUpdate) -> Dict[str, Any]:
-    with database_session() as session:
-        repository = ClozeDeletionRepository(session)
-        cloze_deletion = repository.update_cloze_deletion(body.uuid, body.mask_tuples)
-        response = ClozeDeletionResponse(
-            uuid=cloze_deletion.uuid,
-            mask_tuples=cloze_deletion.mask_tuples,
-        )
-        return response.model_dump()
+    try:
+        with database_session() as session:
+            response = operations.update_cloze_deletion(session, body)
+    except LookupError as e:
+        return ErrorResponse(error=str(e)).model_dump(), 404
+    return response.model_dump()
 
 
 @app.route("/cloze_deletions/<uuid>", methods=["DELETE"])
 def delete_cloze_deletion(uuid: str) -> Dict[str, str]:
     with database_session() as session:
-        repository = ClozeDeletionRepository(session)
-        repository.delete_cloze_deletion(uuid)
-        return DeleteResponse(message="Cloze deletion deleted").model_dump()
+        return operations.delete_cloze_deletion(session, uuid).model_dump()
+
+
+@app.route("/batch", methods=["POST"])
+@validate(body=BatchRequest)
+def batch(body: BatchRequest) -> Response:
+    """
+    Run a list of operations in one transaction: all of them are committed
+    together, or none are if one fails.
+    """
+    try:
+        with database_session() as session:
+            results = operations.run_batch(session, body.operations)
+    except LookupError as e:
+        return ErrorResponse(error=str(e)).model_dump(), 404
+    except ValueError as e:
+        return ErrorResponse(error=str(e)).model_dump(), 400
+
+    if any(getattr(result, "job_uuid", None) for result in results):
+        wake_job_workers()
+    return json_response(BatchResponse(results=results).model_dump_json())
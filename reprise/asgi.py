@@ -0,0 +1,16 @@
+"""
+ASGI entry point, served with `uvicorn reprise.asgi:app`.
+
+This is a transport shim: every route is the Flask app, run on a2wsgi's thread
+pool. No request waits on the model, since cloze deletions are generated by the
+background job workers, so serving over ASGI changes how requests reach the app
+rather than how many it can serve at once.
+"""
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from reprise import api
+
+app = Starlette(routes=[Mount("/", app=WSGIMiddleware(api.app))])
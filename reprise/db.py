@@ -1,51 +1,206 @@
-import os
+import struct
 from contextlib import contextmanager
 from datetime import datetime
 from uuid import uuid4
 
-from sqlalchemy import Column, DateTime, String, Text, create_engine
-from sqlalchemy.dialects.sqlite import JSON
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    TypeDecorator,
+    column,
+    create_engine,
+    event,
+    table,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import backref, declarative_base, relationship, sessionmaker
+from sqlalchemy.pool import StaticPool
 from sqlalchemy.schema import ForeignKey
 
-database = os.getenv("DATABASE_URL", "sqlite:///reprise.db")
-engine = create_engine(database, echo=False)
+from reprise import settings
+from reprise.profiling import instrument_engine
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA foreign_keys={int(settings.SQLITE_FOREIGN_KEYS)}")
+    cursor.close()
+
+
+def create_database_engine(database: str) -> Engine:
+    """
+    Create an engine for `database`. SQLite connections get the pragmas from
+    settings (WAL, so readers are not blocked while a writer commits), and
+    file-backed databases get a sized connection pool. An in-memory database
+    keeps a single connection that threads (e.g. an ASGI thread pool) share.
+    """
+    url = make_url(database)
+    options = {}
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            # one connection shared by every thread, or each would see its own
+            # empty database
+            options["poolclass"] = StaticPool
+            options["connect_args"] = {"check_same_thread": False}
+        else:
+            options["pool_size"] = settings.DATABASE_POOL_SIZE
+            options["max_overflow"] = settings.DATABASE_MAX_OVERFLOW
+
+    engine = create_engine(database, echo=False, **options)
+    if url.get_backend_name() == "sqlite":
+        event.listen(engine, "connect", set_sqlite_pragmas)
+    instrument_engine(engine)
+    return engine
+
+
+engine = create_database_engine(settings.DATABASE_URL)
 
 Base = declarative_base()
 
+# how relationships load when first touched; tests raise instead, so an N+1 fails
+lazy = "raise_on_sql" if settings.RAISE_ON_LAZY_LOAD else "select"
+
 SessionLocal = sessionmaker(bind=engine)
 
 
+def _mark_written(session, table_name: str) -> None:
+    session.info.setdefault("written_tables", set()).add(table_name)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _mark_flush_write(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        _mark_written(session, obj.__table__.name)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _mark_bulk_write(orm_execute_state):
+    if not orm_execute_state.is_select:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None and table.name != TableVersion.__tablename__:
+            # a denormalized write can be versioned with the table it's derived from
+            name = orm_execute_state.execution_options.get("versioned_as", table.name)
+            _mark_written(orm_execute_state.session, name)
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _bump_table_versions(session):
+    session.flush()  # so the final flush's tables are known
+    written_tables = session.info.get("written_tables")
+    if written_tables:
+        now = datetime.now()
+        statement = sqlite_insert(TableVersion).values(
+            [
+                {"name": name, "version": 1, "updated_at": now}
+                for name in sorted(written_tables)
+            ]
+        )
+        session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["name"],
+                set_={
+                    "version": TableVersion.version + 1,
+                    "updated_at": statement.excluded.updated_at,
+                },
+            )
+        )
+
+
+@event.listens_for(SessionLocal, "after_commit")
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_writes(session):
+    session.info.pop("written_tables", None)
+
+
+def _set_query_only(dbapi_connection, query_only: bool) -> None:
+    # straight on the DBAPI connection, so it isn't counted as a request query
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA query_only = {int(query_only)}")
+    cursor.close()
+
+
 @contextmanager
-def database_session():
+def database_session(readonly: bool = False):
+    """
+    Yield a session that commits on exit, or rolls back if an exception is
+    raised. A readonly session runs with SQLite's query_only pragma, so any
+    write fails instead of taking the write lock, and it never commits.
+    """
     session = SessionLocal()
+    if readonly:
+        dbapi_connection = session.connection().connection
+        _set_query_only(dbapi_connection, True)
     try:
         yield session
-    except Exception as e:
-        session.rollback()
-        raise e
+        if not readonly:
+            session.commit()
     finally:
-        session.commit()
-        session.close()
+        if readonly:
+            _set_query_only(dbapi_connection, False)
+        session.close()  # rolls back anything left uncommitted
+
+
+class TableVersion(Base):
+    """
+    How many committed transactions have written to each table, so readers (in
+    any process) can tell whether what they cached or served is still current.
+    Sessions bump it for every table they wrote when they commit.
+    """
+
+    __tablename__ = "table_version"
+
+    name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
 
 
 class Motif(Base):
     __tablename__ = "motif"
+    # the GET /motifs sort key, for keyset pagination
+    __table_args__ = (Index("ix_motif_created_at_uuid", "created_at", "uuid"),)
 
     uuid = Column(String(36), primary_key=True, default=lambda: str(uuid4()))
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.now, nullable=False)
-    citation_uuid = Column(String(36), ForeignKey("citation.uuid"), nullable=True)
+    citation_uuid = Column(
+        String(36), ForeignKey("citation.uuid"), nullable=True, index=True
+    )
+    # the reprisal counters are denormalized from reprisal, and versioned with it
+    reprisal_count = Column(
+        Integer, default=0, server_default="0", nullable=False, index=True
+    )
+    last_reprised_at = Column(DateTime, nullable=True)
+    # bumped by any write to the motif or its cloze deletions, and by renaming its
+    # citation (see motif_search_citation_update), for incremental exports
+    updated_at = Column(
+        DateTime,
+        default=datetime.now,
+        onupdate=datetime.now,
+        nullable=True,
+        index=True,
+    )
 
-    citation = relationship("Citation", backref="motifs")
-    cloze_deletions = relationship("ClozeDeletion", back_populates="motif")
+    citation = relationship("Citation", backref=backref("motifs", lazy=lazy), lazy=lazy)
+    cloze_deletions = relationship("ClozeDeletion", back_populates="motif", lazy=lazy)
 
 
 class Citation(Base):
     __tablename__ = "citation"
 
     uuid = Column(String(36), primary_key=True, default=lambda: str(uuid4()))
-    title = Column(Text, nullable=False)
+    title = Column(Text, nullable=False, unique=True, index=True)
     created_at = Column(DateTime, default=datetime.now, nullable=False)
 
 
@@ -53,26 +208,50 @@ class Reprisal(Base):
     __tablename__ = "reprisal"
 
     uuid = Column(String(36), primary_key=True, default=lambda: str(uuid4()))
-    motif_uuid = Column(String(36), ForeignKey("motif.uuid"), nullable=False)
-    set_uuid = Column(String(36), nullable=False)
+    motif_uuid = Column(
+        String(36), ForeignKey("motif.uuid"), nullable=False, index=True
+    )
+    set_uuid = Column(String(36), nullable=False, index=True)
     cloze_deletion_uuid = Column(
         String(36), ForeignKey("cloze_deletion.uuid"), nullable=True
     )
     created_at = Column(DateTime, default=datetime.now, nullable=False)
 
-    motif = relationship("Motif", backref="reprisals")
-    cloze_deletion = relationship("ClozeDeletion", backref="reprisals")
+    motif = relationship("Motif", backref=backref("reprisals", lazy=lazy), lazy=lazy)
+    cloze_deletion = relationship(
+        "ClozeDeletion", backref=backref("reprisals", lazy=lazy), lazy=lazy
+    )
+
+
+class PackedMaskTuples(TypeDecorator):
+    """
+    A list of [start, end] pairs stored as packed little-endian uint32s: 8 bytes
+    a pair, read back with one struct.unpack rather than a JSON parse.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        indices = [index for pair in value for index in pair]
+        return struct.pack(f"<{len(indices)}I", *indices)
+
+    def process_result_value(self, value, dialect):
+        indices = iter(struct.unpack(f"<{len(value) // 4}I", value))
+        return list(map(list, zip(indices, indices, strict=True)))
 
 
 class ClozeDeletion(Base):
     __tablename__ = "cloze_deletion"
 
     uuid = Column(String(36), primary_key=True, default=lambda: str(uuid4()))
-    motif_uuid = Column(String(36), ForeignKey("motif.uuid"), nullable=False)
-    mask_tuples = Column(JSON, nullable=False)  # stores a list of (start, end) tuples
+    motif_uuid = Column(
+        String(36), ForeignKey("motif.uuid"), nullable=False, index=True
+    )
+    mask_tuples = Column(PackedMaskTuples, nullable=False)  # [[start, end], ...]
     created_at = Column(DateTime, default=datetime.now, nullable=False)
 
-    motif = relationship("Motif", back_populates="cloze_deletions")
+    motif = relationship("Motif", back_populates="cloze_deletions", lazy=lazy)
 
     def masked_motif(self, mask: str = "*") -> str:
         motif_content = self.motif.content
@@ -94,5 +273,144 @@ class ReprisalSchedule(Base):
 
     uuid = Column(String(36), primary_key=True, default=lambda: str(uuid4()))
     reprisal_set_uuid = Column(String(36), nullable=False)
-    scheduled_for = Column(DateTime, nullable=False)
+    scheduled_for = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+
+
+class MotifSchedule(Base):
+    __tablename__ = "motif_schedule"
+
+    motif_uuid = Column(String(36), ForeignKey("motif.uuid"), primary_key=True)
+    due_at = Column(DateTime, nullable=False, index=True)
+    box = Column(Integer, default=0, nullable=False)  # leitner box
+    repetitions = Column(Integer, default=0, nullable=False)  # sm-2 streak
+    interval_days = Column(Float, default=0, nullable=False)
+    ease_factor = Column(Float, default=2.5, nullable=False)
+    updated_at = Column(DateTime, default=datetime.now, nullable=False)
+
+    motif = relationship(
+        "Motif",
+        backref=backref(
+            "schedule", uselist=False, cascade="all, delete-orphan", lazy=lazy
+        ),
+        lazy=lazy,
+    )
+
+
+class ReprisalQueueEntry(Base):
+    __tablename__ = "reprisal_queue"
+
+    uuid = Column(String(36), primary_key=True, default=lambda: str(uuid4()))
+    set_uuid = Column(String(36), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    motif_uuid = Column(String(36), ForeignKey("motif.uuid"), nullable=False)
+    cloze_deletion_uuid = Column(
+        String(36), ForeignKey("cloze_deletion.uuid"), nullable=True
+    )
+    created_at = Column(DateTime, default=datetime.now, nullable=False, index=True)
+
+
+class Job(Base):
+    """
+    A unit of background work, e.g. generating cloze deletions for a motif.
+    Workers claim a due job by moving run_after forward by a lease, so a job
+    whose worker died becomes due again. Each claim sets a new lease_token that
+    the worker must still hold to record the job's outcome.
+    """
+
+    __tablename__ = "job"
+    # the claim lookup: the oldest due job that isn't finished
+    __table_args__ = (Index("ix_job_status_run_after", "status", "run_after"),)
+
+    uuid = Column(String(36), primary_key=True, default=lambda: str(uuid4()))
+    kind = Column(String(32), nullable=False)
+    motif_uuid = Column(String(36), ForeignKey("motif.uuid"), nullable=False)
+    status = Column(String(16), default="pending", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    run_after = Column(DateTime, default=datetime.now, nullable=False)
+    error = Column(Text, nullable=True)
+    lease_token = Column(String(36), nullable=True)
     created_at = Column(DateTime, default=datetime.now, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+
+# Full-text index over motif content and citation titles. It's an FTS5 virtual
+# table kept in sync by triggers rather than a mapped model, so create_all and
+# drop_all manage it through the metadata events below (migrations create it too).
+# Rows are found by a phrase match on their indexed motif_uuid, since motif has no
+# stable integer rowid to key them by and a plain comparison would scan the index.
+# Renaming a citation rewrites its motifs' citation_uuid in place, so each of their
+# rows is updated through that match too, and bumps their updated_at (in the format
+# SQLAlchemy stores a local datetime in) so incremental exports pick them up.
+motif_search = table(
+    "motif_search", column("content"), column("citation"), column("motif_uuid")
+)
+
+motif_search_ddl = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS motif_search USING fts5(
+        content, citation, motif_uuid, tokenize = 'porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS motif_search_insert AFTER INSERT ON motif BEGIN
+        INSERT INTO motif_search (content, citation, motif_uuid) VALUES (
+            new.content,
+            (SELECT title FROM citation WHERE uuid = new.citation_uuid),
+            new.uuid
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS motif_search_update
+    AFTER UPDATE OF content, citation_uuid ON motif BEGIN
+        UPDATE motif_search SET
+            content = new.content,
+            citation = (SELECT title FROM citation WHERE uuid = new.citation_uuid)
+        WHERE motif_search MATCH 'motif_uuid:"' || old.uuid || '"';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS motif_search_delete AFTER DELETE ON motif BEGIN
+        DELETE FROM motif_search
+        WHERE motif_search MATCH 'motif_uuid:"' || old.uuid || '"';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS motif_search_citation_update
+    AFTER UPDATE OF title ON citation BEGIN
+        UPDATE motif SET
+            citation_uuid = citation_uuid,
+            updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime') || '000'
+        WHERE citation_uuid = new.uuid;
+    END
+    """,
+]
+
+
+# Every motif is given a schedule, due as soon as it's created, by a trigger rather
+# than by each code path that inserts motifs (the ORM, bulk imports, plain SQL), so
+# due date schedulers always select with a single range scan of the due_at index.
+motif_schedule_insert_ddl = """
+    CREATE TRIGGER IF NOT EXISTS motif_schedule_insert AFTER INSERT ON motif BEGIN
+        INSERT INTO motif_schedule (
+            motif_uuid, due_at, box, repetitions, interval_days, ease_factor, updated_at
+        ) VALUES (new.uuid, new.created_at, 0, 0, 0, 2.5, new.created_at);
+    END
+"""
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_motif_search(target, connection, **kw):
+    for statement in motif_search_ddl:
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_motif_schedule_trigger(target, connection, **kw):
+    connection.exec_driver_sql(motif_schedule_insert_ddl)
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def _drop_motif_search(target, connection, **kw):
+    connection.exec_driver_sql("DROP TABLE IF EXISTS motif_search")
@@ -0,0 +1,30 @@
+from datetime import datetime
+from typing import Iterator
+
+from reprise.db import database_session
+from reprise.repository import MotifRepository
+from reprise.schemas import MotifExport
+
+
+def export_motifs(since: datetime | None = None) -> Iterator[str]:
+    """
+    Yield every motif as an NDJSON line, in the same shape the JSONL import
+    reads, plus its uuid and reprisal stats. Motifs are streamed from one
+    read-only session, so memory stays constant however large the deck.
+    """
+    with database_session(readonly=True) as session:
+        for motif in MotifRepository(session).iter_motifs(since=since):
+            yield (
+                MotifExport(
+                    uuid=motif.uuid,
+                    content=motif.content,
+                    created_at=motif.created_at.isoformat(),
+                    citation=motif.citation.title if motif.citation else None,
+                    cloze_deletions=[cd.mask_tuples for cd in motif.cloze_deletions],
+                    reprisal_count=motif.reprisal_count,
+                    last_reprised_at=motif.last_reprised_at.isoformat()
+                    if motif.last_reprised_at
+                    else None,
+                ).model_dump_json()
+                + "\n"
+            )
@@ -0,0 +1,134 @@
+import csv
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import count, islice
+from typing import Callable, Iterable, Iterator, TextIO
+from uuid import uuid4
+
+from reprise import settings
+from reprise.db import database_session
+from reprise.repository import (
+    CitationRepository,
+    ClozeDeletionRepository,
+    MotifRepository,
+)
+from reprise.schemas import MotifImport
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ImportSummary:
+    motifs: int = 0
+    citations: int = 0
+    cloze_deletions: int = 0
+
+
+def read_jsonl(lines: Iterable[str]) -> Iterator[dict]:
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[dict]:
+    """Rows with content, citation and cloze_deletions (a JSON list) columns."""
+    for row in csv.DictReader(lines):
+        record = {"content": row["content"], "citation": row.get("citation") or None}
+        if row.get("cloze_deletions"):
+            record["cloze_deletions"] = json.loads(row["cloze_deletions"])
+        yield record
+
+
+def read_markdown(lines: Iterable[str]) -> Iterator[dict]:
+    """
+    Every non-blank line (list markers stripped) is a motif, cited by the
+    nearest heading above it.
+    """
+    citation = None
+    for line in lines:
+        line = line.strip()
+        if line.startswith("#"):
+            citation = line.lstrip("#").strip() or None
+        elif line:
+            content = line[2:] if line[:2] in ("- ", "* ", "+ ") else line
+            yield {"content": content.strip(), "citation": citation}
+
+
+READERS = {"jsonl": read_jsonl, "csv": read_csv, "markdown": read_markdown}
+
+
+def read_records(stream: TextIO, format: str) -> Iterator[MotifImport]:
+    try:
+        reader = READERS[format]
+    except KeyError:
+        raise ValueError(f"Unknown import format {format}") from None
+
+    records = reader(stream)
+    for n_record in count(1):
+        try:
+            record = next(records, None)
+            if record is None:
+                return
+            motif_import = MotifImport.model_validate(record)
+        except (ValueError, KeyError, csv.Error) as e:  # incl. ValidationError
+            raise ValueError(f"Invalid record {n_record}: {e}") from e
+        yield motif_import
+
+
+def import_motifs(
+    records: Iterable[MotifImport],
+    chunk_size: int = settings.IMPORT_CHUNK_SIZE,
+    progress: Callable[[ImportSummary], None] | None = None,
+) -> ImportSummary:
+    """
+    Stream records into the database in chunks of `chunk_size`, each inserted
+    with one executemany per table and committed in its own transaction, so
+    memory and lock time stay bounded however large the input. Citations are
+    resolved a chunk at a time rather than with a lookup per motif.
+    If a record is invalid, the chunks before it stay imported.
+    """
+    summary = ImportSummary()
+    records = iter(records)
+    while chunk := list(islice(records, chunk_size)):
+        with database_session() as session:
+            citation_uuids, n_citations = CitationRepository(
+                session
+            ).get_or_create_citation_uuids(
+                record.citation for record in chunk if record.citation
+            )
+
+            created_at = datetime.now()
+            motifs, cloze_deletions = [], []
+            for record in chunk:
+                motif_uuid = str(uuid4())
+                motifs.append(
+                    {
+                        "uuid": motif_uuid,
+                        "content": record.content,
+                        "citation_uuid": citation_uuids.get(record.citation),
+                        "created_at": created_at,
+                        "updated_at": created_at,
+                    }
+                )
+                cloze_deletions.extend(
+                    {
+                        "uuid": str(uuid4()),
+                        "motif_uuid": motif_uuid,
+                        "mask_tuples": mask_tuples,
+                        "created_at": created_at,
+                    }
+                    for mask_tuples in record.cloze_deletions
+                )
+
+            MotifRepository(session).add_motifs(motifs)
+            ClozeDeletionRepository(session).add_cloze_deletions(cloze_deletions)
+
+        summary.motifs += len(motifs)
+        summary.citations += n_citations
+        summary.cloze_deletions += len(cloze_deletions)
+        logger.info(f"Imported {summary.motifs} motifs")
+        if progress:
+            progress(summary)
+    return summary
@@ -0,0 +1,94 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from reprise import settings
+from reprise.db import database_session
+from reprise.repository import JobRepository
+from reprise.service import Service
+
+logger = logging.getLogger(__name__)
+
+CLOZE_DELETIONS = "cloze_deletions"
+
+
+def generate_cloze_deletions(session, motif_uuid: str) -> None:
+    Service(session).cloze_delete_motif(motif_uuid, n_max=2)
+
+
+JOB_HANDLERS = {CLOZE_DELETIONS: generate_cloze_deletions}
+
+
+class JobWorker(threading.Thread):
+    """
+    Drains the persisted job table, one job at a time, retrying failures with
+    exponential backoff. JOB_WORKERS of them run as daemon threads inside the API
+    process, or one runs in the foreground via `scripts/job_worker.py`.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.JOB_POLL_INTERVAL,
+        max_attempts: int = settings.JOB_MAX_ATTEMPTS,
+        retry_delay: float = settings.JOB_RETRY_DELAY,
+        lease: float = settings.JOB_LEASE,
+    ):
+        super().__init__(name="job-worker", daemon=True)
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease = lease
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    def run_next(self) -> bool:
+        """Run the next due job, if any, returning whether there was one."""
+        with database_session() as session:
+            job = JobRepository(session).claim_job(
+                datetime.now(), self.lease, self.max_attempts
+            )
+        if job is None:
+            return False
+
+        # the job runs outside the claim's transaction, so a slow model call
+        # doesn't hold the database's write lock
+        try:
+            with database_session() as session:
+                JOB_HANDLERS[job.kind](session, job.motif_uuid)
+                if not JobRepository(session).complete_job(
+                    job.uuid, job.lease_token, datetime.now()
+                ):
+                    # the lease ran out and another worker reclaimed the job, so
+                    # its results are the ones kept
+                    logger.warning(f"Job {job.uuid} lease expired, discarding")
+                    session.rollback()
+        except Exception as e:
+            now = datetime.now()
+            retry_at = None
+            if job.attempts < self.max_attempts:
+                delay = self.retry_delay * 2 ** (job.attempts - 1)
+                retry_at = now + timedelta(seconds=delay)
+            logger.error(f"Job {job.uuid} failed (attempt {job.attempts}): {e}")
+            with database_session() as session:
+                JobRepository(session).fail_job(
+                    job.uuid, job.lease_token, str(e), now, retry_at
+                )
+        return True
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                while self.run_next() and not self._stopped.is_set():
+                    pass
+            except Exception as e:
+                logger.error(f"Error running jobs: {e}")
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def wake(self) -> None:
+        """Look for jobs now rather than at the next poll, e.g. after enqueueing."""
+        self._wakeup.set()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
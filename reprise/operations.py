@@ -0,0 +1,191 @@
+"""
+The API's write operations, each run in the caller's session so a route can
+commit one on its own and `POST /batch` can commit many together.
+"""
+
+from typing import Any, Collection, Iterable, List, Type
+
+from sqlalchemy.exc import IntegrityError
+
+from reprise import jobs
+from reprise.db import ClozeDeletion, Motif
+from reprise.repository import (
+    CitationRepository,
+    ClozeDeletionRepository,
+    JobRepository,
+    MotifRepository,
+)
+from reprise.schemas import (
+    BatchOperation,
+    ClozeDeletionCreate,
+    ClozeDeletionResponse,
+    ClozeDeletionUpdate,
+    DeleteResponse,
+    MotifCreate,
+    MotifCreateResponse,
+    MotifResponse,
+    MotifUpdate,
+)
+
+
+def motif_response(
+    motif: Motif,
+    cloze_deletions: Iterable[ClozeDeletion] | None = None,
+    model: Type[MotifResponse] = MotifResponse,
+    include: Collection[str] = ("citation", "cloze_deletions"),
+    **fields: Any,
+) -> MotifResponse:
+    """
+    The response for `motif`, validated once; it's serialized straight to JSON
+    rather than through dicts. Its cloze deletions and citation title are read
+    off the motif unless given, for callers that haven't loaded them, and left
+    empty if they aren't in `include`.
+    """
+    if cloze_deletions is None:
+        cloze_deletions = motif.cloze_deletions if "cloze_deletions" in include else ()
+    if "citation" not in fields:
+        citation = motif.citation if "citation" in include else None
+        fields["citation"] = citation.title if citation else None
+    return model(
+        uuid=motif.uuid,
+        content=motif.content,
+        created_at=motif.created_at.isoformat(),
+        cloze_deletions=[
+            {"uuid": cd.uuid, "mask_tuples": cd.mask_tuples} for cd in cloze_deletions
+        ]
+        or None,
+        **fields,
+    )
+
+
+def create_motif(session, body: MotifCreate) -> MotifCreateResponse:
+    """
+    Add a motif, queueing a job to generate its cloze deletions if asked; the
+    caller wakes the job workers once it has committed.
+    """
+    citation_uuid = (
+        CitationRepository(session).get_or_create_citation_uuid(body.citation)
+        if body.citation
+        else None
+    )
+    motif = MotifRepository(session).add_motif(
+        body.content, citation_uuid=citation_uuid
+    )
+
+    job = None
+    if body.auto_generate_cloze_deletions:
+        job = JobRepository(session).add_job(jobs.CLOZE_DELETIONS, motif.uuid)
+
+    return motif_response(
+        motif,
+        cloze_deletions=(),
+        model=MotifCreateResponse,
+        citation=body.citation,
+        job_uuid=job.uuid if job else None,
+    )
+
+
+def update_motif(session, uuid: str, body: MotifUpdate) -> MotifResponse:
+    citation = None
+    if body.citation:
+        citation = CitationRepository(session).get_citation_by_title(body.citation)
+        if not citation:
+            raise LookupError(f"Citation {body.citation} not found")
+
+    repository = MotifRepository(session)
+    if not repository.get_motif(uuid):
+        raise LookupError(f"Motif {uuid} not found")
+    motif = repository.update_motif_content(uuid, body.content)
+    if citation:
+        motif = repository.add_citation(motif.uuid, citation)
+    return motif_response(motif)
+
+
+def delete_motif(session, uuid: str) -> DeleteResponse:
+    repository = MotifRepository(session)
+    if not repository.get_motif(uuid):
+        raise LookupError(f"Motif {uuid} not found")
+    repository.delete_motif(uuid)
+    return DeleteResponse(message="Motif deleted")
+
+
+def create_cloze_deletion(session, body: ClozeDeletionCreate) -> ClozeDeletionResponse:
+    if not MotifRepository(session).get_motif(body.motif_uuid):
+        raise LookupError(f"Motif {body.motif_uuid} not found")
+    cloze_deletion = ClozeDeletionRepository(session).add_cloze_deletion(
+        body.motif_uuid, body.mask_tuples
+    )
+    return ClozeDeletionResponse(
+        uuid=cloze_deletion.uuid, mask_tuples=cloze_deletion.mask_tuples
+    )
+
+
+def update_cloze_deletion(session, body: ClozeDeletionUpdate) -> ClozeDeletionResponse:
+    repository = ClozeDeletionRepository(session)
+    if not repository.get_cloze_deletion(body.uuid):
+        raise LookupError(f"Cloze deletion {body.uuid} not found")
+    cloze_deletion = repository.update_cloze_deletion(body.uuid, body.mask_tuples)
+    return ClozeDeletionResponse(
+        uuid=cloze_deletion.uuid, mask_tuples=cloze_deletion.mask_tuples
+    )
+
+
+def delete_cloze_deletion(session, uuid: str) -> DeleteResponse:
+    ClozeDeletionRepository(session).delete_cloze_deletion(uuid)
+    return DeleteResponse(message="Cloze deletion deleted")
+
+
+def resolve_reference(value: str, results: List[Any]) -> str:
+    """
+    A uuid, or the uuid created by an earlier operation of the batch if
+    `value` refers to one as `$<index>`.
+    """
+    if not value.startswith("$"):
+        return value
+    index = value[1:]
+    uuid = None
+    if index.isdigit() and int(index) < len(results):
+        uuid = getattr(results[int(index)], "uuid", None)
+    if uuid is None:
+        raise ValueError(f"{value} doesn't refer to an earlier operation's result")
+    return uuid
+
+
+BATCH_HANDLERS = {
+    "create_motif": create_motif,
+    "update_motif": lambda session, operation: update_motif(
+        session, operation.uuid, operation
+    ),
+    "delete_motif": lambda session, operation: delete_motif(session, operation.uuid),
+    "create_cloze_deletion": create_cloze_deletion,
+    "update_cloze_deletion": update_cloze_deletion,
+    "delete_cloze_deletion": lambda session, operation: delete_cloze_deletion(
+        session, operation.uuid
+    ),
+}
+
+
+def run_batch(session, operations: Iterable[BatchOperation]) -> List[Any]:
+    """
+    Run `operations` in order in the caller's session, so they're committed
+    together or, if one fails, not at all. The failing operation's index is
+    prefixed to its error, and a constraint it violates is raised as a
+    ValueError.
+    """
+    results = []
+    for n, operation in enumerate(operations):
+        try:
+            references = {
+                field: resolve_reference(getattr(operation, field), results)
+                for field in ("uuid", "motif_uuid")
+                if hasattr(operation, field)
+            }
+            operation = operation.model_copy(update=references)
+            results.append(BATCH_HANDLERS[operation.op](session, operation))
+        except (LookupError, ValueError) as e:
+            raise type(e)(f"Operation {n}: {e}") from e
+        except IntegrityError as e:
+            # e.g. a motif deleted by another session after it was checked; the
+            # caller rolls back
+            raise ValueError(f"Operation {n}: {e.orig}") from e
+    return results
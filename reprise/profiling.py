@@ -0,0 +1,95 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from reprise import settings
+
+
+@dataclass
+class SlowQuery:
+    statement: str
+    milliseconds: float
+    query_plan: list[str] | None = None
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_milliseconds: float = 0
+    slowest: list[SlowQuery] = field(default_factory=list)
+    max_slowest: int = 5
+
+    def record(self, statement: str, milliseconds: float) -> SlowQuery | None:
+        """Tally a query, returning a SlowQuery if it ranks among the slowest."""
+        self.count += 1
+        self.total_milliseconds += milliseconds
+        if milliseconds < settings.SLOW_QUERY_MS:
+            return None
+        if len(self.slowest) == self.max_slowest:
+            if milliseconds <= self.slowest[-1].milliseconds:
+                return None
+            self.slowest.pop()
+
+        slow_query = SlowQuery(statement=statement, milliseconds=milliseconds)
+        self.slowest.append(slow_query)
+        self.slowest.sort(key=lambda query: query.milliseconds, reverse=True)
+        return slow_query
+
+
+# every collector active in this context; nested collectors all see each query
+_query_stats: ContextVar[tuple[QueryStats, ...]] = ContextVar("query_stats", default=())
+
+
+def start_recording() -> Token:
+    return _query_stats.set((*_query_stats.get(), QueryStats()))
+
+
+def stop_recording(token: Token) -> QueryStats:
+    query_stats = _query_stats.get()[-1]
+    _query_stats.reset(token)
+    return query_stats
+
+
+@contextmanager
+def record_queries():
+    """Collect stats for every query run in the current context."""
+    token = start_recording()
+    query_stats = _query_stats.get()[-1]
+    try:
+        yield query_stats
+    finally:
+        stop_recording(token)
+
+
+def instrument_engine(engine: Engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start_time = conn.info["query_start_times"].pop()
+        milliseconds = (time.perf_counter() - start_time) * 1000
+        slow_queries = [
+            slow_query
+            for query_stats in _query_stats.get()
+            if (slow_query := query_stats.record(statement, milliseconds))
+        ]
+        if (
+            slow_queries
+            and settings.EXPLAIN_SLOW_QUERIES
+            and not executemany
+            and statement.lstrip().upper().startswith("SELECT")
+        ):
+            plan_cursor = cursor.connection.cursor()
+            plan_cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            query_plan = [row[-1] for row in plan_cursor.fetchall()]
+            plan_cursor.close()
+            for slow_query in slow_queries:
+                slow_query.query_plan = query_plan
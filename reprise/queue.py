@@ -0,0 +1,51 @@
+import logging
+import threading
+
+from reprise import settings
+from reprise.db import database_session
+from reprise.service import Service
+
+logger = logging.getLogger(__name__)
+
+
+class ReprisalQueueWorker(threading.Thread):
+    """
+    Keeps the persisted reprisal queue topped up so that serving a set is a
+    single read. Runs as a daemon thread inside the API process or in the
+    foreground via `scripts/reprisal_queue_worker.py`.
+    """
+
+    def __init__(
+        self,
+        depth: int = settings.REPRISAL_QUEUE_DEPTH,
+        interval: float = settings.REPRISAL_QUEUE_INTERVAL,
+    ):
+        super().__init__(name="reprisal-queue-worker", daemon=True)
+        self.depth = depth
+        self.interval = interval
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    def refill(self) -> int:
+        with database_session() as session:
+            n_added = Service(session).fill_queue(self.depth)
+        if n_added:
+            logger.info(f"Queued {n_added} reprisal sets")
+        return n_added
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.refill()
+            except Exception as e:
+                logger.error(f"Error refilling reprisal queue: {e}")
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def wake(self) -> None:
+        """Refill now rather than at the next interval, e.g. after a set is served."""
+        self._wakeup.set()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
@@ -1,20 +1,124 @@
-from datetime import datetime
-
-from reprise.db import Citation, ClozeDeletion, Motif, Reprisal, ReprisalSchedule
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import repeat
+from operator import add, itemgetter, mul, sub
+from typing import Iterable, Iterator
+from uuid import uuid4
+
+from sqlalchemy import (
+    delete,
+    event,
+    func,
+    insert,
+    literal_column,
+    or_,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import joinedload, selectinload
+
+from reprise.db import (
+    Citation,
+    ClozeDeletion,
+    Job,
+    Motif,
+    MotifSchedule,
+    Reprisal,
+    ReprisalQueueEntry,
+    ReprisalSchedule,
+    SessionLocal,
+    TableVersion,
+    motif_search,
+)
+
+# loads a relationship a motif response serializes, avoiding a lazy load per motif
+motif_relationship_options = {
+    "citation": joinedload(Motif.citation),
+    "cloze_deletions": selectinload(Motif.cloze_deletions),
+}
+motif_response_options = tuple(motif_relationship_options.values())
+
+# rows fetched per partition when streaming sampling terms
+SAMPLING_TERMS_BATCH_SIZE = 10_000
+
+# julianday() of 1970-01-01, for days since the epoch
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+
+@dataclass
+class SamplingTerms:
+    """
+    The parts of every motif's sampling weight that don't depend on the time,
+    as parallel arrays: rowids, factors of (1 + cloze deletions) / (1 + reprisal
+    count), and the day (since the epoch) each was last seen. A motif last seen
+    before now weighs factor * now + intercept.
+
+    They reflect the reprisals up to `last_reprisal_rowid`, which were committed
+    as of the reprisal table's `reprisal_version`.
+    """
+
+    rowids: array
+    indices: dict[int, int]  # of each rowid
+    factors: array
+    seen_days: array
+    intercepts: array
+    last_seen_day: float
+    reprisal_version: int
+    last_reprisal_rowid: int
+
+
+# cached by the motif and cloze_deletion table versions they were read at, so
+# they're reused until a write to either table, from any process; reprisals
+# only refresh the terms of the motifs they reprised
+sampling_terms_cache: dict[tuple[int, int], SamplingTerms] = {}
+
+
+def sampling_terms_columns(cloze_deletion_count) -> tuple:
+    """A motif's rowid, sampling factor and the day it was last seen."""
+    return (
+        literal_column("motif.rowid"),
+        (1.0 + cloze_deletion_count) / (1 + Motif.reprisal_count),
+        func.julianday(func.coalesce(Motif.last_reprised_at, Motif.created_at))
+        - UNIX_EPOCH_JULIAN_DAY,
+    )
 
 
 class MotifRepository:
     def __init__(self, session):
         self.session = session
 
-    def add_motif(self, content: str, citation: Citation = None) -> Motif:
-        motif = Motif(content=content, citation=citation)
+    def add_motif(
+        self, content: str, citation: Citation = None, citation_uuid: str = None
+    ) -> Motif:
+        motif = Motif(content=content, cloze_deletions=[])
+        if citation_uuid:
+            motif.citation_uuid = citation_uuid
+        else:
+            motif.citation = citation
         self.session.add(motif)
         self.session.flush()
+        ReprisalQueueRepository(self.session).invalidate()
         return motif
 
+    def add_motifs(self, motifs: list[dict]) -> None:
+        """Insert many motif rows with one executemany, e.g. for a bulk import."""
+        if motifs:
+            self.session.execute(
+                insert(Motif.__table__).execution_options(render_nulls=True), motifs
+            )
+            ReprisalQueueRepository(self.session).invalidate()
+
     def get_motif(self, uuid: str) -> Motif:
-        return self.session.query(Motif).filter_by(uuid=uuid).one_or_none()
+        return (
+            self.session.query(Motif)
+            .options(*motif_response_options)
+            .filter_by(uuid=uuid)
+            .one_or_none()
+        )
 
     def get_motifs(self) -> list[Motif]:
         return self.session.query(Motif).all()
@@ -22,16 +126,309 @@ class MotifRepository:
     def get_motifs_with_cloze_deletions(self) -> list[Motif]:
         return self.session.query(Motif).join(Motif.cloze_deletions).all()  # inner join
 
-    def get_motifs_paginated(self, page: int, page_size: int) -> list[Motif]:
+    def get_least_reprised_motifs(
+        self, limit: int, exclude: list[str] = ()
+    ) -> list[tuple[Motif, int]]:
+        """
+        Select motifs eligible for the next reprisal set in a single query.
+
+        A motif is eligible when it has been reprised fewer times than the most
+        reprised motif, or when every motif has been reprised equally. Eligible
+        motifs are returned in insertion order along with their reprisal count,
+        skipping any uuids in `exclude`. Counts come from the denormalized
+        motif.reprisal_count column, so the min/max lookups are served by its index.
+        """
+        reprisal_max = self.session.query(
+            func.max(Motif.reprisal_count)
+        ).scalar_subquery()
+        reprisal_min = self.session.query(
+            func.min(Motif.reprisal_count)
+        ).scalar_subquery()
+        return (
+            self.session.query(Motif, Motif.reprisal_count)
+            .options(joinedload(Motif.citation))
+            .filter(
+                or_(
+                    Motif.reprisal_count < reprisal_max,
+                    reprisal_max == reprisal_min,
+                ),
+                Motif.uuid.not_in(exclude),
+            )
+            .order_by(literal_column("motif.rowid"))  # sqlite insertion order
+            .limit(limit)
+            .all()
+        )
+
+    def get_sampling_weights(
+        self, now: datetime, exclude: list[str] = ()
+    ) -> tuple[array, array]:
+        """
+        Compute a sampling weight for every motif in one pass over flat arrays.
+
+        weight = (1 + days since last seen) * (1 + cloze deletions)
+                 / (1 + reprisal count)
+
+        Motifs that have never been reprised count their age from creation.
+        Excluded motifs weigh 0.
+
+        Returns:
+            Parallel arrays of motif rowids and weights
+        """
+        terms = self.get_sampling_terms()
+        now_days = (now - datetime(1970, 1, 1)) / timedelta(days=1)
+        if now_days >= terms.last_seen_day:
+            # linear in now, so it's mapped without a Python call per motif
+            weights = array(
+                "d",
+                map(add, map(mul, terms.factors, repeat(now_days)), terms.intercepts),
+            )
+        else:
+            weights = array(
+                "d",
+                map(
+                    lambda factor, seen_day: (1 + max(now_days - seen_day, 0)) * factor,
+                    terms.factors,
+                    terms.seen_days,
+                ),
+            )
+        if exclude:
+            for rowid in self.session.scalars(
+                select(literal_column("motif.rowid")).where(Motif.uuid.in_(exclude))
+            ):
+                # a motif added since the terms were read isn't weighed anyway
+                if rowid in terms.indices:
+                    weights[terms.indices[rowid]] = 0
+        return terms.rowids, weights
+
+    def get_sampling_terms(self) -> SamplingTerms:
+        """
+        The sampling terms of every motif, from the cache unless this session
+        has written motifs, cloze deletions or reprisals it hasn't committed.
+        Reprisals committed since they were cached are applied to a copy,
+        reading only the motifs they reprised.
+        """
+        tables = ("motif", "cloze_deletion", "reprisal")
+        versions = TableVersionRepository(self.session).get_table_versions(tables)
+        motif_version, cloze_deletion_version, reprisal_version = (
+            versions[name].version if name in versions else 0 for name in tables
+        )
+        key = (motif_version, cloze_deletion_version)
+        cacheable = not set(tables) & self.session.info.get("written_tables", set())
+        terms = sampling_terms_cache.get(key) if cacheable else None
+        if terms is None:
+            terms = self._read_sampling_terms(reprisal_version)
+        elif terms.reprisal_version != reprisal_version:
+            terms = self._refresh_sampling_terms(terms, reprisal_version)
+        else:
+            return terms
+
+        if cacheable:
+            sampling_terms_cache.clear()
+            sampling_terms_cache[key] = terms
+        return terms
+
+    def _get_last_reprisal_rowid(self) -> int:
+        # read before the terms, so a reprisal committed in between is read again
+        # rather than missed
+        return self.session.scalar(
+            select(func.coalesce(func.max(literal_column("rowid")), 0)).select_from(
+                Reprisal
+            )
+        )
+
+    def _read_sampling_terms(self, reprisal_version: int) -> SamplingTerms:
+        """Read every motif's terms, streamed a partition at a time."""
+        last_reprisal_rowid = self._get_last_reprisal_rowid()
+        cloze_deletion_counts = (
+            select(ClozeDeletion.motif_uuid, func.count().label("cloze_deletion_count"))
+            .group_by(ClozeDeletion.motif_uuid)
+            .subquery()
+        )
+        result = self.session.execute(
+            select(
+                *sampling_terms_columns(
+                    func.coalesce(cloze_deletion_counts.c.cloze_deletion_count, 0)
+                )
+            )
+            .outerjoin(
+                cloze_deletion_counts,
+                cloze_deletion_counts.c.motif_uuid == Motif.uuid,
+            )
+            .execution_options(yield_per=SAMPLING_TERMS_BATCH_SIZE)
+        )
+        rowids, factors, seen_days = array("q"), array("d"), array("d")
+        for rows in result.partitions():
+            rowids.extend(map(itemgetter(0), rows))
+            factors.extend(map(itemgetter(1), rows))
+            seen_days.extend(map(itemgetter(2), rows))
+        return SamplingTerms(
+            rowids,
+            indices=dict(zip(rowids, range(len(rowids)), strict=True)),
+            factors=factors,
+            seen_days=seen_days,
+            intercepts=array("d", map(mul, factors, map(sub, repeat(1), seen_days))),
+            last_seen_day=max(seen_days, default=0),
+            reprisal_version=reprisal_version,
+            last_reprisal_rowid=last_reprisal_rowid,
+        )
+
+    def _refresh_sampling_terms(
+        self, terms: SamplingTerms, reprisal_version: int
+    ) -> SamplingTerms:
+        """
+        A copy of `terms` with the motifs reprised since they were read re-read,
+        so readers of the cached terms never see them half updated.
+        """
+        last_reprisal_rowid = self._get_last_reprisal_rowid()
+        rows = self.session.execute(
+            select(
+                *sampling_terms_columns(
+                    select(func.count())
+                    .where(ClozeDeletion.motif_uuid == Motif.uuid)
+                    .scalar_subquery()
+                )
+            ).where(
+                Motif.uuid.in_(
+                    select(Reprisal.motif_uuid).where(
+                        literal_column("reprisal.rowid") > terms.last_reprisal_rowid
+                    )
+                )
+            )
+        )
+        factors, seen_days, intercepts = (
+            array("d", terms.factors),
+            array("d", terms.seen_days),
+            array("d", terms.intercepts),
+        )
+        last_seen_day = terms.last_seen_day
+        for rowid, factor, seen_day in rows:
+            index = terms.indices.get(rowid)
+            if index is None:
+                continue  # added since the motif version was read, so read again
+            factors[index] = factor
+            seen_days[index] = seen_day
+            intercepts[index] = factor * (1 - seen_day)
+            last_seen_day = max(last_seen_day, seen_day)
+        return SamplingTerms(
+            terms.rowids,
+            indices=terms.indices,
+            factors=factors,
+            seen_days=seen_days,
+            intercepts=intercepts,
+            last_seen_day=last_seen_day,
+            reprisal_version=reprisal_version,
+            last_reprisal_rowid=last_reprisal_rowid,
+        )
+
+    def get_motifs_by_rowid(self, rowids: list[int]) -> list[Motif]:
+        motifs = (
+            self.session.query(Motif, literal_column("motif.rowid"))
+            .options(joinedload(Motif.citation))
+            .filter(literal_column("motif.rowid").in_(rowids))
+            .all()
+        )
+        motifs_by_rowid = {rowid: motif for motif, rowid in motifs}
+        return [motifs_by_rowid[rowid] for rowid in rowids]
+
+    def get_motifs_paginated(
+        self,
+        page: int,
+        page_size: int,
+        include: Iterable[str] = tuple(motif_relationship_options),
+    ) -> list[Motif]:
+        """A page of motifs, newest first, loading only the relationships in `include`."""
         offset = (page - 1) * page_size
         return (
             self.session.query(Motif)
-            .order_by(Motif.created_at.desc())
+            .options(*(motif_relationship_options[name] for name in include))
+            .order_by(Motif.created_at.desc(), Motif.uuid.desc())
             .offset(offset)
             .limit(page_size)
             .all()
         )
 
+    def get_motifs_after(
+        self,
+        after: tuple[datetime, str] | None,
+        page_size: int,
+        include: Iterable[str] = tuple(motif_relationship_options),
+    ) -> list[Motif]:
+        """
+        Keyset pagination: the page of motifs following the (created_at, uuid)
+        key `after`, newest first, loading only the relationships in `include`.
+        Seeks through the (created_at, uuid) index, so every page costs the same
+        however deep it is.
+        """
+        query = self.session.query(Motif).options(
+            *(motif_relationship_options[name] for name in include)
+        )
+        if after is not None:
+            query = query.filter(tuple_(Motif.created_at, Motif.uuid) < after)
+        return (
+            query.order_by(Motif.created_at.desc(), Motif.uuid.desc())
+            .limit(page_size)
+            .all()
+        )
+
+    def iter_motifs(
+        self, since: datetime | None = None, batch_size: int = 1000
+    ) -> Iterator[Motif]:
+        """
+        Stream every motif, oldest first, with its citation and cloze deletions.
+        Motifs are read in keyset batches of `batch_size`, each with its own
+        eager loads, so memory stays flat however large the deck. With `since`,
+        only motifs written (created, edited, reprised or given new cloze
+        deletions) at or after it.
+        """
+        query = self.session.query(Motif).options(*motif_response_options)
+        if since is not None:
+            query = query.filter(Motif.updated_at >= since)
+        after = None
+        while True:
+            batch = query
+            if after is not None:
+                batch = batch.filter(tuple_(Motif.created_at, Motif.uuid) > after)
+            motifs = (
+                batch.order_by(Motif.created_at, Motif.uuid).limit(batch_size).all()
+            )
+            if not motifs:
+                return
+            yield from motifs
+            after = (motifs[-1].created_at, motifs[-1].uuid)
+
+    def search_motifs(self, text: str, limit: int) -> list[tuple[Motif, str]]:
+        """
+        Full-text search over motif content and citation titles, best match
+        first, with a snippet of the content highlighting the matched terms.
+        Each word must match; the last also matches as a prefix, so results
+        keep up while a query is typed.
+        """
+        terms = ['"{}"'.format(term.replace('"', '""')) for term in text.split()]
+        if not terms:
+            return []
+
+        # rank and cut in the FTS table before joining, so only the returned
+        # matches are looked up
+        fts = literal_column("motif_search")
+        matches = (
+            select(
+                motif_search.c.motif_uuid,
+                func.snippet(fts, 0, "<mark>", "</mark>", "…", 16).label("snippet"),
+                literal_column("rank"),
+            )
+            .where(fts.op("MATCH")(f"{{content citation}} : {' '.join(terms)}*"))
+            .order_by(literal_column("rank"))
+            .limit(limit)
+            .subquery()
+        )
+        return (
+            self.session.query(Motif, matches.c.snippet)
+            .options(*motif_response_options)
+            .join(matches, matches.c.motif_uuid == Motif.uuid)
+            .order_by(matches.c.rank)
+            .all()
+        )
+
     def get_motifs_count(self) -> int:
         return self.session.query(Motif).count()
 
@@ -42,6 +439,8 @@ class MotifRepository:
         return motif
 
     def delete_motif(self, uuid: str) -> None:
+        ReprisalQueueRepository(self.session).invalidate()
+        self.session.execute(delete(Job).where(Job.motif_uuid == uuid))
         motif = self.get_motif(uuid)
         self.session.delete(motif)
         self.session.flush()
@@ -53,6 +452,49 @@ class MotifRepository:
         return motif
 
 
+# title -> uuid of committed citations, shared by every session in the process.
+# What a session resolves is only published here once it commits, and a commit
+# that renamed or deleted a citation empties it.
+citation_uuid_cache: dict[str, str] = {}
+
+
+def _mark_citations_changed(session) -> None:
+    # what the session resolved before the change may be stale, so it's dropped
+    session.info["citations_changed"] = True
+    session.info.pop("citation_uuids", None)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _mark_citation_flush(session, flush_context):
+    if any(isinstance(obj, Citation) for obj in (*session.dirty, *session.deleted)):
+        _mark_citations_changed(session)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _mark_citation_write(orm_execute_state):
+    table = getattr(orm_execute_state.statement, "table", None)
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and (
+        table is not None and table.name == Citation.__tablename__
+    ):
+        _mark_citations_changed(orm_execute_state.session)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_citation_uuids(session):
+    citation_uuids = session.info.pop("citation_uuids", {})
+    if session.info.pop("citations_changed", False):
+        # even titles resolved after the change could have been renamed since
+        citation_uuid_cache.clear()
+    else:
+        citation_uuid_cache.update(citation_uuids)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_citation_uuids(session):
+    session.info.pop("citations_changed", None)
+    session.info.pop("citation_uuids", None)
+
+
 class CitationRepository:
     def __init__(self, session):
         self.session = session
@@ -72,6 +514,67 @@ class CitationRepository:
     def get_citation_by_title(self, title: str) -> Citation:
         return self.session.query(Citation).filter_by(title=title).one_or_none()
 
+    def get_or_create_citation_uuid(self, title: str) -> str:
+        citation_uuids, _ = self.get_or_create_citation_uuids([title])
+        return citation_uuids[title]
+
+    def get_or_create_citation_uuids(
+        self, titles: Iterable[str]
+    ) -> tuple[dict[str, str], int]:
+        """
+        Resolve citation titles to uuids, creating the citations that don't exist.
+
+        Titles already in the cache cost nothing. The rest are resolved with one
+        INSERT ... ON CONFLICT DO UPDATE RETURNING against the unique title index,
+        so a title created concurrently is never duplicated. The update is a no-op
+        that leaves the title alone, so the rename trigger doesn't fire; unlike DO
+        NOTHING, it returns the titles that already existed too.
+
+        Returns:
+            The uuid of every title, and how many citations were created
+        """
+        resolved = self.session.info.setdefault("citation_uuids", {})
+        citation_uuids = {}
+        missing = []
+        for title in dict.fromkeys(titles):
+            uuid = citation_uuid_cache.get(title) or resolved.get(title)
+            if uuid:
+                citation_uuids[title] = uuid
+            else:
+                missing.append(title)
+        if not missing:
+            return citation_uuids, 0
+
+        created_at = datetime.now()
+        new_uuids = {title: str(uuid4()) for title in missing}
+        found = dict(
+            self.session.execute(
+                sqlite_insert(Citation.__table__)
+                .on_conflict_do_update(
+                    index_elements=["title"],
+                    set_={"created_at": Citation.created_at},
+                )
+                .returning(Citation.title, Citation.uuid),
+                [
+                    {"uuid": uuid, "title": title, "created_at": created_at}
+                    for title, uuid in new_uuids.items()
+                ],
+            ).all()
+        )
+        citation_uuids.update(found)
+        resolved.update(found)
+        created = sum(uuid == new_uuids[title] for title, uuid in found.items())
+        return citation_uuids, created
+
+
+@dataclass
+class ReprisalResult:
+    uuid: str
+    set_uuid: str
+    motif: Motif
+    cloze_deletion: ClozeDeletion | None
+    created_at: datetime
+
 
 class ReprisalRepository:
     def __init__(self, session):
@@ -87,8 +590,64 @@ class ReprisalRepository:
         )
         self.session.add(reprisal)
         self.session.flush()
+
+        self.session.query(Motif).filter_by(uuid=motif_uuid).execution_options(
+            versioned_as="reprisal"
+        ).update(
+            {
+                Motif.reprisal_count: Motif.reprisal_count + 1,
+                Motif.last_reprised_at: reprisal.created_at,
+            }
+        )
         return reprisal
 
+    def add_reprisals(
+        self, set_uuid: str, selections: list[tuple[Motif, ClozeDeletion | None]]
+    ) -> list[ReprisalResult]:
+        """
+        Insert a whole reprisal set with one multi-row INSERT and bump the
+        counters of its motifs with one UPDATE.
+        """
+        if not selections:
+            return []
+
+        created_at = datetime.now()
+        results = [
+            ReprisalResult(
+                uuid=str(uuid4()),
+                set_uuid=set_uuid,
+                motif=motif,
+                cloze_deletion=cloze_deletion,
+                created_at=created_at,
+            )
+            for motif, cloze_deletion in selections
+        ]
+        self.session.execute(
+            # render_nulls keeps rows with and without a cloze deletion in one batch
+            insert(Reprisal).execution_options(render_nulls=True),
+            [
+                {
+                    "uuid": result.uuid,
+                    "motif_uuid": result.motif.uuid,
+                    "set_uuid": set_uuid,
+                    "cloze_deletion_uuid": result.cloze_deletion.uuid
+                    if result.cloze_deletion
+                    else None,
+                    "created_at": created_at,
+                }
+                for result in results
+            ],
+        )
+        self.session.query(Motif).filter(
+            Motif.uuid.in_([motif.uuid for motif, _ in selections])
+        ).execution_options(versioned_as="reprisal").update(
+            {
+                Motif.reprisal_count: Motif.reprisal_count + 1,
+                Motif.last_reprised_at: created_at,
+            }
+        )
+        return results
+
 
 class ClozeDeletionRepository:
     def __init__(self, session):
@@ -97,25 +656,60 @@ class ClozeDeletionRepository:
     def get_cloze_deletion(self, uuid: str) -> ClozeDeletion:
         return self.session.query(ClozeDeletion).filter_by(uuid=uuid).one_or_none()
 
+    def get_cloze_deletions_by_motif(
+        self, motif_uuids: list[str]
+    ) -> dict[str, list[ClozeDeletion]]:
+        cloze_deletions = (
+            self.session.query(ClozeDeletion)
+            .filter(ClozeDeletion.motif_uuid.in_(motif_uuids))
+            .all()
+        )
+        cloze_deletions_by_motif = {}
+        for cloze_deletion in cloze_deletions:
+            cloze_deletions_by_motif.setdefault(cloze_deletion.motif_uuid, []).append(
+                cloze_deletion
+            )
+        return cloze_deletions_by_motif
+
     def add_cloze_deletion(self, motif_uuid: str, mask_tuples: list) -> ClozeDeletion:
         cloze_deletion = ClozeDeletion(motif_uuid=motif_uuid, mask_tuples=mask_tuples)
         self.session.add(cloze_deletion)
         self.session.flush()
+        self._touch_motifs([motif_uuid])
+        ReprisalQueueRepository(self.session).invalidate()
         return cloze_deletion
 
+    def add_cloze_deletions(self, cloze_deletions: list[dict]) -> None:
+        if cloze_deletions:
+            self.session.execute(insert(ClozeDeletion.__table__), cloze_deletions)
+            self._touch_motifs({cd["motif_uuid"] for cd in cloze_deletions})
+            ReprisalQueueRepository(self.session).invalidate()
+
     def update_cloze_deletion(
         self, cloze_deletion_uuid: str, mask_tuples: list
     ) -> ClozeDeletion:
         cloze_deletion = self.get_cloze_deletion(cloze_deletion_uuid)
         cloze_deletion.mask_tuples = mask_tuples
         self.session.flush()
+        self._touch_motifs([cloze_deletion.motif_uuid])
         return cloze_deletion
 
     def delete_cloze_deletion(self, uuid: str) -> None:
         cloze_deletion = self.get_cloze_deletion(uuid)
         if cloze_deletion:
+            ReprisalQueueRepository(self.session).invalidate()
             self.session.delete(cloze_deletion)
             self.session.flush()
+            self._touch_motifs([cloze_deletion.motif_uuid])
+
+    def _touch_motifs(self, motif_uuids: Iterable[str]) -> None:
+        """Bump the updated_at of the motifs whose cloze deletions changed."""
+        self.session.execute(
+            update(Motif)
+            .where(Motif.uuid.in_(motif_uuids))
+            .values(updated_at=datetime.now())
+            .execution_options(synchronize_session=False)
+        )
 
 
 class ReprisalScheduleRepository:
@@ -143,3 +737,250 @@ class ReprisalScheduleRepository:
         self.session.add(reprisal_schedule)
         self.session.flush()
         return reprisal_schedule
+
+
+class MotifScheduleRepository:
+    def __init__(self, session):
+        self.session = session
+
+    def get_motif_schedules(self, motif_uuids: list[str]) -> dict[str, MotifSchedule]:
+        motif_schedules = (
+            self.session.query(MotifSchedule)
+            .filter(MotifSchedule.motif_uuid.in_(motif_uuids))
+            .all()
+        )
+        return {schedule.motif_uuid: schedule for schedule in motif_schedules}
+
+    def get_due_motifs(
+        self, due_by: datetime, limit: int, exclude: list[str] = ()
+    ) -> list[Motif]:
+        return (
+            self.session.query(Motif)
+            .options(joinedload(Motif.citation))
+            .join(MotifSchedule, MotifSchedule.motif_uuid == Motif.uuid)
+            .filter(MotifSchedule.due_at <= due_by, Motif.uuid.not_in(exclude))
+            .order_by(MotifSchedule.due_at)
+            .limit(limit)
+            .all()
+        )
+
+    def get_next_due_at(self, after: datetime) -> datetime | None:
+        """The earliest due date after `after`, read off the `due_at` index."""
+        return self.session.scalar(
+            select(func.min(MotifSchedule.due_at)).where(MotifSchedule.due_at > after)
+        )
+
+
+class ReprisalQueueRepository:
+    def __init__(self, session):
+        self.session = session
+
+    def get_queued_set_count(self) -> int:
+        return self.session.query(
+            func.count(ReprisalQueueEntry.set_uuid.distinct())
+        ).scalar()
+
+    def get_queued_motif_uuids(self) -> list[str]:
+        return [
+            motif_uuid
+            for (motif_uuid,) in self.session.query(ReprisalQueueEntry.motif_uuid)
+        ]
+
+    def add_queued_set(
+        self, selections: list[tuple[Motif, ClozeDeletion | None]]
+    ) -> str:
+        set_uuid = str(uuid4())
+        created_at = datetime.now()
+        self.session.execute(
+            insert(ReprisalQueueEntry).execution_options(render_nulls=True),
+            [
+                {
+                    "uuid": str(uuid4()),
+                    "set_uuid": set_uuid,
+                    "position": position,
+                    "motif_uuid": motif.uuid,
+                    "cloze_deletion_uuid": cloze_deletion.uuid
+                    if cloze_deletion
+                    else None,
+                    "created_at": created_at,
+                }
+                for position, (motif, cloze_deletion) in enumerate(selections)
+            ],
+        )
+        return set_uuid
+
+    def pop_queued_set(self) -> list[tuple[Motif, ClozeDeletion | None]]:
+        """
+        Remove the oldest queued set and return its motifs and cloze deletions.
+
+        The set is claimed with a single DELETE ... RETURNING so concurrent
+        consumers never serve the same set twice.
+        """
+        entries = self.session.execute(
+            delete(ReprisalQueueEntry)
+            .where(ReprisalQueueEntry.set_uuid == self._oldest_set_uuid())
+            .returning(
+                ReprisalQueueEntry.position,
+                ReprisalQueueEntry.motif_uuid,
+                ReprisalQueueEntry.cloze_deletion_uuid,
+            )
+        ).all()
+        return self._get_selections(entries)
+
+    def peek_queued_set(self) -> list[tuple[Motif, ClozeDeletion | None]]:
+        """Return the oldest queued set without removing it."""
+        entries = self.session.query(
+            ReprisalQueueEntry.position,
+            ReprisalQueueEntry.motif_uuid,
+            ReprisalQueueEntry.cloze_deletion_uuid,
+        ).filter(ReprisalQueueEntry.set_uuid == self._oldest_set_uuid())
+        return self._get_selections(entries.all())
+
+    def _oldest_set_uuid(self):
+        return (
+            self.session.query(ReprisalQueueEntry.set_uuid)
+            .order_by(ReprisalQueueEntry.created_at)
+            .limit(1)
+            .scalar_subquery()
+        )
+
+    def _get_selections(self, entries) -> list[tuple[Motif, ClozeDeletion | None]]:
+        if not entries:
+            return []
+
+        entries = sorted(entries)
+        motifs = {
+            motif.uuid: motif
+            for motif in self.session.query(Motif)
+            .options(joinedload(Motif.citation))
+            .filter(Motif.uuid.in_([entry.motif_uuid for entry in entries]))
+        }
+        cloze_deletions = {
+            cloze_deletion.uuid: cloze_deletion
+            for cloze_deletion in self.session.query(ClozeDeletion).filter(
+                ClozeDeletion.uuid.in_([entry.cloze_deletion_uuid for entry in entries])
+            )
+        }
+        return [
+            (motifs[entry.motif_uuid], cloze_deletions.get(entry.cloze_deletion_uuid))
+            for entry in entries
+        ]
+
+    def invalidate(self) -> None:
+        """
+        Drop every queued set. Called whenever motifs or cloze deletions are
+        added or removed, since queued selections may no longer be valid.
+        """
+        self.session.execute(delete(ReprisalQueueEntry))
+
+
+class JobRepository:
+    def __init__(self, session):
+        self.session = session
+
+    def add_job(self, kind: str, motif_uuid: str) -> Job:
+        job = Job(kind=kind, motif_uuid=motif_uuid)
+        self.session.add(job)
+        self.session.flush()
+        return job
+
+    def get_job(self, uuid: str) -> Job:
+        return self.session.get(Job, uuid)
+
+    def claim_job(self, now: datetime, lease: float, max_attempts: int) -> Row | None:
+        """
+        Claim the oldest due job, holding it for `lease` seconds, after which
+        it's due again in case its worker died. The claim is an UPDATE ...
+        RETURNING that re-checks the job is still due, so concurrent workers
+        (threads or processes) never both claim it; the loser gets None. An
+        idle poll is a single indexed read and writes nothing.
+
+        Each claim gets a new lease token, which completing or failing the job
+        requires, so a worker whose lease ran out can't overwrite the outcome of
+        the worker that reclaimed it. A job whose lease ran out on its last
+        attempt is failed rather than reclaimed.
+        """
+        is_due = (Job.status.in_(("pending", "running")), Job.run_after <= now)
+        while True:
+            job = self.session.execute(
+                select(Job.uuid, Job.attempts)
+                .where(*is_due)
+                .order_by(Job.run_after)
+                .limit(1)
+            ).first()
+            if job is None:
+                return None
+            if job.attempts < max_attempts:
+                break
+            self.session.execute(
+                update(Job)
+                .where(Job.uuid == job.uuid, *is_due)
+                .values(
+                    status="failed",
+                    error=f"Lease expired on attempt {job.attempts}",
+                    finished_at=now,
+                    lease_token=None,
+                )
+            )
+        return self.session.execute(
+            update(Job)
+            .where(Job.uuid == job.uuid, Job.attempts < max_attempts, *is_due)
+            .values(
+                status="running",
+                attempts=Job.attempts + 1,
+                run_after=now + timedelta(seconds=lease),
+                lease_token=str(uuid4()),
+            )
+            .returning(
+                Job.uuid, Job.kind, Job.motif_uuid, Job.attempts, Job.lease_token
+            )
+        ).one_or_none()
+
+    def complete_job(self, uuid: str, lease_token: str, now: datetime) -> bool:
+        """
+        Mark the job succeeded if its lease is still held by `lease_token`,
+        returning whether it was; if not, the caller should roll back whatever
+        it wrote, as the job has been reclaimed.
+        """
+        result = self.session.execute(
+            update(Job)
+            .where(Job.uuid == uuid, Job.lease_token == lease_token)
+            .values(status="succeeded", error=None, finished_at=now, lease_token=None)
+        )
+        return result.rowcount == 1
+
+    def fail_job(
+        self,
+        uuid: str,
+        lease_token: str,
+        error: str,
+        now: datetime,
+        retry_at: datetime | None,
+    ) -> None:
+        """
+        Record a failed attempt, to be retried at `retry_at` if given, unless
+        the job's lease has passed to another worker.
+        """
+        if retry_at:
+            values = {"status": "pending", "run_after": retry_at}
+        else:
+            values = {"status": "failed", "finished_at": now}
+        self.session.execute(
+            update(Job)
+            .where(Job.uuid == uuid, Job.lease_token == lease_token)
+            .values(error=error, lease_token=None, **values)
+        )
+
+
+class TableVersionRepository:
+    def __init__(self, session):
+        self.session = session
+
+    def get_table_versions(self, names: Iterable[str]) -> dict[str, TableVersion]:
+        """The versions of the given tables; a table never written has none."""
+        return {
+            table_version.name: table_version
+            for table_version in self.session.scalars(
+                select(TableVersion).where(TableVersion.name.in_(names))
+            )
+        }
@@ -0,0 +1,221 @@
+import random
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_right, insort
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy.orm import Session
+
+from reprise import settings
+from reprise.db import ClozeDeletion, Motif, MotifSchedule
+from reprise.repository import MotifRepository, MotifScheduleRepository
+
+
+class Scheduler(ABC):
+    """
+    Decides which motifs make up the next reprisal set.
+
+    `select` picks up to `limit` motifs, skipping any uuids in `exclude`, and
+    `record` is called with the motifs that were actually reprised so the
+    scheduler can update its state.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    @abstractmethod
+    def select(
+        self, limit: int, now: datetime = None, exclude: list[str] = ()
+    ) -> list[Motif]: ...
+
+    @abstractmethod
+    def record(self, motifs: list[Motif], reprised_at: datetime) -> None: ...
+
+    def choose_cloze_deletion(
+        self, cloze_deletions: list[ClozeDeletion]
+    ) -> ClozeDeletion:
+        return random.choice(cloze_deletions)
+
+    def selection_expires_at(self, now: datetime) -> datetime | None:
+        """
+        When `select` could start choosing differently with no write in between,
+        e.g. because motifs become due; None if only writes change it.
+        """
+        return None
+
+
+class BalancedScheduler(Scheduler):
+    """Reprise the least reprised motifs first so every motif is seen evenly."""
+
+    def __init__(self, session: Session):
+        super().__init__(session)
+        self.motif_repository = MotifRepository(session)
+
+    def select(
+        self, limit: int, now: datetime = None, exclude: list[str] = ()
+    ) -> list[Motif]:
+        motifs = self.motif_repository.get_least_reprised_motifs(limit, exclude)
+        return [motif for motif, _ in motifs]
+
+    def record(self, motifs: list[Motif], reprised_at: datetime) -> None:
+        pass  # reprisal counters are maintained by ReprisalRepository
+
+
+class DueDateScheduler(Scheduler):
+    """
+    Base for schedulers that keep a per-motif due date in `motif_schedule`.
+
+    Every motif has a schedule, due from when it was created until it's first
+    reprised, so selection reads due motifs off the `due_at` index, oldest first.
+    """
+
+    def __init__(self, session: Session):
+        super().__init__(session)
+        self.motif_schedule_repository = MotifScheduleRepository(session)
+
+    def select(
+        self, limit: int, now: datetime = None, exclude: list[str] = ()
+    ) -> list[Motif]:
+        return self.motif_schedule_repository.get_due_motifs(
+            now or datetime.now(), limit, exclude
+        )
+
+    def record(self, motifs: list[Motif], reprised_at: datetime) -> None:
+        motif_schedules = self.motif_schedule_repository.get_motif_schedules(
+            [motif.uuid for motif in motifs]
+        )
+        for motif in motifs:
+            motif_schedule = motif_schedules[motif.uuid]
+            self.advance(motif_schedule)
+            motif_schedule.due_at = reprised_at + timedelta(
+                days=motif_schedule.interval_days
+            )
+            motif_schedule.updated_at = reprised_at
+        self.session.flush()
+
+    @abstractmethod
+    def advance(self, motif_schedule: MotifSchedule) -> None: ...
+
+    def selection_expires_at(self, now: datetime) -> datetime | None:
+        return self.motif_schedule_repository.get_next_due_at(now)
+
+
+class LeitnerScheduler(DueDateScheduler):
+    """
+    Leitner boxes: each reprisal promotes a motif to the next box, and each box
+    waits twice as long as the previous one before the motif is due again.
+    """
+
+    box_intervals = [1, 2, 4, 8, 16, 32]  # days
+
+    def advance(self, motif_schedule: MotifSchedule) -> None:
+        motif_schedule.box = min(motif_schedule.box + 1, len(self.box_intervals))
+        motif_schedule.interval_days = self.box_intervals[motif_schedule.box - 1]
+
+
+class SM2Scheduler(DueDateScheduler):
+    """
+    SuperMemo 2. Reprisals aren't graded, so every reprisal is recorded with a
+    fixed recall quality (0-5, where 3 and above counts as recalled).
+    """
+
+    def __init__(self, session: Session, quality: int = 4):
+        super().__init__(session)
+        self.quality = quality
+
+    def advance(self, motif_schedule: MotifSchedule) -> None:
+        if self.quality >= 3:
+            if motif_schedule.repetitions == 0:
+                motif_schedule.interval_days = 1
+            elif motif_schedule.repetitions == 1:
+                motif_schedule.interval_days = 6
+            else:
+                motif_schedule.interval_days = round(
+                    motif_schedule.interval_days * motif_schedule.ease_factor
+                )
+            motif_schedule.repetitions += 1
+        else:
+            motif_schedule.repetitions = 0
+            motif_schedule.interval_days = 1
+
+        penalty = 5 - self.quality
+        motif_schedule.ease_factor = max(
+            1.3, motif_schedule.ease_factor + 0.1 - penalty * (0.08 + penalty * 0.02)
+        )
+
+
+class WeightedScheduler(Scheduler):
+    """
+    Weighted random sampling without replacement, favouring motifs that are
+    stale, rarely reprised and rich in cloze deletions. Weights for the whole
+    deck are computed from flat arrays of per-motif terms, cached between
+    writes, and sampled by bisecting the cumulative weights, so no per-motif ORM
+    objects are built.
+
+    Passing a seed (or setting REPRISE_SEED) makes selections reproducible.
+    """
+
+    def __init__(self, session: Session, seed: int = None):
+        super().__init__(session)
+        self.motif_repository = MotifRepository(session)
+        self.random = random.Random(seed if seed is not None else settings.REPRISE_SEED)
+
+    def select(
+        self, limit: int, now: datetime = None, exclude: list[str] = ()
+    ) -> list[Motif]:
+        rowids, weights = self.motif_repository.get_sampling_weights(
+            now or datetime.now(), exclude
+        )
+        indices = self.sample(weights, limit)
+        return self.motif_repository.get_motifs_by_rowid([rowids[i] for i in indices])
+
+    def sample(self, weights: array, k: int) -> list[int]:
+        """
+        Draw up to `k` distinct indices with probability proportional to weight.
+
+        The cumulative weights are built once. Each draw is taken over the
+        weight not yet chosen and shifted past the intervals of the indices
+        already chosen, so draws aren't rejected and nothing is rebuilt.
+        """
+        cumulative_weights = array("d", accumulate(weights))
+        remaining = cumulative_weights[-1] if cumulative_weights else 0
+        k = min(k, len(weights) - weights.count(0))
+        chosen, ordered = [], []  # in draw order, and by index for shifting
+        for _ in range(32 * k):
+            if len(chosen) == k:
+                break
+            target = self.random.random() * remaining
+            for index in ordered:
+                if target < cumulative_weights[index] - weights[index]:
+                    break
+                target += weights[index]
+            index = min(bisect_right(cumulative_weights, target), len(weights) - 1)
+            # rounding can land a draw on the edge of a chosen or empty interval
+            if weights[index] > 0 and index not in chosen:
+                chosen.append(index)
+                insort(ordered, index)
+                remaining -= weights[index]
+        return chosen
+
+    def record(self, motifs: list[Motif], reprised_at: datetime) -> None:
+        pass  # weights are derived from the reprisal counters
+
+    def choose_cloze_deletion(
+        self, cloze_deletions: list[ClozeDeletion]
+    ) -> ClozeDeletion:
+        return self.random.choice(cloze_deletions)
+
+
+SCHEDULERS = {
+    "balanced": BalancedScheduler,
+    "leitner": LeitnerScheduler,
+    "sm2": SM2Scheduler,
+    "weighted": WeightedScheduler,
+}
+
+
+def get_scheduler(name: str, session: Session) -> Scheduler:
+    if name not in SCHEDULERS:
+        raise ValueError(f"Unknown scheduler {name}")
+    return SCHEDULERS[name](session)
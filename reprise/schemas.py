@@ -1,6 +1,30 @@
-from typing import Any, Dict, List, Optional, Tuple
+import base64
+import json
+from datetime import datetime
+from typing import Annotated, List, Literal, Optional, Tuple, Union, get_args
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, conint, field_validator
+from pydantic_core import PydanticCustomError
+
+from reprise import settings
+
+
+def encode_cursor(created_at: datetime, uuid: str) -> str:
+    """Encode a motif's sort key as an opaque pagination cursor."""
+    key = json.dumps([created_at.isoformat(), uuid])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        created_at, uuid = json.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.fromisoformat(created_at), uuid
+    except Exception as e:
+        raise ValueError(f"Invalid cursor {cursor}") from e
+
+
+Uint32 = conint(ge=0, le=2**32 - 1)
+MaskTuple = Tuple[Uint32, Uint32]  # stored packed as uint32s
 
 
 # Pydantic schemas for request validation
@@ -16,12 +40,12 @@ class CitationResponse(BaseModel):
 
 class ClozeDeletionCreate(BaseModel):
     motif_uuid: str
-    mask_tuples: List[Tuple[int, int]]
+    mask_tuples: List[MaskTuple]
 
 
 class ClozeDeletionUpdate(BaseModel):
     uuid: str
-    mask_tuples: List[Tuple[int, int]]
+    mask_tuples: List[MaskTuple]
 
 
 class ClozeDeletionResponse(BaseModel):
@@ -35,6 +59,36 @@ class MotifCreate(BaseModel):
     auto_generate_cloze_deletions: bool = False
 
 
+class MotifImport(BaseModel):
+    content: str
+    citation: Optional[str] = None
+    cloze_deletions: List[List[MaskTuple]] = []
+
+
+class MotifExport(BaseModel):
+    uuid: str
+    content: str
+    created_at: str
+    citation: Optional[str] = None
+    cloze_deletions: List[List[MaskTuple]] = []
+    reprisal_count: int
+    last_reprised_at: Optional[str] = None
+
+
+class ExportParams(BaseModel):
+    since: Optional[datetime] = None
+
+
+class ImportParams(BaseModel):
+    format: Literal["jsonl", "csv", "markdown"] = "jsonl"
+
+
+class ImportResponse(BaseModel):
+    motifs: int
+    citations: int
+    cloze_deletions: int
+
+
 class MotifUpdate(BaseModel):
     content: str
     citation: Optional[str] = None
@@ -48,14 +102,79 @@ class MotifResponse(BaseModel):
     cloze_deletions: Optional[List[ClozeDeletionResponse]] = None
 
 
+class MotifCreateResponse(MotifResponse):
+    job_uuid: Optional[str] = None  # set when cloze deletions are being generated
+
+
+class JobResponse(BaseModel):
+    uuid: str
+    kind: str
+    motif_uuid: str
+    status: str
+    attempts: int
+    error: Optional[str] = None
+    created_at: str
+    finished_at: Optional[str] = None
+
+
+class SearchParams(BaseModel):
+    q: str
+    limit: conint(ge=1, le=100) = 20
+
+
+class MotifSearchResult(MotifResponse):
+    snippet: str
+
+
+class MotifSearchResponse(BaseModel):
+    motifs: List[MotifSearchResult]
+
+
+MotifField = Literal["uuid", "content", "created_at"]
+MotifRelationship = Literal["citation", "cloze_deletions"]
+
+
 class PaginationParams(BaseModel):
-    page: int = 1
-    page_size: int = 10
+    page: conint(ge=1) = 1
+    page_size: conint(ge=1) = 10
+    cursor: Optional[str] = None  # takes precedence over page
+    # comma-separated sparse fieldsets: the motif fields to return, all by
+    # default, and the relationships to include, all unless fields is given
+    fields: Optional[List[MotifField]] = None
+    include: Optional[List[MotifRelationship]] = None
+
+    @field_validator("fields", "include", mode="before")
+    @classmethod
+    def split_names(cls, names: List[str]) -> List[str]:
+        # repeated parameters arrive as a list, each of them maybe comma-separated
+        return [name for value in names for name in value.split(",") if name]
+
+    @property
+    def motif_fields(self) -> Tuple[str, ...]:
+        return tuple(self.fields) if self.fields is not None else get_args(MotifField)
+
+    @property
+    def motif_relationships(self) -> Tuple[str, ...]:
+        if self.include is not None:
+            return tuple(self.include)
+        return () if self.fields is not None else get_args(MotifRelationship)
+
+    @field_validator("cursor")
+    @classmethod
+    def validate_cursor(cls, cursor: Optional[str]) -> Optional[str]:
+        if cursor is not None:
+            try:
+                decode_cursor(cursor)
+            except ValueError as e:
+                # a plain ValueError in the error context can't be serialized
+                raise PydanticCustomError("cursor", str(e)) from e
+        return cursor
 
 
 class MotifListResponse(BaseModel):
-    motifs: List[Dict[str, Any]]
+    motifs: List[MotifResponse]
     total_count: int
+    next_cursor: Optional[str] = None
 
 
 class CitationListResponse(BaseModel):
@@ -66,5 +185,60 @@ class DeleteResponse(BaseModel):
     message: str
 
 
+# POST /batch operations. Where a uuid is expected, `$<index>` refers to the
+# motif or cloze deletion created by an earlier operation of the batch.
+class CreateMotifOperation(MotifCreate):
+    op: Literal["create_motif"]
+
+
+class UpdateMotifOperation(MotifUpdate):
+    op: Literal["update_motif"]
+    uuid: str
+
+
+class DeleteMotifOperation(BaseModel):
+    op: Literal["delete_motif"]
+    uuid: str
+
+
+class CreateClozeDeletionOperation(ClozeDeletionCreate):
+    op: Literal["create_cloze_deletion"]
+
+
+class UpdateClozeDeletionOperation(ClozeDeletionUpdate):
+    op: Literal["update_cloze_deletion"]
+
+
+class DeleteClozeDeletionOperation(BaseModel):
+    op: Literal["delete_cloze_deletion"]
+    uuid: str
+
+
+BatchOperation = Annotated[
+    Union[
+        CreateMotifOperation,
+        UpdateMotifOperation,
+        DeleteMotifOperation,
+        CreateClozeDeletionOperation,
+        UpdateClozeDeletionOperation,
+        DeleteClozeDeletionOperation,
+    ],
+    Field(discriminator="op"),
+]
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(
+        min_length=1, max_length=settings.BATCH_MAX_OPERATIONS
+    )
+
+
+class BatchResponse(BaseModel):
+    # in the order of the operations
+    results: List[
+        Union[MotifCreateResponse, MotifResponse, ClozeDeletionResponse, DeleteResponse]
+    ]
+
+
 class ErrorResponse(BaseModel):
     error: str
@@ -1,52 +1,100 @@
-import random
+from datetime import datetime
 from uuid import uuid4
 
 from sqlalchemy.orm import Session
 
+from reprise import settings
 from reprise.agent import generate_cloze_deletions
-from reprise.db import Reprisal
+from reprise.db import ClozeDeletion, Motif
 from reprise.repository import (
     ClozeDeletionRepository,
     MotifRepository,
+    ReprisalQueueRepository,
     ReprisalRepository,
+    ReprisalResult,
 )
+from reprise.scheduler import Scheduler, get_scheduler
 
 
 class Service:
     reprisal_count = 5
 
-    def __init__(self, session: Session):
+    def __init__(self, session: Session, scheduler: Scheduler = None):
         self.session = session
+        self.scheduler = scheduler or get_scheduler(settings.REPRISE_SCHEDULER, session)
         self.motif_repository = MotifRepository(session)
         self.reprisal_repository = ReprisalRepository(session)
         self.cloze_deletion_repository = ClozeDeletionRepository(session)
+        self.reprisal_queue_repository = ReprisalQueueRepository(session)
 
-    def reprise(self) -> list[Reprisal]:
-        motifs = self.motif_repository.get_motifs()
-        reprisal_max = max([len(motif.reprisals) for motif in motifs])
-        reprisal_min = min([len(motif.reprisals) for motif in motifs])
+    def reprise(self, reprisal_count: int = None) -> list[ReprisalResult]:
+        selections = []
+        if not reprisal_count:  # queued sets are built at the default size
+            selections = self.reprisal_queue_repository.pop_queued_set()
+        if not selections:
+            selections = self.select_set(reprisal_count or self.reprisal_count)
+        return self.record_set(selections)
 
-        reprisals = []
-        set_uuid = uuid4()
+    def preview(self, now: datetime = None) -> list[tuple[Motif, ClozeDeletion | None]]:
+        """The set `reprise` would serve next, without writing anything."""
+        return self.reprisal_queue_repository.peek_queued_set() or self.select_set(
+            self.reprisal_count, now=now
+        )
+
+    def select_set(
+        self, reprisal_count: int, exclude: list[str] = (), now: datetime = None
+    ) -> list[tuple[Motif, ClozeDeletion | None]]:
+        motifs = self.scheduler.select(reprisal_count, now=now, exclude=exclude)
+        cloze_deletions_by_motif = (
+            self.cloze_deletion_repository.get_cloze_deletions_by_motif(
+                [motif.uuid for motif in motifs]
+            )
+        )
+
+        selections = []
         for motif in motifs:
             # randomly select from cloze deletions if available
             # this means that the algorithm will never return the original motif
-            if motif.cloze_deletions:
-                cloze_deletion = random.choice(motif.cloze_deletions)
+            cloze_deletions = cloze_deletions_by_motif.get(motif.uuid)
+            cloze_deletion = (
+                self.scheduler.choose_cloze_deletion(cloze_deletions)
+                if cloze_deletions
+                else None
+            )
+            selections.append((motif, cloze_deletion))
+        return selections
+
+    def record_set(
+        self, selections: list[tuple[Motif, ClozeDeletion | None]]
+    ) -> list[ReprisalResult]:
+        reprisals = self.reprisal_repository.add_reprisals(str(uuid4()), selections)
+        self.scheduler.record(
+            [motif for motif, _ in selections], reprised_at=datetime.now()
+        )
+        return reprisals
 
-            if len(motif.reprisals) < reprisal_max or reprisal_max == reprisal_min:
-                reprisal = self.reprisal_repository.add_reprisal(
-                    motif.uuid,
-                    str(set_uuid),
-                    cloze_deletion.uuid if motif.cloze_deletions else None,
-                )
-                self.session.refresh(motif)
-                reprisals.append(reprisal)
+    def fill_queue(self, depth: int) -> int:
+        """
+        Top the reprisal queue up to `depth` sets. Motifs already waiting in the
+        queue are excluded so consecutive queued sets don't repeat each other.
 
-                if len(reprisals) == self.reprisal_count:
-                    break
+        Returns:
+            The number of sets added to the queue
+        """
+        queued_motif_uuids = set(
+            self.reprisal_queue_repository.get_queued_motif_uuids()
+        )
+        n_queued = self.reprisal_queue_repository.get_queued_set_count()
 
-        return reprisals
+        n_added = 0
+        for _ in range(depth - n_queued):
+            selections = self.select_set(self.reprisal_count, list(queued_motif_uuids))
+            if not selections:
+                break
+            self.reprisal_queue_repository.add_queued_set(selections)
+            queued_motif_uuids.update(motif.uuid for motif, _ in selections)
+            n_added += 1
+        return n_added
 
     def cloze_delete_motif(self, motif_uuid: str, n_max: int):
         """
@@ -61,7 +109,11 @@ class Service:
         """
         motif = self.motif_repository.get_motif(motif_uuid)
         mask_tuples_sets = generate_cloze_deletions(content=motif.content, n_max=n_max)
+        return self.add_cloze_deletions(motif_uuid, mask_tuples_sets)
 
+    def add_cloze_deletions(
+        self, motif_uuid: str, mask_tuples_sets: list[list[list[int]]]
+    ) -> list[ClozeDeletion]:
         cloze_deletions = []
         for mask_tuples in mask_tuples_sets:
             cloze_deletion = self.cloze_deletion_repository.add_cloze_deletion(
@@ -11,6 +11,55 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 # Logfire token
 LOGFIRE_TOKEN = os.getenv("LOGFIRE_TOKEN")
 
+# Database: SQLite pragmas applied to every new connection, and the connection pool
+# used for file-backed databases
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///reprise.db")
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-64000"))  # negative is KiB
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_FOREIGN_KEYS = os.getenv("SQLITE_FOREIGN_KEYS", "true").lower() == "true"
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "5"))
+DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "10"))
+
+# Raise instead of lazy loading relationships (set by the tests to catch N+1 queries)
+RAISE_ON_LAZY_LOAD = os.getenv("RAISE_ON_LAZY_LOAD", "false").lower() == "true"
+
+# Rows per transaction when bulk importing motifs
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+
+# Most operations one POST /batch request may run
+BATCH_MAX_OPERATIONS = int(os.getenv("BATCH_MAX_OPERATIONS", "100"))
+
+# Reprisal scheduler: one of "balanced", "leitner", "sm2" or "weighted"
+REPRISE_SCHEDULER = os.getenv("REPRISE_SCHEDULER", "balanced")
+
+# Optional seed so weighted selections can be replayed
+REPRISE_SEED = int(os.getenv("REPRISE_SEED")) if os.getenv("REPRISE_SEED") else None
+
+# Background reprisal queue: sets are pre-computed up to REPRISAL_QUEUE_DEPTH and
+# refilled every REPRISAL_QUEUE_INTERVAL seconds
+REPRISAL_QUEUE_WORKER = os.getenv("REPRISAL_QUEUE_WORKER", "false").lower() == "true"
+REPRISAL_QUEUE_DEPTH = int(os.getenv("REPRISAL_QUEUE_DEPTH", "3"))
+REPRISAL_QUEUE_INTERVAL = float(os.getenv("REPRISAL_QUEUE_INTERVAL", "60"))
+
+# Background jobs (cloze deletion generation) are run by JOB_WORKERS threads in the
+# API process, which poll every JOB_POLL_INTERVAL seconds. A failed job is retried
+# up to JOB_MAX_ATTEMPTS times, JOB_RETRY_DELAY seconds later and doubling after
+# each attempt; a job is reclaimed if its worker hasn't finished within JOB_LEASE,
+# and that worker's results are then discarded
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "10"))
+JOB_LEASE = float(os.getenv("JOB_LEASE", "300"))
+
+# Query profiling: statements slower than SLOW_QUERY_MS are reported per request,
+# with their EXPLAIN QUERY PLAN when EXPLAIN_SLOW_QUERIES is set
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+EXPLAIN_SLOW_QUERIES = os.getenv("EXPLAIN_SLOW_QUERIES", "false").lower() == "true"
+
 # Mailgun Settings
 MAILGUN_API_KEY = os.getenv("MAILGUN_API_KEY")
 MAILGUN_DOMAIN = os.getenv("MAILGUN_DOMAIN")
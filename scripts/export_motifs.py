@@ -0,0 +1,17 @@
+import argparse
+import sys
+from datetime import datetime
+
+from reprise.exporter import export_motifs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export every motif as NDJSON")
+    parser.add_argument(
+        "--since",
+        type=datetime.fromisoformat,
+        help="only motifs written since this ISO timestamp",
+    )
+    parser.add_argument("--output", type=argparse.FileType("w"), default=sys.stdout)
+    args = parser.parse_args()
+
+    args.output.writelines(export_motifs(since=args.since))
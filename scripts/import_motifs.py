@@ -0,0 +1,26 @@
+import argparse
+import logging
+from pathlib import Path
+
+from reprise.importer import import_motifs, read_records
+
+FORMATS = {".jsonl": "jsonl", ".csv": "csv", ".md": "markdown"}
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Bulk import motifs from a file")
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())))
+    args = parser.parse_args()
+
+    format = args.format or FORMATS.get(args.path.suffix)
+    if not format:
+        parser.error(f"Can't infer the format of {args.path}, pass --format")
+
+    with args.path.open(encoding="utf-8", newline="") as stream:
+        summary = import_motifs(read_records(stream, format))
+    print(
+        f"Imported {summary.motifs} motifs, {summary.citations} citations "
+        f"and {summary.cloze_deletions} cloze deletions"
+    )
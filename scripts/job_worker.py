@@ -0,0 +1,9 @@
+import logging
+
+from reprise.jobs import JobWorker
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    # run background jobs in the foreground until interrupted
+    JobWorker().run()
@@ -0,0 +1,9 @@
+import logging
+
+from reprise.queue import ReprisalQueueWorker
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    # refill the reprisal queue in the foreground until interrupted
+    ReprisalQueueWorker().run()
@@ -1,13 +1,18 @@
 import pytest
 
-from reprise.api import app
+from reprise.api import app, motif_count_cache, reprise_preview_cache
 from reprise.db import Base, database_session, engine
+from reprise.repository import citation_uuid_cache, sampling_terms_cache
 
 
 @pytest.fixture(scope="function", autouse=True)
 def session():
     Base.metadata.drop_all(engine)
     Base.metadata.create_all(engine)
+    reprise_preview_cache.clear()
+    motif_count_cache.clear()
+    citation_uuid_cache.clear()
+    sampling_terms_cache.clear()
     with database_session() as session:
         yield session
         session.rollback()
@@ -1,7 +1,14 @@
 import factory
 from factory.alchemy import SQLAlchemyModelFactory
 
-from reprise.db import Citation, ClozeDeletion, Motif, Reprisal, ReprisalSchedule
+from reprise.db import (
+    Citation,
+    ClozeDeletion,
+    Motif,
+    MotifSchedule,
+    Reprisal,
+    ReprisalSchedule,
+)
 
 
 def motif_factory(session):
@@ -14,6 +21,7 @@ def motif_factory(session):
         uuid = factory.Faker("uuid4")
         content = factory.Faker("text")
         created_at = factory.Faker("date_time")
+        updated_at = factory.SelfAttribute("created_at")
 
         citation = factory.SubFactory(citation_factory(session))
 
@@ -80,3 +88,25 @@ def reprisal_schedule_factory(session):
         created_at = factory.Faker("date_time")
 
     return _ReprisalScheduleFactory
+
+
+def motif_schedule_factory(session):
+    class _MotifScheduleFactory(SQLAlchemyModelFactory):
+        class Meta:
+            model = MotifSchedule
+            sqlalchemy_session = session
+            sqlalchemy_session_persistence = "commit"
+
+        due_at = factory.Faker("date_time")
+        updated_at = factory.Faker("date_time")
+
+        motif = factory.SubFactory(motif_factory(session))
+
+        @classmethod
+        def _create(cls, model_class, motif, **kwargs):
+            # every motif is scheduled when it's inserted, so update its schedule
+            motif_schedule = session.merge(model_class(motif_uuid=motif.uuid, **kwargs))
+            session.commit()
+            return motif_schedule
+
+    return _MotifScheduleFactory
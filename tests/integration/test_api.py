@@ -1,13 +1,31 @@
+import sqlite3
+from datetime import datetime, timedelta
 from unittest.mock import patch
 
 import pytest
 from flask import json
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
 
 from reprise import settings
 from reprise.agent import MaskTuples
-from reprise.api import configure_logfire
-from reprise.db import Citation, Motif, database_session
-from tests.factories import citation_factory, cloze_deletion_factory, motif_factory
+from reprise.api import (
+    app,
+    configure_logfire,
+    start_job_workers,
+    start_reprisal_queue_worker,
+    wake_job_workers,
+)
+from reprise.jobs import JobWorker
+from reprise.db import Citation, Motif, Reprisal, database_session, engine
+from reprise.profiling import record_queries
+from reprise.repository import MotifRepository, TableVersionRepository
+from tests.factories import (
+    citation_factory,
+    cloze_deletion_factory,
+    motif_factory,
+    motif_schedule_factory,
+)
 
 
 class TestAPI:
@@ -55,6 +73,34 @@ class TestAPI:
         mock_configure.assert_called_once_with(token=settings.LOGFIRE_TOKEN)
         mock_instrument.assert_called_once()
 
+    @patch("reprise.api.ReprisalQueueWorker")
+    def test_start_reprisal_queue_worker(self, mock_worker):
+        with patch("reprise.settings.REPRISAL_QUEUE_WORKER", True):
+            worker = start_reprisal_queue_worker()
+        mock_worker.return_value.start.assert_called_once()
+        assert worker == mock_worker.return_value
+
+    def test_start_reprisal_queue_worker_disabled(self):
+        assert start_reprisal_queue_worker() is None
+
+    @patch("reprise.jobs.JobWorker")
+    def test_start_job_workers(self, mock_worker):
+        with patch("reprise.settings.JOB_WORKERS", 2):
+            workers = start_job_workers()
+        assert workers == [mock_worker.return_value] * 2
+        assert mock_worker.return_value.start.call_count == 2
+
+        with patch("reprise.api.job_workers", workers):
+            wake_job_workers()
+        assert mock_worker.return_value.wake.call_count == 2
+
+    @patch("reprise.api.start_job_workers", return_value=[])
+    def test_job_workers_started_by_first_request(self, mock_start, client):
+        with patch("reprise.api.job_workers", None):
+            client.get("/motifs")
+            client.get("/motifs")
+        mock_start.assert_called_once()
+
     def test_get_motifs(self, session, client):
         motif = motif_factory(session=session).create()
         cloze_deletion = cloze_deletion_factory(session=session).create(motif=motif)
@@ -100,13 +146,18 @@ class TestAPI:
         assert data["cloze_deletions"] is None
 
         with database_session() as session:
-            motif = session.query(Motif).filter_by(uuid=data["uuid"]).one_or_none()
+            motif = MotifRepository(session).get_motif(data["uuid"])
             assert motif.content == motif_with_citation_data["content"]
             assert motif.citation.title == motif_with_citation_data["citation"]
 
+    @patch("reprise.api.wake_job_workers")
     @patch("pydantic_ai.agent.Agent.run_sync")
     def test_add_motif_with_auto_cloze_deletions(
-        self, mock_agent_run_sync, client, motif_with_auto_cloze_deletions_data
+        self,
+        mock_agent_run_sync,
+        mock_wake_job_workers,
+        client,
+        motif_with_auto_cloze_deletions_data,
     ):
         # Mock the LLM response to return specific mask tuple sets
         mock_agent_run_sync.return_value.data = MaskTuples(
@@ -119,21 +170,88 @@ class TestAPI:
             content_type="application/json",
         )
 
+        # generation is queued rather than awaited
         data = json.loads(response.data)
         assert response.status_code == 200
-        assert data["cloze_deletions"] is not None
-        assert len(data["cloze_deletions"]) == 2
-        assert data["cloze_deletions"][0]["mask_tuples"] == [[0, 3]]
-        assert data["cloze_deletions"][1]["mask_tuples"] == [[0, 3], [11, 17]]
+        assert data["cloze_deletions"] is None
+        assert data["job_uuid"] is not None
+        mock_agent_run_sync.assert_not_called()
+        mock_wake_job_workers.assert_called_once()
+
+        job = json.loads(client.get(f"/jobs/{data['job_uuid']}").data)
+        assert (job["status"], job["motif_uuid"]) == ("pending", data["uuid"])
+
+        assert JobWorker().run_next()
+
+        job = json.loads(client.get(f"/jobs/{data['job_uuid']}").data)
+        assert (job["status"], job["attempts"]) == ("succeeded", 1)
+        assert job["finished_at"] is not None
 
         with database_session() as session:
-            motif = session.query(Motif).filter_by(uuid=data["uuid"]).one_or_none()
+            motif = MotifRepository(session).get_motif(data["uuid"])
             assert len(motif.cloze_deletions) == 2
             # The order might not be guaranteed, so check both ways
             mask_tuples_list = [cd.mask_tuples for cd in motif.cloze_deletions]
             assert [[0, 3]] in mask_tuples_list
             assert [[0, 3], [11, 17]] in mask_tuples_list
 
+    def test_get_job_not_found(self, client):
+        response = client.get("/jobs/missing")
+        assert response.status_code == 404
+
+    def test_export_motifs(self, client, session):
+        motif_factory(session=session).create_batch(3)
+
+        response = client.get("/motifs/export")
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        assert len(response.data.decode().splitlines()) == 3
+
+        response = client.get(f"/motifs/export?since={datetime.now().isoformat()}")
+        assert response.data == b""
+
+    def test_search_motifs(self, client, session):
+        motif_factory(session=session).create(content="A stitch in time")
+        motif_factory(session=session).create(content="Saves nine")
+
+        response = client.get("/motifs/search?q=stitch")
+        assert response.status_code == 200
+        [result] = json.loads(response.data)["motifs"]
+        assert result["content"] == "A stitch in time"
+        assert result["snippet"] == "A <mark>stitch</mark> in time"
+        assert result["cloze_deletions"] is None
+
+        response = client.get("/motifs/search?q=zyzzyva")
+        assert json.loads(response.data) == {"motifs": []}
+
+    @pytest.mark.parametrize("limit", [-1, 0, 101])
+    def test_search_motifs_invalid_limit(self, client, limit):
+        response = client.get(f"/motifs/search?q=stitch&limit={limit}")
+        assert response.status_code == 400
+
+    def test_import_motifs(self, client, session):
+        response = client.post(
+            "/motifs/import?format=markdown",
+            data="# Book\n- first\n- second\n",
+            content_type="text/markdown",
+        )
+        assert response.status_code == 200
+        assert json.loads(response.data) == {
+            "motifs": 2,
+            "citations": 1,
+            "cloze_deletions": 0,
+        }
+        assert json.loads(client.get("/motifs").data)["total_count"] == 2
+
+    def test_import_motifs_invalid_record(self, client):
+        response = client.post("/motifs/import", data='{"content": "first"}\n{')
+        assert response.status_code == 400
+        assert "Invalid record 2" in json.loads(response.data)["error"]
+
+    def test_import_motifs_unknown_format(self, client):
+        response = client.post("/motifs/import?format=xml", data="")
+        assert response.status_code == 400
+
     def test_update_motif(self, client, motif, motif_data):
         response = client.put(
             f"/motifs/{motif.uuid}",
@@ -162,6 +280,16 @@ class TestAPI:
             motif = session.query(Motif).filter_by(uuid=motif.uuid).one_or_none()
             assert motif.content != "Updated content"
 
+    def test_update_motif_not_found(self, client):
+        response = client.put("/motifs/missing", json={"content": "Updated content"})
+
+        assert response.status_code == 404
+        assert json.loads(response.data)["error"] == "Motif missing not found"
+
+    def test_delete_motif_not_found(self, client):
+        response = client.delete("/motifs/missing")
+        assert response.status_code == 404
+
     def test_delete_motif(self, client, motif):
         response = client.delete(f"/motifs/{motif.uuid}")
 
@@ -188,6 +316,33 @@ class TestAPI:
             )
             assert citation.title == citation_data["title"]
 
+    def test_create_citation_existing_title(self, client, citation):
+        response = client.post(
+            "/citations",
+            data=json.dumps({"title": citation.title}),
+            content_type="application/json",
+        )
+        assert json.loads(response.data)["uuid"] == citation.uuid
+
+    def test_add_motif_with_cached_citation(self, client, motif_with_citation_data):
+        def post_motif():
+            with record_queries() as query_stats:
+                response = client.post(
+                    "/motifs",
+                    data=json.dumps(motif_with_citation_data),
+                    content_type="application/json",
+                )
+            assert response.status_code == 200
+            return query_stats.count
+
+        # the citation upsert, the motif insert, the queue invalidation and the
+        # table version bump
+        assert post_motif() == 4
+        assert post_motif() == 3
+
+        with database_session() as session:
+            assert session.query(Citation).count() == 1
+
     def test_get_citations(self, client, citation):
         response = client.get("/citations")
         data = json.loads(response.data)
@@ -196,6 +351,22 @@ class TestAPI:
         assert len(data) == 1
         assert data[0]["title"] == citation.title
 
+    def test_get_citations_not_modified(self, client, citation):
+        etag = client.get("/citations").headers["ETag"]
+
+        response = client.get("/citations", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+        # motif writes don't change the citations
+        client.post("/motifs", json={"content": "Test motif content"})
+        response = client.get("/citations", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+        client.post("/citations", json={"title": "Another citation"})
+        response = client.get("/citations", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert len(json.loads(response.data)) == 2
+
     def test_add_citation_to_motif(self, client, motif, citation):
         response = client.put(
             f"/motifs/{motif.uuid}",
@@ -208,7 +379,7 @@ class TestAPI:
         assert data["citation"] == citation.title
 
         with database_session() as session:
-            motif = session.query(Motif).filter_by(uuid=motif.uuid).one_or_none()
+            motif = MotifRepository(session).get_motif(motif.uuid)
             assert motif.citation.title == citation.title
 
     def test_reprise_motifs(self, session, client, motif):
@@ -226,6 +397,185 @@ class TestAPI:
             {"uuid": cloze_deletion.uuid, "mask_tuples": cloze_deletion.mask_tuples}
         ]
 
+    def test_reprise_wakes_queue_worker(self, session, client, motif):
+        with patch("reprise.api.reprisal_queue_worker") as mock_worker:
+            response = client.post("/reprise")
+
+        assert response.status_code == 200
+        mock_worker.wake.assert_called_once()
+
+    def test_reprise_preview(self, session, client, motif):
+        cloze_deletion = cloze_deletion_factory(session=session).create(motif=motif)
+
+        response = client.get("/reprise/preview")
+        data = json.loads(response.data)
+
+        assert response.status_code == 200
+        assert data[0]["content"] == motif.content
+        assert data[0]["cloze_deletions"] == [
+            {"uuid": cloze_deletion.uuid, "mask_tuples": cloze_deletion.mask_tuples}
+        ]
+        assert session.query(Reprisal).count() == 0
+
+    def test_reprise_preview_cached_until_write(self, session, client, motif):
+        first = json.loads(client.get("/reprise/preview").data)
+
+        with patch("reprise.api.Service") as mock_service:
+            assert json.loads(client.get("/reprise/preview").data) == first
+            mock_service.assert_not_called()
+
+        client.post("/reprise")
+        with patch("reprise.api.Service") as mock_service:
+            mock_service.return_value.preview.return_value = []
+            assert json.loads(client.get("/reprise/preview").data) == []
+
+    def test_reprise_preview_cache_sees_other_processes_writes(self, client, motif):
+        client.get("/reprise/preview")
+
+        # another process (e.g. the dispatch script) records a reprisal
+        with engine.begin() as connection:
+            connection.execute(
+                text("INSERT INTO table_version VALUES ('reprisal', 1, :now)"),
+                {"now": datetime.now()},
+            )
+
+        with patch("reprise.api.Service") as mock_service:
+            mock_service.return_value.preview.return_value = []
+            assert json.loads(client.get("/reprise/preview").data) == []
+
+    @patch.object(settings, "REPRISE_SCHEDULER", "leitner")
+    def test_reprise_preview_cached_until_next_due(self, session, client):
+        now = datetime.now()
+        motif_schedule = motif_schedule_factory(session=session).create(
+            due_at=now + timedelta(days=1)
+        )
+        motif_uuid = motif_schedule.motif_uuid
+
+        assert json.loads(client.get("/reprise/preview").data) == []
+        with patch("reprise.api.datetime") as mock_datetime:
+            mock_datetime.now.return_value = now + timedelta(hours=1)
+            assert json.loads(client.get("/reprise/preview").data) == []
+
+            mock_datetime.now.return_value = now + timedelta(days=2)
+            [data] = json.loads(client.get("/reprise/preview").data)
+        assert data["uuid"] == motif_uuid
+
+    def test_request_query_stats_logged(self, client, motif, caplog):
+        with caplog.at_level("INFO", logger="reprise.api"):
+            response = client.get("/motifs")
+
+        assert "X-Query-Count" not in response.headers
+        [record] = [r for r in caplog.records if "request_queries" in r.message]
+        log = json.loads(record.message)
+        assert log["method"] == "GET"
+        assert log["path"] == "/motifs"
+        assert log["status"] == 200
+        assert log["query_count"] > 0
+        assert log["slow_queries"] == []
+
+    def test_request_slow_query_stats_logged_as_warning(self, client, motif, caplog):
+        with (
+            patch.object(settings, "SLOW_QUERY_MS", 0),
+            caplog.at_level("WARNING", logger="reprise.api"),
+        ):
+            client.get("/motifs")
+
+        [record] = [r for r in caplog.records if "request_queries" in r.message]
+        assert record.levelname == "WARNING"
+        assert json.loads(record.message)["slow_queries"]
+
+    def test_request_query_stats_not_built_unless_logged(self, client, motif, caplog):
+        with (
+            caplog.at_level("WARNING", logger="reprise.api"),
+            patch("reprise.api.json.dumps") as mock_dumps,
+        ):
+            client.get("/motifs")
+
+        mock_dumps.assert_not_called()
+
+    def test_request_query_stats_headers_in_debug(self, client, motif):
+        with patch.dict(app.config, {"DEBUG": True}):
+            response = client.get("/motifs")
+
+        assert int(response.headers["X-Query-Count"]) > 0
+        assert float(response.headers["X-DB-Time-Ms"]) > 0
+
+    def test_get_motifs_query_count_independent_of_page_size(self, client, session):
+        citation = citation_factory(session=session).create()
+        for motif in motif_factory(session=session).create_batch(6, citation=citation):
+            cloze_deletion_factory(session=session).create(motif=motif)
+
+        with patch.dict(app.config, {"DEBUG": True}):
+            response = client.get("/motifs?page_size=6")
+
+        # the table versions, the page with its citations, the cloze deletions,
+        # and the count
+        assert len(json.loads(response.data)["motifs"]) == 6
+        assert response.headers["X-Query-Count"] == "4"
+
+    def test_get_motifs_sparse_fields(self, client, session):
+        citation = citation_factory(session=session).create()
+        for motif in motif_factory(session=session).create_batch(3, citation=citation):
+            cloze_deletion_factory(session=session).create(motif=motif)
+
+        with patch.dict(app.config, {"DEBUG": True}):
+            response = client.get("/motifs?fields=uuid,content,created_at")
+
+        # the table versions, the page alone, and the count
+        assert response.headers["X-Query-Count"] == "3"
+        data = json.loads(response.data)
+        assert data["total_count"] == 3
+        assert [set(motif) for motif in data["motifs"]] == [
+            {"uuid", "content", "created_at"}
+        ] * 3
+
+    @pytest.mark.parametrize(
+        "query_string, keys",
+        [
+            ("fields=uuid&include=citation", {"uuid", "citation"}),
+            ("fields=content&fields=uuid", {"uuid", "content"}),
+            (
+                "include=cloze_deletions",
+                {"uuid", "content", "created_at", "cloze_deletions"},
+            ),
+            ("fields=uuid&include=", {"uuid"}),
+        ],
+    )
+    def test_get_motifs_include(self, client, session, query_string, keys):
+        citation = citation_factory(session=session).create()
+        motif = motif_factory(session=session).create(citation=citation)
+        cloze_deletion_factory(session=session).create(motif=motif)
+
+        response = client.get(f"/motifs?{query_string}")
+
+        [data] = json.loads(response.data)["motifs"]
+        assert set(data) == keys
+        if "citation" in keys:
+            assert data["citation"] == citation.title
+        if "cloze_deletions" in keys:
+            assert len(data["cloze_deletions"]) == 1
+
+    def test_get_motifs_by_cursor_sparse_fields(self, client, session):
+        motif_factory(session=session).create_batch(3)
+        cursor = json.loads(client.get("/motifs?page_size=2").data)["next_cursor"]
+
+        response = client.get(f"/motifs?cursor={cursor}&fields=uuid")
+
+        assert [set(motif) for motif in json.loads(response.data)["motifs"]] == [
+            {"uuid"}
+        ]
+
+    @pytest.mark.parametrize("query_string", ["fields=citation", "include=content"])
+    def test_get_motifs_invalid_fields(self, client, query_string):
+        response = client.get(f"/motifs?{query_string}")
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize("query_string", ["page_size=0", "page=0", "page=-1"])
+    def test_get_motifs_invalid_page(self, client, session, query_string):
+        motif_factory(session=session).create()
+        response = client.get(f"/motifs?{query_string}")
+        assert response.status_code == 400
+
     def test_get_motifs_paginated(self, client, session):
         motif_factory(session=session).create_batch(12)
 
@@ -254,6 +604,74 @@ class TestAPI:
         assert response.status_code == 200
         assert len(data["motifs"]) == 0
 
+    def test_get_motifs_by_cursor(self, client, session):
+        motif_factory(session=session).create_batch(7)
+
+        uuids = []
+        response = json.loads(client.get("/motifs?page_size=3").data)
+        while response["next_cursor"]:
+            uuids += [motif["uuid"] for motif in response["motifs"]]
+            cursor = response["next_cursor"]
+            response = json.loads(
+                client.get(f"/motifs?page_size=3&cursor={cursor}").data
+            )
+        uuids += [motif["uuid"] for motif in response["motifs"]]
+
+        assert len(set(uuids)) == 7
+        assert response["total_count"] == 7
+
+    def test_get_motifs_invalid_cursor(self, client):
+        response = client.get("/motifs?cursor=not-a-cursor")
+        assert response.status_code == 400
+
+    def test_get_motifs_count_cached_until_write(self, client, session, motif):
+        assert json.loads(client.get("/motifs").data)["total_count"] == 1
+        with patch("reprise.api.MotifRepository.get_motifs_count") as mock_count:
+            assert json.loads(client.get("/motifs").data)["total_count"] == 1
+            mock_count.assert_not_called()
+
+        client.post("/motifs", json={"content": "another motif"})
+        assert json.loads(client.get("/motifs").data)["total_count"] == 2
+
+    def test_get_motifs_not_modified(self, client, session, motif):
+        response = client.get("/motifs")
+        etag, last_modified = (
+            response.headers["ETag"],
+            response.headers["Last-Modified"],
+        )
+
+        with (
+            patch.object(settings, "SLOW_QUERY_MS", 0),
+            record_queries() as query_stats,
+        ):
+            response = client.get("/motifs", headers={"If-None-Match": etag})
+
+        # answered from the table versions alone
+        assert response.status_code == 304
+        assert response.data == b""
+        assert response.headers["ETag"] == etag
+        assert query_stats.count == 1
+        assert "FROM table_version" in query_stats.slowest[0].statement
+
+        response = client.get("/motifs", headers={"If-Modified-Since": last_modified})
+        assert response.status_code == 304
+
+    def test_get_motifs_modified_after_write(self, client, session, motif):
+        etag = client.get("/motifs").headers["ETag"]
+
+        cloze_deletion_factory(session=session).create(motif=motif)
+
+        response = client.get("/motifs", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert json.loads(response.data)["motifs"][0]["cloze_deletions"]
+
+    def test_get_motifs_without_writes(self, client):
+        response = client.get("/motifs")
+        assert response.status_code == 200
+        assert response.headers["ETag"] == '"0-0-0"'
+        assert response.last_modified is None
+
     def test_add_cloze_deletion(self, client, motif, cloze_deletion_data):
         response = client.post(
             "/cloze_deletions",
@@ -266,13 +684,20 @@ class TestAPI:
         assert data["mask_tuples"] == cloze_deletion_data["mask_tuples"]
 
         with database_session() as session:
-            motif = session.query(Motif).filter_by(uuid=motif.uuid).one_or_none()
+            motif = MotifRepository(session).get_motif(motif.uuid)
             assert len(motif.cloze_deletions) == 1
             assert (
                 motif.cloze_deletions[0].mask_tuples
                 == cloze_deletion_data["mask_tuples"]
             )
 
+    def test_add_cloze_deletion_motif_not_found(self, client):
+        response = client.post(
+            "/cloze_deletions", json={"motif_uuid": "missing", "mask_tuples": [[0, 1]]}
+        )
+        assert response.status_code == 404
+        assert json.loads(response.data)["error"] == "Motif missing not found"
+
     def test_update_cloze_deletion(
         self, client, motif, cloze_deletion, cloze_update_data
     ):
@@ -288,29 +713,188 @@ class TestAPI:
 
         with database_session() as session:
             updated_cloze_deletion = (
-                session.query(Motif)
-                .filter_by(uuid=motif.uuid)
-                .one_or_none()
-                .cloze_deletions[0]
+                MotifRepository(session).get_motif(motif.uuid).cloze_deletions[0]
             )
             assert (
                 updated_cloze_deletion.mask_tuples == cloze_update_data["mask_tuples"]
             )
 
+    def test_update_cloze_deletion_not_found(self, client):
+        response = client.put(
+            "/cloze_deletions", json={"uuid": "missing", "mask_tuples": [[0, 1]]}
+        )
+        assert response.status_code == 404
+
     def test_delete_cloze_deletion(self, client, motif, cloze_deletion):
         response = client.delete(f"/cloze_deletions/{cloze_deletion.uuid}")
         assert response.status_code == 200
         assert json.loads(response.data)["message"] == "Cloze deletion deleted"
 
         with database_session() as session:
-            assert (
-                session.query(Motif)
-                .filter_by(uuid=motif.uuid)
-                .one_or_none()
-                .cloze_deletions
-                == []
+            assert MotifRepository(session).get_motif(motif.uuid).cloze_deletions == []
+
+    def test_batch(self, client, session, motif, cloze_deletion):
+        other_motif = motif_factory(session=session).create()
+        with database_session() as version_session:
+            [before] = (
+                TableVersionRepository(version_session)
+                .get_table_versions(["cloze_deletion"])
+                .values()
+            )
+            before = before.version
+
+        response = client.post(
+            "/batch",
+            json={
+                "operations": [
+                    {"op": "create_motif", "content": "New motif", "citation": "Book"},
+                    {
+                        "op": "create_cloze_deletion",
+                        "motif_uuid": "$0",
+                        "mask_tuples": [[0, 3]],
+                    },
+                    {
+                        "op": "create_cloze_deletion",
+                        "motif_uuid": "$0",
+                        "mask_tuples": [[4, 9]],
+                    },
+                    {"op": "update_motif", "uuid": "$0", "content": "Edited motif"},
+                    {
+                        "op": "update_cloze_deletion",
+                        "uuid": cloze_deletion.uuid,
+                        "mask_tuples": [[1, 2]],
+                    },
+                    {"op": "delete_cloze_deletion", "uuid": "$2"},
+                    {"op": "delete_motif", "uuid": other_motif.uuid},
+                ]
+            },
+        )
+
+        assert response.status_code == 200
+        results = json.loads(response.data)["results"]
+        assert results[0]["citation"] == "Book"
+        assert results[1]["mask_tuples"] == [[0, 3]]
+        assert results[3]["content"] == "Edited motif"
+        assert results[3]["cloze_deletions"] == [results[1], results[2]]
+        assert results[4]["mask_tuples"] == [[1, 2]]
+        assert results[5:] == [
+            {"message": "Cloze deletion deleted"},
+            {"message": "Motif deleted"},
+        ]
+
+        with database_session() as session:
+            new_motif = MotifRepository(session).get_motif(results[0]["uuid"])
+            assert new_motif.content == "Edited motif"
+            assert [cd.mask_tuples for cd in new_motif.cloze_deletions] == [[[0, 3]]]
+            assert MotifRepository(session).get_motif(other_motif.uuid) is None
+            # committed once
+            [after] = (
+                TableVersionRepository(session)
+                .get_table_versions(["cloze_deletion"])
+                .values()
+            )
+            assert after.version == before + 1
+
+    @patch("reprise.api.wake_job_workers")
+    def test_batch_wakes_job_workers(self, mock_wake_job_workers, client):
+        response = client.post(
+            "/batch",
+            json={
+                "operations": [
+                    {
+                        "op": "create_motif",
+                        "content": "New motif",
+                        "auto_generate_cloze_deletions": True,
+                    }
+                ]
+            },
+        )
+
+        assert response.status_code == 200
+        assert json.loads(response.data)["results"][0]["job_uuid"]
+        mock_wake_job_workers.assert_called_once()
+
+    def test_batch_rolled_back_on_error(self, client):
+        response = client.post(
+            "/batch",
+            json={
+                "operations": [
+                    {"op": "create_motif", "content": "New motif"},
+                    {"op": "update_motif", "uuid": "missing", "content": "Edited"},
+                ]
+            },
+        )
+
+        assert response.status_code == 404
+        assert json.loads(response.data)["error"] == (
+            "Operation 1: Motif missing not found"
+        )
+        with database_session() as session:
+            assert session.query(Motif).count() == 0
+
+    @pytest.mark.parametrize("reference", ["$1", "$x", "$0"])
+    def test_batch_invalid_reference(self, client, motif, reference):
+        response = client.post(
+            "/batch",
+            json={
+                "operations": [
+                    {"op": "delete_motif", "uuid": motif.uuid},
+                    {"op": "delete_cloze_deletion", "uuid": reference},
+                ]
+            },
+        )
+
+        assert response.status_code == 400
+        assert json.loads(response.data)["error"] == (
+            f"Operation 1: {reference} doesn't refer to an earlier operation's result"
+        )
+        with database_session() as session:
+            assert MotifRepository(session).get_motif(motif.uuid)
+
+    def test_batch_integrity_error(self, client, motif):
+        # as if another session deleted the motif after it was checked
+        error = IntegrityError(
+            "INSERT", None, sqlite3.IntegrityError("FOREIGN KEY constraint failed")
+        )
+        with patch(
+            "reprise.operations.ClozeDeletionRepository.add_cloze_deletion",
+            side_effect=error,
+        ):
+            response = client.post(
+                "/batch",
+                json={
+                    "operations": [
+                        {"op": "create_motif", "content": "New motif"},
+                        {
+                            "op": "create_cloze_deletion",
+                            "motif_uuid": motif.uuid,
+                            "mask_tuples": [[0, 1]],
+                        },
+                    ]
+                },
             )
 
+        assert response.status_code == 400
+        assert json.loads(response.data)["error"] == (
+            "Operation 1: FOREIGN KEY constraint failed"
+        )
+        with database_session() as session:
+            assert session.query(Motif).count() == 1
+
+    @pytest.mark.parametrize(
+        "operations",
+        [
+            [],
+            [{"op": "unknown", "uuid": "x"}],
+            [{"op": "delete_motif"}],
+            [{"op": "delete_motif", "uuid": "x"}] * (settings.BATCH_MAX_OPERATIONS + 1),
+        ],
+    )
+    def test_batch_validation_errors(self, client, operations):
+        response = client.post("/batch", json={"operations": operations})
+        assert response.status_code == 400
+        assert "validation_error" in json.loads(response.data)
+
     # Parameterized validation tests
     @pytest.mark.parametrize(
         "endpoint,data,field,expected_status",
@@ -341,6 +925,18 @@ class TestAPI:
                 "mask_tuples",
                 400,
             ),
+            (
+                "/cloze_deletions",
+                {"motif_uuid": "uuid", "mask_tuples": [[-1, 2]]},
+                "mask_tuples",
+                400,
+            ),
+            (
+                "/cloze_deletions",
+                {"motif_uuid": "uuid", "mask_tuples": [[0, 5000000000]]},
+                "mask_tuples",
+                400,
+            ),
         ],
     )
     def test_validation_errors_post(
@@ -436,7 +1032,11 @@ class TestAPI:
             data=json.dumps(motif_with_auto_cloze_deletions_data),
             content_type="application/json",
         )
+        assert response.status_code == 200
+        job_uuid = json.loads(response.data)["job_uuid"]
 
-        assert response.status_code == 500
-        data = json.loads(response.data)
-        assert "OpenAI API Error" in data["error"]
+        JobWorker().run_next()
+
+        job = json.loads(client.get(f"/jobs/{job_uuid}").data)
+        assert (job["status"], job["attempts"]) == ("pending", 1)  # to be retried
+        assert "OpenAI API Error" in job["error"]
@@ -0,0 +1,69 @@
+from unittest.mock import patch
+
+import pytest
+from starlette.testclient import TestClient
+
+from reprise.asgi import app
+from reprise.db import database_session
+from reprise.repository import JobRepository, MotifRepository
+from tests.factories import motif_factory
+
+
+class TestASGI:
+    @pytest.fixture
+    def client(self):
+        return TestClient(app)
+
+    def test_add_motif(self, client):
+        response = client.post(
+            "/motifs", json={"content": "Test motif content", "citation": "Book"}
+        )
+
+        data = response.json()
+        assert response.status_code == 200
+        assert data["content"] == "Test motif content"
+        assert data["citation"] == "Book"
+        assert data["cloze_deletions"] is None
+
+        with database_session() as session:
+            motif = MotifRepository(session).get_motif(data["uuid"])
+            assert motif.citation.title == "Book"
+
+    @patch("reprise.api.wake_job_workers")
+    def test_add_motif_with_auto_cloze_deletions(self, mock_wake_job_workers, client):
+        response = client.post(
+            "/motifs",
+            json={
+                "content": "Test motif content",
+                "auto_generate_cloze_deletions": True,
+            },
+        )
+
+        data = response.json()
+        assert response.status_code == 200
+        assert data["cloze_deletions"] is None
+        mock_wake_job_workers.assert_called_once()
+
+        with database_session() as session:
+            job = JobRepository(session).get_job(data["job_uuid"])
+            assert (job.motif_uuid, job.status) == (data["uuid"], "pending")
+
+    def test_add_motif_validation_error(self, client):
+        response = client.post("/motifs", json={"content": 123})
+        assert response.status_code == 400
+        [error] = response.json()["validation_error"]["body_params"]
+        assert error["loc"] == ["content"]
+
+    def test_add_motif_malformed_json(self, client):
+        response = client.post(
+            "/motifs", content="{", headers={"Content-Type": "application/json"}
+        )
+        assert response.status_code == 400
+        assert "error" in response.json()
+
+    def test_other_routes_served_by_flask(self, client, session):
+        motif_factory(session=session).create_batch(2)
+
+        response = client.get("/motifs")
+        assert response.status_code == 200
+        assert response.json()["total_count"] == 2
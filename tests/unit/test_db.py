@@ -1,4 +1,20 @@
-from reprise.db import Motif, database_session
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.exc import OperationalError
+
+from reprise import settings
+from reprise.db import (
+    Base,
+    ClozeDeletion,
+    Motif,
+    MotifSchedule,
+    TableVersion,
+    create_database_engine,
+    database_session,
+)
+from reprise.repository import ReprisalRepository
 
 
 def test_database_session_rollback_on_exception():
@@ -13,3 +29,126 @@ def test_database_session_rollback_on_exception():
 
     with database_session() as session:
         assert session.query(Motif).count() == 0
+
+
+def test_database_session_does_not_commit_after_exception():
+    with pytest.raises(ValueError):
+        with database_session() as session:
+            session.add(Motif(content="test"))
+            session.flush()
+            raise ValueError
+
+    with database_session() as session:
+        assert session.query(TableVersion).count() == 0
+
+
+def test_readonly_database_session_refuses_writes():
+    with pytest.raises(OperationalError, match="readonly database"):
+        with database_session(readonly=True) as session:
+            session.add(Motif(content="test"))
+            session.flush()
+
+    # the connection is writable again once the readonly session is done
+    with database_session() as session:
+        assert session.query(Motif).count() == 0
+        session.add(Motif(content="test"))
+    with database_session(readonly=True) as session:
+        assert session.query(Motif).count() == 1
+
+
+def test_mask_tuples_stored_packed(session):
+    motif = Motif(content="hello world")
+    session.add(motif)
+    session.flush()
+    session.execute(
+        insert(ClozeDeletion),
+        [{"motif_uuid": motif.uuid, "mask_tuples": [(0, 4), (6, 10)]}],
+    )
+
+    stored = session.execute(text("SELECT mask_tuples FROM cloze_deletion")).scalar()
+    assert stored == bytes([0, 0, 0, 0, 4, 0, 0, 0, 6, 0, 0, 0, 10, 0, 0, 0])
+    assert session.scalars(select(ClozeDeletion.mask_tuples)).one() == [
+        [0, 4],
+        [6, 10],
+    ]
+
+
+def test_motifs_scheduled_when_inserted(session):
+    motif = Motif(content="test")
+    session.add(motif)
+    session.flush()
+    session.execute(
+        insert(Motif), [{"content": "imported", "created_at": datetime(2024, 1, 1)}]
+    )
+
+    schedules = {
+        motif_schedule.due_at: motif_schedule
+        for motif_schedule in session.query(MotifSchedule)
+    }
+    assert set(schedules) == {motif.created_at, datetime(2024, 1, 1)}
+    assert schedules[motif.created_at].motif_uuid == motif.uuid
+    assert all(
+        (schedule.box, schedule.interval_days) == (0, 0)
+        for schedule in schedules.values()
+    )
+
+
+def test_table_versions_bumped_by_committed_writes(session):
+    def versions():
+        session.expire_all()
+        return {tv.name: tv.version for tv in session.query(TableVersion)}
+
+    with database_session() as write_session:
+        motif = Motif(content="test")
+        write_session.add(motif)
+        write_session.flush()
+        write_session.add(ClozeDeletion(motif_uuid=motif.uuid, mask_tuples=[[0, 4]]))
+        motif_uuid = motif.uuid
+    assert versions() == {"motif": 1, "cloze_deletion": 1}
+
+    with database_session() as write_session:
+        write_session.query(ClozeDeletion).delete()
+    assert versions() == {"motif": 1, "cloze_deletion": 2}
+
+    # the motif's reprisal counters are versioned with the reprisal table
+    with database_session() as write_session:
+        ReprisalRepository(write_session).add_reprisal(motif_uuid, "set")
+    assert versions() == {"motif": 1, "cloze_deletion": 2, "reprisal": 1}
+
+    with pytest.raises(ValueError):
+        with database_session() as write_session:
+            write_session.add(Motif(content="rolled back"))
+            write_session.flush()
+            raise ValueError
+    with database_session() as read_session:
+        read_session.query(Motif).all()
+    assert versions() == {"motif": 1, "cloze_deletion": 2, "reprisal": 1}
+
+
+def test_file_database_engine_uses_wal_and_pool(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'reprise.db'}")
+    with engine.connect() as connection:
+        pragmas = {
+            name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in ["journal_mode", "synchronous", "busy_timeout", "foreign_keys"]
+        }
+    assert pragmas == {
+        "journal_mode": "wal",
+        "synchronous": 1,  # NORMAL
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "foreign_keys": 1,
+    }
+    assert engine.pool.size() == settings.DATABASE_POOL_SIZE
+    engine.dispose()
+
+
+def test_file_database_reads_not_blocked_by_writer(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'reprise.db'}")
+    Base.metadata.create_all(engine)
+    with engine.connect() as writer, engine.connect() as reader:
+        writer.execute(insert(Motif), {"uuid": "uuid", "content": "test"})
+        assert reader.execute(select(func.count()).select_from(Motif)).scalar() == 0
+
+        writer.commit()
+        assert reader.execute(select(func.count()).select_from(Motif)).scalar() == 1
+    engine.dispose()
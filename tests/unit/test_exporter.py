@@ -0,0 +1,112 @@
+import io
+import json
+from datetime import datetime, timedelta
+
+from reprise.exporter import export_motifs
+from reprise.importer import read_records
+from reprise.repository import (
+    ClozeDeletionRepository,
+    MotifRepository,
+    ReprisalRepository,
+)
+from tests.factories import citation_factory, cloze_deletion_factory, motif_factory
+
+
+class TestExportMotifs:
+    def test_export_motifs(self, session):
+        citation = citation_factory(session=session).create(title="Book")
+        first = motif_factory(session=session).create(
+            content="first", citation=citation, created_at=datetime(2025, 1, 1)
+        )
+        cloze_deletion_factory(session=session).create(
+            motif=first, mask_tuples=[[0, 3]]
+        )
+        motif_factory(session=session).create(
+            content="second", citation=None, created_at=datetime(2025, 1, 2)
+        )
+        ReprisalRepository(session).add_reprisal(first.uuid, "set")
+        session.commit()
+
+        lines = [json.loads(line) for line in export_motifs()]
+
+        assert [line["content"] for line in lines] == ["first", "second"]
+        assert lines[0]["uuid"] == first.uuid
+        assert lines[0]["created_at"] == "2025-01-01T00:00:00"
+        assert lines[0]["citation"] == "Book"
+        assert lines[0]["cloze_deletions"] == [[[0, 3]]]
+        assert lines[0]["reprisal_count"] == 1
+        assert lines[0]["last_reprised_at"] is not None
+        assert lines[1]["citation"] is None
+        assert lines[1]["cloze_deletions"] == []
+        assert lines[1]["last_reprised_at"] is None
+
+    def test_export_since(self, session):
+        since = datetime.now() - timedelta(days=1)
+        motif_factory(session=session).create(
+            content="old", created_at=since - timedelta(days=1)
+        )
+        reprised = motif_factory(session=session).create(
+            content="old but reprised", created_at=since - timedelta(days=1)
+        )
+        motif_factory(session=session).create(content="new", created_at=datetime.now())
+        ReprisalRepository(session).add_reprisal(reprised.uuid, "set")
+        session.commit()
+
+        lines = [json.loads(line) for line in export_motifs(since=since)]
+        assert [line["content"] for line in lines] == ["old but reprised", "new"]
+
+    def test_export_since_includes_edited_motifs(self, session):
+        since = datetime.now() - timedelta(days=1)
+        created_at = since - timedelta(days=1)
+        motif_factory(session=session).create(content="old", created_at=created_at)
+        edited = motif_factory(session=session).create(created_at=created_at)
+        cited = motif_factory(session=session).create(created_at=created_at)
+        clozed = motif_factory(session=session).create(created_at=created_at)
+        unclozed = motif_factory(session=session).create(created_at=created_at)
+        cloze_deletion = cloze_deletion_factory(session=session).create(motif=unclozed)
+        citation = citation_factory(session=session).create()
+
+        motif_repository = MotifRepository(session)
+        motif_repository.update_motif_content(edited.uuid, "edited")
+        motif_repository.add_citation(cited.uuid, citation)
+        ClozeDeletionRepository(session).add_cloze_deletion(clozed.uuid, [[0, 1]])
+        ClozeDeletionRepository(session).delete_cloze_deletion(cloze_deletion.uuid)
+        session.commit()
+
+        lines = [json.loads(line) for line in export_motifs(since=since)]
+        assert {line["uuid"] for line in lines} == {
+            edited.uuid,
+            cited.uuid,
+            clozed.uuid,
+            unclozed.uuid,
+        }
+
+    def test_export_since_includes_motifs_of_renamed_citations(self, session):
+        created_at = datetime.now() - timedelta(days=1)
+        citation = citation_factory(session=session).create(title="Book")
+        cited = motif_factory(session=session).create(
+            citation=citation, created_at=created_at
+        )
+        motif_factory(session=session).create(created_at=created_at)
+
+        # the trigger's clock has millisecond precision
+        since = datetime.now().replace(microsecond=0)
+        citation.title = "Renamed"
+        session.commit()
+
+        lines = [json.loads(line) for line in export_motifs(since=since)]
+        assert [(line["uuid"], line["citation"]) for line in lines] == [
+            (cited.uuid, "Renamed")
+        ]
+
+    def test_export_round_trips_through_import(self, session):
+        citation = citation_factory(session=session).create(title="Book")
+        motif = motif_factory(session=session).create(citation=citation)
+        cloze_deletion_factory(session=session).create(
+            motif=motif, mask_tuples=[[0, 3]]
+        )
+
+        [record] = read_records(io.StringIO("".join(export_motifs())), "jsonl")
+        assert record.content == motif.content
+        assert record.citation == "Book"
+        assert record.cloze_deletions == [[(0, 3)]]
@@ -0,0 +1,108 @@
+import io
+from unittest.mock import patch
+
+import pytest
+
+from reprise.db import Citation
+from reprise.importer import ImportSummary, import_motifs, read_records
+from reprise.repository import MotifRepository
+from reprise.schemas import MotifImport
+from tests.factories import citation_factory
+
+
+class TestReadRecords:
+    def test_read_jsonl(self):
+        stream = io.StringIO(
+            '{"content": "first", "citation": "Book"}\n'
+            "\n"
+            '{"content": "second", "cloze_deletions": [[[0, 3]]]}\n'
+        )
+        assert list(read_records(stream, "jsonl")) == [
+            MotifImport(content="first", citation="Book"),
+            MotifImport(content="second", cloze_deletions=[[(0, 3)]]),
+        ]
+
+    def test_read_csv(self):
+        stream = io.StringIO(
+            "content,citation,cloze_deletions\n"
+            '"first, with a comma",Book,\n'
+            'second,,"[[[0, 3]]]"\n'
+        )
+        assert list(read_records(stream, "csv")) == [
+            MotifImport(content="first, with a comma", citation="Book"),
+            MotifImport(content="second", cloze_deletions=[[(0, 3)]]),
+        ]
+
+    def test_read_markdown(self):
+        stream = io.StringIO(
+            "uncited line\n\n# Book one\n- first\n* second\n\n## Book two\nthird\n"
+        )
+        assert list(read_records(stream, "markdown")) == [
+            MotifImport(content="uncited line"),
+            MotifImport(content="first", citation="Book one"),
+            MotifImport(content="second", citation="Book one"),
+            MotifImport(content="third", citation="Book two"),
+        ]
+
+    @pytest.mark.parametrize(
+        "format, data, n_record",
+        [
+            ("jsonl", '{"content": "first"}\n{"content": 2', 2),
+            ("jsonl", '{"content": "first"}\n{"citation": "Book"}', 2),
+            ("csv", "content\nfirst\n" + "x" * 200_000, 2),  # over the field limit
+            ("csv", "citation\nBook\n", 1),
+        ],
+    )
+    def test_invalid_record(self, format, data, n_record):
+        with pytest.raises(ValueError, match=f"Invalid record {n_record}:"):
+            list(read_records(io.StringIO(data), format))
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError, match="Unknown import format xml"):
+            list(read_records(io.StringIO(""), "xml"))
+
+
+class TestImportMotifs:
+    def test_import_motifs(self, session):
+        existing = citation_factory(session=session).create(title="Existing")
+        records = [
+            MotifImport(content="first", citation="Existing"),
+            MotifImport(content="second", citation="New"),
+            MotifImport(content="third", citation="New", cloze_deletions=[[(0, 3)]]),
+            MotifImport(content="fourth"),
+        ]
+
+        progress = []
+        summary = import_motifs(
+            records,
+            chunk_size=3,
+            progress=lambda update: progress.append(update.motifs),
+        )
+
+        assert summary == ImportSummary(motifs=4, citations=1, cloze_deletions=1)
+        assert progress == [3, 4]
+
+        citations = dict(session.query(Citation.title, Citation.uuid).all())
+        assert citations.keys() == {"Existing", "New"}
+        assert citations["Existing"] == existing.uuid
+
+        motifs = {
+            motif.content: motif for motif in MotifRepository(session).get_motifs()
+        }
+        assert motifs["first"].citation_uuid == existing.uuid
+        assert motifs["second"].citation_uuid == citations["New"]
+        assert motifs["third"].citation_uuid == citations["New"]
+        assert motifs["fourth"].citation_uuid is None
+
+        third = MotifRepository(session).get_motif(motifs["third"].uuid)
+        assert third.cloze_deletions[0].mask_tuples == [[0, 3]]
+
+    def test_import_invalidates_reprisal_queue(self, session):
+        with patch(
+            "reprise.repository.ReprisalQueueRepository.invalidate"
+        ) as mock_invalidate:
+            import_motifs([MotifImport(content="first", cloze_deletions=[[(0, 1)]])])
+        assert mock_invalidate.call_count == 2
+
+    def test_import_nothing(self):
+        assert import_motifs([]) == ImportSummary()
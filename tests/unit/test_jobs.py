@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import update
+
+from reprise.agent import MaskTuples
+from reprise.db import ClozeDeletion, Job
+from reprise.jobs import CLOZE_DELETIONS, JOB_HANDLERS, JobWorker
+from reprise.repository import ClozeDeletionRepository, JobRepository, MotifRepository
+from tests.factories import motif_factory
+
+
+class TestJobWorker:
+    @pytest.fixture
+    def job(self, session):
+        motif = motif_factory(session=session).create()
+        job = JobRepository(session).add_job(CLOZE_DELETIONS, motif.uuid)
+        session.commit()
+        return job
+
+    def test_run_next_without_jobs(self):
+        assert JobWorker().run_next() is False
+
+    @patch("pydantic_ai.agent.Agent.run_sync")
+    def test_run_next(self, mock_agent_run_sync, session, job):
+        mock_agent_run_sync.return_value.data = MaskTuples(tuples=[[[0, 3]]])
+
+        assert JobWorker().run_next() is True
+
+        session.refresh(job)
+        assert job.status == "succeeded"
+        assert job.attempts == 1
+        assert job.finished_at is not None
+        motif = MotifRepository(session).get_motif(job.motif_uuid)
+        assert [cd.mask_tuples for cd in motif.cloze_deletions] == [[[0, 3]]]
+
+    def test_run_next_discards_results_after_lease_lost(self, session, job, caplog):
+        def generate_cloze_deletions(session, motif_uuid):
+            ClozeDeletionRepository(session).add_cloze_deletion(motif_uuid, [[0, 3]])
+            # the lease runs out meanwhile and another worker reclaims the job
+            session.execute(
+                update(Job).where(Job.uuid == job.uuid).values(lease_token="another")
+            )
+
+        with patch.dict(JOB_HANDLERS, {CLOZE_DELETIONS: generate_cloze_deletions}):
+            assert JobWorker().run_next() is True
+
+        session.refresh(job)
+        assert (job.status, job.attempts) == ("running", 1)
+        assert session.query(ClozeDeletion).count() == 0
+        assert f"Job {job.uuid} lease expired, discarding" in caplog.text
+
+    @patch("pydantic_ai.agent.Agent.run_sync")
+    def test_run_next_retries_with_backoff(self, mock_agent_run_sync, session, job):
+        mock_agent_run_sync.side_effect = Exception("API Error")
+        worker = JobWorker(max_attempts=3, retry_delay=10)
+
+        before = datetime.now()
+        assert worker.run_next() is True
+        session.refresh(job)
+        assert (job.status, job.attempts, job.error) == ("pending", 1, "API Error")
+        assert job.run_after >= before + timedelta(seconds=10)
+
+        assert worker.run_next() is False  # not due yet
+
+        job.run_after = before
+        session.commit()
+        assert worker.run_next() is True
+        session.refresh(job)
+        assert job.attempts == 2
+        assert job.run_after >= before + timedelta(seconds=20)
+
+    @patch("pydantic_ai.agent.Agent.run_sync")
+    def test_run_next_gives_up(self, mock_agent_run_sync, session, job, caplog):
+        mock_agent_run_sync.side_effect = Exception("API Error")
+
+        assert JobWorker(max_attempts=1).run_next() is True
+
+        session.refresh(job)
+        assert (job.status, job.attempts, job.error) == ("failed", 1, "API Error")
+        assert job.finished_at is not None
+        assert f"Job {job.uuid} failed (attempt 1): API Error" in caplog.text
+
+    def test_run_runs_jobs_until_stopped(self):
+        worker = JobWorker(interval=0)
+        with patch.object(worker, "run_next") as run_next:
+
+            def side_effect():
+                if run_next.call_count == 3:
+                    worker.stop()
+                return run_next.call_count == 1  # one job, then an idle poll
+
+            run_next.side_effect = side_effect
+            worker.run()
+
+        assert run_next.call_count == 3
+
+    def test_run_logs_errors(self, caplog):
+        worker = JobWorker(interval=0)
+
+        def run_next():
+            worker.stop()
+            raise Exception("Database locked")
+
+        with patch.object(worker, "run_next", side_effect=run_next):
+            worker.run()
+
+        assert "Error running jobs: Database locked" in caplog.text
+
+    def test_wake(self):
+        worker = JobWorker()
+        worker.wake()
+        assert worker._wakeup.is_set()
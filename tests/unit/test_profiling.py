@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+from sqlalchemy import insert, select, text
+
+from reprise.db import Motif
+from reprise.profiling import QueryStats, record_queries
+from tests.factories import motif_factory
+
+
+class TestQueryStats:
+    def test_record_tallies_queries(self):
+        query_stats = QueryStats()
+        query_stats.record("SELECT 1", 1.5)
+        query_stats.record("SELECT 2", 2.5)
+        assert query_stats.count == 2
+        assert query_stats.total_milliseconds == 4
+        assert query_stats.slowest == []
+
+    @patch("reprise.settings.SLOW_QUERY_MS", 10)
+    def test_record_keeps_slowest_queries(self):
+        query_stats = QueryStats(max_slowest=2)
+        for milliseconds in [20, 5, 40, 30, 15]:
+            query_stats.record(f"SELECT {milliseconds}", milliseconds)
+
+        assert [query.statement for query in query_stats.slowest] == [
+            "SELECT 40",
+            "SELECT 30",
+        ]
+
+
+class TestRecordQueries:
+    def test_record_queries_counts_statements(self, session):
+        motif_factory(session=session).create_batch(3)
+        with record_queries() as query_stats:
+            session.execute(select(Motif)).all()
+            session.execute(select(Motif.uuid)).all()
+
+        assert query_stats.count == 2
+        assert query_stats.total_milliseconds > 0
+
+    def test_queries_not_recorded_outside_context(self, session):
+        with record_queries() as query_stats:
+            pass
+        session.execute(select(Motif)).all()
+        assert query_stats.count == 0
+
+    def test_nested_recordings_both_count(self, session):
+        with record_queries() as outer:
+            session.execute(select(Motif)).all()
+            with record_queries() as inner:
+                session.execute(select(Motif)).all()
+
+        assert outer.count == 2
+        assert inner.count == 1
+
+    @patch("reprise.settings.EXPLAIN_SLOW_QUERIES", True)
+    @patch("reprise.settings.SLOW_QUERY_MS", 0)
+    def test_slow_select_is_explained(self, session):
+        motif_uuid = motif_factory(session=session).create().uuid
+        with record_queries() as query_stats:
+            session.execute(select(Motif).where(Motif.uuid == motif_uuid)).all()
+
+        [slow_query] = query_stats.slowest
+        assert slow_query.statement.startswith("SELECT")
+        assert any("motif" in step for step in slow_query.query_plan)
+
+    @patch("reprise.settings.EXPLAIN_SLOW_QUERIES", True)
+    @patch("reprise.settings.SLOW_QUERY_MS", 0)
+    def test_slow_writes_are_not_explained(self, session):
+        with record_queries() as query_stats:
+            session.execute(insert(Motif), [{"content": "a"}, {"content": "b"}])
+            session.execute(text("UPDATE motif SET content = 'c'"))
+
+        assert len(query_stats.slowest) == 2
+        assert all(query.query_plan is None for query in query_stats.slowest)
+
+    @patch("reprise.settings.SLOW_QUERY_MS", 0)
+    def test_slow_select_not_explained_by_default(self, session):
+        with record_queries() as query_stats:
+            session.execute(select(Motif)).all()
+
+        [slow_query] = query_stats.slowest
+        assert slow_query.query_plan is None
@@ -0,0 +1,39 @@
+from unittest.mock import patch
+
+from reprise.queue import ReprisalQueueWorker
+from reprise.repository import ReprisalQueueRepository
+from tests.factories import motif_factory
+
+
+class TestReprisalQueueWorker:
+    def test_refill(self, session):
+        motif_factory(session=session).create_batch(10)
+
+        worker = ReprisalQueueWorker(depth=2)
+        assert worker.refill() == 2
+        assert ReprisalQueueRepository(session).get_queued_set_count() == 2
+
+    def test_run_refills_until_stopped(self):
+        worker = ReprisalQueueWorker(interval=0)
+        with patch.object(worker, "refill") as refill:
+            refill.side_effect = lambda: refill.call_count == 2 and worker.stop()
+            worker.run()
+
+        assert refill.call_count == 2
+
+    def test_run_logs_errors(self, caplog):
+        worker = ReprisalQueueWorker(interval=0)
+
+        def refill():
+            worker.stop()
+            raise Exception("Database locked")
+
+        with patch.object(worker, "refill", side_effect=refill):
+            worker.run()
+
+        assert "Error refilling reprisal queue: Database locked" in caplog.text
+
+    def test_wake(self):
+        worker = ReprisalQueueWorker()
+        worker.wake()
+        assert worker._wakeup.is_set()
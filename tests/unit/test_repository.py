@@ -1,19 +1,31 @@
 from datetime import datetime, timedelta
+from unittest.mock import patch
 from uuid import uuid4
 
 import pytest
 
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from reprise.db import Citation, Job, Reprisal, ReprisalQueueEntry, SessionLocal
+from reprise.profiling import record_queries
 from reprise.repository import (
     CitationRepository,
     ClozeDeletionRepository,
+    JobRepository,
     MotifRepository,
+    MotifScheduleRepository,
+    ReprisalQueueRepository,
     ReprisalRepository,
     ReprisalScheduleRepository,
+    citation_uuid_cache,
+    sampling_terms_cache,
 )
 from tests.factories import (
     citation_factory,
     cloze_deletion_factory,
     motif_factory,
+    motif_schedule_factory,
     reprisal_factory,
     reprisal_schedule_factory,
 )
@@ -56,6 +68,16 @@ class TestMotifRepository:
         repository.delete_motif(motif.uuid)
         assert repository.get_motif(motif.uuid) is None
 
+    def test_delete_motif_with_job(self, session, repository, motif):
+        job = JobRepository(session).add_job("cloze_deletions", motif.uuid)
+        repository.delete_motif(motif.uuid)
+        assert JobRepository(session).get_job(job.uuid) is None
+
+    def test_add_motif_with_citation_uuid(self, repository, session):
+        citation = citation_factory(session=session).create()
+        motif = repository.add_motif("Hello, World!", citation_uuid=citation.uuid)
+        assert motif.citation_uuid == citation.uuid
+
     def test_add_citation(self, repository, motif, session):
         citation = citation_factory(session=session).create()
         motif = repository.add_citation(motif.uuid, citation)
@@ -81,10 +103,194 @@ class TestMotifRepository:
         motifs_page_4 = repository.get_motifs_paginated(page=4, page_size=page_size)
         assert len(motifs_page_4) == 0
 
+    def test_get_motifs_after(self, session, repository):
+        created_at = datetime(2025, 1, 1)
+        motifs = motif_factory(session=session).create_batch(5, created_at=created_at)
+        motifs.append(motif_factory(session=session).create())
+        expected = sorted(
+            motifs, key=lambda motif: (motif.created_at, motif.uuid), reverse=True
+        )
+
+        page_1 = repository.get_motifs_after(None, page_size=4)
+        page_2 = repository.get_motifs_after(
+            (page_1[-1].created_at, page_1[-1].uuid), page_size=4
+        )
+        assert page_1 + page_2 == expected
+
+    def test_iter_motifs_in_batches(self, session, repository):
+        motifs = motif_factory(session=session).create_batch(5)
+        expected = sorted(motifs, key=lambda motif: (motif.created_at, motif.uuid))
+        assert list(repository.iter_motifs(batch_size=2)) == expected
+
+    def test_search_motifs(self, session, repository):
+        citation = citation_factory(session=session).create(title="Meditations")
+        stoic = repository.add_motif("The impediment to action advances action")
+        way = repository.add_motif("What stands in the way becomes the way", citation)
+        repository.add_motif("An unrelated motif")
+
+        [(motif, snippet)] = repository.search_motifs("advance", limit=10)
+        assert motif == stoic
+        assert snippet == "The impediment to action <mark>advances</mark> action"
+
+        # citation titles are searched too, and the last word is a prefix
+        assert [m for m, _ in repository.search_motifs("medit", 10)] == [way]
+        assert [m for m, _ in repository.search_motifs("the wa", 10)] == [way]
+
+        # operators are searched as plain words
+        assert repository.search_motifs("action OR way", 10) == []
+
+        # best match first
+        often = repository.add_motif("way after way after way")
+        assert [m for m, _ in repository.search_motifs("way", 10)] == [often, way]
+
+    def test_search_motifs_follows_edits(self, session, repository):
+        citation = citation_factory(session=session).create(title="Meditations")
+        motif = repository.add_motif("The obstacle is the way")
+        repository.add_motif("Another way")
+
+        repository.update_motif_content(motif.uuid, "Amor fati")
+        assert repository.search_motifs("obstacle", 10) == []
+        assert [m for m, _ in repository.search_motifs("fati", 10)] == [motif]
+
+        repository.add_citation(motif.uuid, citation)
+        citation.title = "Letters"
+        session.flush()
+        assert [m for m, _ in repository.search_motifs("letters", 10)] == [motif]
+
+        repository.delete_motif(motif.uuid)
+        assert repository.search_motifs("fati", 10) == []
+        assert len(repository.search_motifs("way", 10)) == 1
+
+    def test_search_motifs_follows_citation_renames(self, session, repository):
+        renamed = citation_factory(session=session).create(title="Meditations")
+        other = citation_factory(session=session).create(title="Enchiridion")
+        motifs = [repository.add_motif("A motif", renamed) for _ in range(2)]
+        repository.add_motif("A motif", other)
+
+        renamed.title = "Letters"
+        session.flush()
+        assert repository.search_motifs("meditations", 10) == []
+        assert {m for m, _ in repository.search_motifs("letters", 10)} == set(motifs)
+        assert len(repository.search_motifs("enchiridion", 10)) == 1
+
+    def test_search_motifs_ignores_syntax(self, repository):
+        repository.add_motif('A "quoted" motif')
+        assert repository.search_motifs("", 10) == []
+        assert len(repository.search_motifs('"quoted', 10)) == 1
+        assert repository.search_motifs("motif_uuid:x", 10) == []
+
     def test_get_motifs_count(self, session, repository):
         motif_factory(session=session).create_batch(10)
         assert repository.get_motifs_count() == 10
 
+    def test_get_least_reprised_motifs(self, session, repository):
+        motifs = motif_factory(session=session).create_batch(4)
+        for motif in motifs[:2]:
+            ReprisalRepository(session).add_reprisal(motif.uuid, str(uuid4()))
+
+        least_reprised = repository.get_least_reprised_motifs(limit=5)
+        assert least_reprised == [(motifs[2], 0), (motifs[3], 0)]
+
+    def test_get_least_reprised_motifs_exclude(self, session, repository):
+        motifs = motif_factory(session=session).create_batch(3)
+
+        least_reprised = repository.get_least_reprised_motifs(
+            limit=5, exclude=[motifs[1].uuid]
+        )
+        assert least_reprised == [(motifs[0], 0), (motifs[2], 0)]
+
+    def test_get_least_reprised_motifs_equal_counts(self, session, repository):
+        motifs = motif_factory(session=session).create_batch(4)
+
+        least_reprised = repository.get_least_reprised_motifs(limit=3)
+        assert least_reprised == [(motif, 0) for motif in motifs[:3]]
+
+    def test_get_sampling_weights(self, session, repository):
+        now = datetime(2025, 1, 11)
+        fresh = motif_factory(session=session).create(created_at=now)
+        stale = motif_factory(session=session).create(created_at=datetime(2025, 1, 1))
+        reprised = motif_factory(session=session).create(
+            created_at=datetime(2024, 1, 1),
+            reprisal_count=3,
+            last_reprised_at=datetime(2025, 1, 10),
+        )
+        cloze_deletion_factory(session=session).create_batch(2, motif=fresh)
+
+        rowids, weights = repository.get_sampling_weights(now, exclude=[stale.uuid])
+        motifs = repository.get_motifs_by_rowid(list(rowids))
+        assert dict(zip(motifs, weights, strict=True)) == {
+            fresh: pytest.approx(3.0),
+            stale: 0,
+            reprised: pytest.approx(0.5),
+        }
+
+        # motifs seen after now count as just seen
+        rowids, weights = repository.get_sampling_weights(datetime(2025, 1, 5))
+        motifs = repository.get_motifs_by_rowid(list(rowids))
+        assert dict(zip(motifs, weights, strict=True)) == {
+            fresh: pytest.approx(3.0),
+            stale: pytest.approx(5.0),
+            reprised: pytest.approx(0.25),
+        }
+
+    def test_get_sampling_weights_excludes_motifs_added_since(
+        self, session, repository
+    ):
+        motif_factory(session=session).create()
+        terms = repository.get_sampling_terms()
+        added = motif_factory(session=session).create()
+
+        with patch.object(repository, "get_sampling_terms", return_value=terms):
+            rowids, weights = repository.get_sampling_weights(
+                datetime.now(), exclude=[added.uuid]
+            )
+        assert len(rowids) == len(weights) == 1
+
+    def test_sampling_terms_cached_until_written(self, session, repository):
+        motif_factory(session=session).create()
+        terms = repository.get_sampling_terms()
+        assert repository.get_sampling_terms() is terms
+
+        # this session's own writes are seen before they're committed
+        motif = repository.add_motif("New motif")
+        assert len(repository.get_sampling_terms().rowids) == 2
+
+        session.commit()
+        assert len(repository.get_sampling_terms().rowids) == 2
+        ClozeDeletionRepository(session).add_cloze_deletion(motif.uuid, [[0, 1]])
+        session.commit()
+        assert max(repository.get_sampling_terms().factors) == 2
+
+    def test_sampling_terms_refreshed_by_reprisals(self, session, repository):
+        motifs = motif_factory(session=session).create_batch(3)
+        terms = repository.get_sampling_terms()
+
+        ReprisalRepository(session).add_reprisals(str(uuid4()), [(motifs[1], None)])
+        session.commit()
+        refreshed = repository.get_sampling_terms()
+        assert refreshed.rowids is terms.rowids  # only the reprised motif is read
+        assert list(refreshed.factors) == [1, 0.5, 1]
+        assert refreshed.seen_days[1] > terms.seen_days[1]
+        assert list(terms.factors) == [1, 1, 1]  # cached terms are copied
+
+        sampling_terms_cache.clear()
+        assert repository.get_sampling_terms() == refreshed
+
+        # a motif added since the terms' motif version is left to the next read
+        motif = motif_factory(session=session).create()
+        ReprisalRepository(session).add_reprisal(motif.uuid, str(uuid4()))
+        session.commit()
+        raced = repository._refresh_sampling_terms(refreshed, 0)
+        assert list(raced.factors) == [1, 0.5, 1]
+
+    def test_get_sampling_weights_empty(self, repository):
+        rowids, weights = repository.get_sampling_weights(datetime.now())
+        assert len(rowids) == len(weights) == 0
+
+    def test_get_motifs_by_rowid(self, session, repository):
+        motifs = motif_factory(session=session).create_batch(3)
+        assert repository.get_motifs_by_rowid([3, 1]) == [motifs[2], motifs[0]]
+
     def test_get_motifs_with_cloze_deletions(self, session, repository):
         motif_with_cd = motif_factory(session=session).create()
         cloze_deletion_factory(session=session).create(motif=motif_with_cd)
@@ -119,6 +325,70 @@ class TestCitationRepository:
     def test_get_citation_by_title(self, repository, citation):
         assert repository.get_citation_by_title(citation.title) == citation
 
+    def test_citation_titles_unique(self, repository, citation):
+        with pytest.raises(IntegrityError):
+            repository.add_citation(citation.title)
+
+    def test_get_or_create_citation_uuids(self, session, repository, citation):
+        titles = [citation.title, "New", "New"]
+        with record_queries() as query_stats:
+            citation_uuids, n_created = repository.get_or_create_citation_uuids(titles)
+        assert query_stats.count == 1  # the upsert returns existing titles too
+        assert n_created == 1
+        assert citation_uuids[citation.title] == citation.uuid
+        assert repository.get_citation_by_title("New").uuid == citation_uuids["New"]
+
+        # resolved titles are reused without a query
+        with record_queries() as query_stats:
+            assert (
+                repository.get_or_create_citation_uuid("New") == citation_uuids["New"]
+            )
+        assert query_stats.count == 0
+
+    def test_citation_uuid_cache(self, session, repository):
+        citation_uuid = repository.get_or_create_citation_uuid("Uncommitted")
+        session.rollback()
+        assert citation_uuid_cache == {}
+
+        citation_uuid = repository.get_or_create_citation_uuid("Committed")
+        session.commit()
+        assert citation_uuid_cache == {"Committed": citation_uuid}
+
+        other_session = SessionLocal()
+        with record_queries() as query_stats:
+            CitationRepository(other_session).get_or_create_citation_uuid("Committed")
+        assert query_stats.count == 0
+        other_session.close()
+
+    def test_citation_uuid_cache_cleared_by_edits(self, session, repository):
+        citation = repository.add_citation("Title")
+        repository.get_or_create_citation_uuid("Title")
+        session.commit()
+        assert citation_uuid_cache == {"Title": citation.uuid}
+
+        citation.title = "Renamed"
+        session.commit()
+        assert citation_uuid_cache == {}
+
+    def test_citation_uuid_cache_drops_titles_resolved_before_rename(
+        self, session, repository
+    ):
+        citation = repository.add_citation("Title")
+        session.commit()
+
+        repository.get_or_create_citation_uuid("Title")
+        citation.title = "Renamed"
+        session.flush()
+        assert repository.get_or_create_citation_uuid("Title") != citation.uuid
+        session.commit()
+        assert citation_uuid_cache == {}
+
+        repository.get_or_create_citation_uuid("Renamed")
+        session.commit()
+        session.query(Citation).filter_by(uuid=citation.uuid).delete()
+        session.commit()
+        assert citation_uuid_cache == {}
+
 
 class TestReprisalRepository:
     @pytest.fixture
@@ -135,6 +405,35 @@ class TestReprisalRepository:
         assert reprisal.set_uuid == set_uuid
         assert reprisal.motif == motif
 
+    def test_add_reprisal_updates_motif_counters(self, repository, session):
+        motif = motif_factory(session=session).create()
+        assert motif.reprisal_count == 0
+        assert motif.last_reprised_at is None
+
+        repository.add_reprisal(motif.uuid, str(uuid4()))
+        reprisal = repository.add_reprisal(motif.uuid, str(uuid4()))
+        assert motif.reprisal_count == 2
+        assert motif.last_reprised_at == reprisal.created_at
+
+    def test_add_reprisals(self, repository, session):
+        motifs = motif_factory(session=session).create_batch(2)
+        cloze_deletion = cloze_deletion_factory(session=session).create(motif=motifs[1])
+        set_uuid = str(uuid4())
+
+        results = repository.add_reprisals(
+            set_uuid, [(motifs[0], None), (motifs[1], cloze_deletion)]
+        )
+        assert [result.motif for result in results] == motifs
+        assert [result.cloze_deletion for result in results] == [None, cloze_deletion]
+
+        reprisals = session.query(Reprisal).filter_by(set_uuid=set_uuid).all()
+        assert {reprisal.uuid for reprisal in reprisals} == {r.uuid for r in results}
+        assert all(motif.reprisal_count == 1 for motif in motifs)
+        assert all(motif.last_reprised_at == results[0].created_at for motif in motifs)
+
+    def test_add_reprisals_empty(self, repository):
+        assert repository.add_reprisals(str(uuid4()), []) == []
+
     def test_reprise_with_cloze_deletion(self, repository, session):
         motif = motif_factory(session=session).create(content="the sky is blue")
         cloze_deletion = cloze_deletion_factory(session=session).create(
@@ -161,8 +460,20 @@ class TestClozeDeletionRepository:
         assert cloze_deletion.created_at is not None
         assert cloze_deletion.mask_tuples == [(11, 14)]
         assert cloze_deletion.motif == motif
+        session.refresh(motif, ["cloze_deletions"])
         assert motif.cloze_deletions == [cloze_deletion]
 
+    def test_get_cloze_deletions_by_motif(self, repository, session):
+        motif = motif_factory(session=session).create()
+        cloze_deletions = cloze_deletion_factory(session=session).create_batch(
+            2, motif=motif
+        )
+        cloze_deletion_factory(session=session).create()  # another motif
+
+        assert repository.get_cloze_deletions_by_motif([motif.uuid]) == {
+            motif.uuid: cloze_deletions
+        }
+
     def test_get_cloze_deletion(self, repository, session):
         motif = motif_factory(session=session).create(content="the sky is blue")
         cloze_deletion = repository.add_cloze_deletion(motif.uuid, [(11, 14)])
@@ -246,3 +557,277 @@ class TestReprisalScheduleRepository:
         with pytest.raises(ValueError) as exc_info:
             repository.add_reprisal_schedule(nonexistent_set_uuid, scheduled_for)
         assert str(exc_info.value) == f"Reprisal set {nonexistent_set_uuid} not found"
+
+
+class TestMotifScheduleRepository:
+    @pytest.fixture
+    def repository(self, session):
+        return MotifScheduleRepository(session)
+
+    def test_get_motif_schedules(self, repository, session):
+        motif_schedule = motif_schedule_factory(session=session).create()
+        motif_schedule_factory(session=session).create()
+
+        assert repository.get_motif_schedules([motif_schedule.motif_uuid]) == {
+            motif_schedule.motif_uuid: motif_schedule
+        }
+
+    def test_get_due_motifs(self, repository, session):
+        now = datetime.now()
+        motifs = motif_factory(session=session).create_batch(3)
+        deltas = (timedelta(days=1), timedelta(days=3), -timedelta(days=1))
+        for motif, delta in zip(motifs, deltas, strict=True):
+            motif_schedule_factory(session=session).create(
+                motif=motif, due_at=now - delta
+            )
+
+        due_motifs = repository.get_due_motifs(now, limit=5)
+        assert due_motifs == [motifs[1], motifs[0]]
+
+
+class TestReprisalQueueRepository:
+    @pytest.fixture
+    def repository(self, session):
+        return ReprisalQueueRepository(session)
+
+    @pytest.fixture
+    def selections(self, session):
+        motifs = motif_factory(session=session).create_batch(2)
+        cloze_deletion = cloze_deletion_factory(session=session).create(motif=motifs[1])
+        return [(motifs[0], None), (motifs[1], cloze_deletion)]
+
+    def test_add_queued_set(self, repository, selections):
+        repository.add_queued_set(selections)
+        repository.add_queued_set(selections[:1])
+
+        assert repository.get_queued_set_count() == 2
+        assert sorted(repository.get_queued_motif_uuids()) == sorted(
+            [selections[0][0].uuid, selections[1][0].uuid, selections[0][0].uuid]
+        )
+
+    def test_pop_queued_set(self, repository, selections, session):
+        repository.add_queued_set(selections)
+        newer_set_uuid = repository.add_queued_set(selections[1:])
+        session.query(ReprisalQueueEntry).filter_by(set_uuid=newer_set_uuid).update(
+            {ReprisalQueueEntry.created_at: datetime.now() + timedelta(minutes=1)}
+        )
+
+        assert repository.pop_queued_set() == selections
+        assert repository.pop_queued_set() == selections[1:]
+        assert repository.pop_queued_set() == []
+
+    def test_peek_queued_set(self, repository, selections):
+        assert repository.peek_queued_set() == []
+
+        repository.add_queued_set(selections)
+        assert repository.peek_queued_set() == selections
+        assert repository.get_queued_set_count() == 1
+
+    def test_invalidate(self, repository, selections):
+        repository.add_queued_set(selections)
+
+        repository.invalidate()
+        assert repository.get_queued_set_count() == 0
+
+    @pytest.mark.parametrize(
+        "change",
+        [
+            lambda session, motif: MotifRepository(session).add_motif("new"),
+            lambda session, motif: MotifRepository(session).delete_motif(motif.uuid),
+            lambda session, motif: ClozeDeletionRepository(session).add_cloze_deletion(
+                motif.uuid, [(0, 1)]
+            ),
+        ],
+    )
+    def test_motif_changes_invalidate(self, repository, session, change):
+        motif = motif_factory(session=session).create()
+        repository.add_queued_set([(motif, None)])
+
+        change(session, motif)
+        assert repository.get_queued_set_count() == 0
+
+    def test_cloze_deletion_delete_invalidates(self, repository, session):
+        motif = motif_factory(session=session).create()
+        cloze_deletion = cloze_deletion_factory(session=session).create(motif=motif)
+        repository.add_queued_set([(motif, cloze_deletion)])
+
+        ClozeDeletionRepository(session).delete_cloze_deletion(cloze_deletion.uuid)
+        assert repository.get_queued_set_count() == 0
+
+
+class TestJobRepository:
+    @pytest.fixture
+    def repository(self, session):
+        return JobRepository(session)
+
+    @pytest.fixture
+    def motif(self, session):
+        return motif_factory(session=session).create()
+
+    def test_add_job(self, repository, motif):
+        job = repository.add_job("cloze_deletions", motif.uuid)
+        assert repository.get_job(job.uuid) == job
+        assert (job.status, job.attempts) == ("pending", 0)
+
+    def test_claim_job(self, repository, motif):
+        first = repository.add_job("cloze_deletions", motif.uuid)
+        second = repository.add_job("cloze_deletions", motif.uuid)
+        now = datetime.now()
+        second.run_after = now + timedelta(seconds=90)
+
+        claimed = repository.claim_job(now, lease=60, max_attempts=3)
+        assert (claimed.uuid, claimed.attempts) == (first.uuid, 1)
+        assert claimed.lease_token is not None
+        # leased, and second not due
+        assert repository.claim_job(now, lease=60, max_attempts=3) is None
+
+        # a lease that runs out makes the job due again, under a new token
+        later = now + timedelta(minutes=2)
+        reclaimed = repository.claim_job(later, lease=60, max_attempts=3)
+        assert (reclaimed.uuid, reclaimed.attempts) == (first.uuid, 2)
+        assert reclaimed.lease_token != claimed.lease_token
+        assert repository.claim_job(later, lease=60, max_attempts=3).uuid == second.uuid
+
+    def test_claim_job_fails_expired_last_attempt(self, session, repository, motif):
+        first = repository.add_job("cloze_deletions", motif.uuid)
+        now = datetime.now()
+        repository.claim_job(now, lease=60, max_attempts=1)
+        second = repository.add_job("cloze_deletions", motif.uuid)
+        second.run_after = now + timedelta(seconds=90)
+
+        # the first job's lease has run out, but it has no attempts left
+        later = now + timedelta(minutes=2)
+        assert repository.claim_job(later, lease=60, max_attempts=1).uuid == second.uuid
+        session.refresh(first)
+        assert (first.status, first.attempts, first.finished_at) == ("failed", 1, later)
+        assert first.error == "Lease expired on attempt 1"
+
+    def test_claim_job_lost_race(self, session, repository, motif):
+        now = datetime.now()
+        job = repository.add_job("cloze_deletions", motif.uuid)
+        execute = session.execute
+
+        def claimed_by_another(statement, *args, **kwargs):
+            result = execute(statement, *args, **kwargs).freeze()
+            if statement.is_select:
+                execute(
+                    update(Job).where(Job.uuid == job.uuid).values(status="succeeded")
+                )
+            return result()
+
+        with patch.object(session, "execute", side_effect=claimed_by_another):
+            assert repository.claim_job(now, lease=60, max_attempts=3) is None
+
+    def test_complete_job(self, session, repository, motif):
+        job = repository.add_job("cloze_deletions", motif.uuid)
+        now = datetime.now()
+        claimed = repository.claim_job(now, lease=60, max_attempts=3)
+
+        assert repository.complete_job(job.uuid, "another token", now) is False
+        assert repository.complete_job(job.uuid, claimed.lease_token, now) is True
+        session.refresh(job)
+        assert (job.status, job.finished_at) == ("succeeded", now)
+        assert repository.claim_job(now, lease=60, max_attempts=3) is None
+
+    def test_fail_job(self, session, repository, motif):
+        job = repository.add_job("cloze_deletions", motif.uuid)
+        now = datetime.now()
+        retry_at = now + timedelta(seconds=10)
+        claimed = repository.claim_job(now, lease=60, max_attempts=3)
+
+        repository.fail_job(job.uuid, claimed.lease_token, "API Error", now, retry_at)
+        session.refresh(job)
+        assert (job.status, job.run_after, job.error) == (
+            "pending",
+            retry_at,
+            "API Error",
+        )
+
+        claimed = repository.claim_job(retry_at, lease=60, max_attempts=3)
+        repository.fail_job(job.uuid, claimed.lease_token, "API Error", now, None)
+        session.refresh(job)
+        assert (job.status, job.finished_at) == ("failed", now)
+
+    def test_fail_job_after_lease_lost(self, session, repository, motif):
+        job = repository.add_job("cloze_deletions", motif.uuid)
+        now = datetime.now()
+        claimed = repository.claim_job(now, lease=60, max_attempts=3)
+        later = now + timedelta(minutes=2)
+        repository.claim_job(later, lease=60, max_attempts=3)
+
+        repository.fail_job(job.uuid, claimed.lease_token, "API Error", later, None)
+        session.refresh(job)
+        assert (job.status, job.error) == ("running", None)
+
+
+class TestQueryPlans:
+    @pytest.fixture(autouse=True)
+    def explain_every_query(self):
+        with (
+            patch("reprise.settings.SLOW_QUERY_MS", 0),
+            patch("reprise.settings.EXPLAIN_SLOW_QUERIES", True),
+        ):
+            yield
+
+    def query_plan(self, query) -> list[str]:
+        with record_queries() as query_stats:
+            query()
+        return [step for slow in query_stats.slowest for step in slow.query_plan or []]
+
+    def assert_uses_index(self, query, index: str):
+        plan = self.query_plan(query)
+        assert any(index in step for step in plan), plan
+
+    def test_citation_title_lookup(self, session):
+        repository = CitationRepository(session)
+        self.assert_uses_index(
+            lambda: repository.get_citation_by_title("title"), "ix_citation_title"
+        )
+
+    def test_motif_pagination(self, session):
+        repository = MotifRepository(session)
+        self.assert_uses_index(
+            lambda: repository.get_motifs_after((datetime.now(), "uuid"), 10),
+            "ix_motif_created_at_uuid",
+        )
+
+    def test_motif_reprisals(self, session):
+        motif = motif_factory(session=session).create()
+        self.assert_uses_index(
+            lambda: session.refresh(motif, ["reprisals"]), "ix_reprisal_motif_uuid"
+        )
+
+    def test_motif_search(self, session):
+        repository = MotifRepository(session)
+        self.assert_uses_index(
+            lambda: repository.search_motifs("words", 10), "VIRTUAL TABLE INDEX"
+        )
+
+    def test_reprisal_set_lookup(self, session):
+        motif = motif_factory(session=session).create()
+        reprisal = ReprisalRepository(session).add_reprisal(motif.uuid, str(uuid4()))
+        repository = ReprisalScheduleRepository(session)
+        self.assert_uses_index(
+            lambda: repository.add_reprisal_schedule(reprisal.set_uuid, datetime.now()),
+            "ix_reprisal_set_uuid",
+        )
+
+    def test_cloze_deletions_by_motif(self, session):
+        repository = ClozeDeletionRepository(session)
+        self.assert_uses_index(
+            lambda: repository.get_cloze_deletions_by_motif(["uuid"]),
+            "ix_cloze_deletion_motif_uuid",
+        )
+
+    def test_due_job_lookup(self, session):
+        repository = JobRepository(session)
+        self.assert_uses_index(
+            lambda: repository.claim_job(datetime.now(), lease=60, max_attempts=3),
+            "ix_job_status_run_after",
+        )
+
+    def test_reprisal_schedules_by_date(self, session):
+        repository = ReprisalScheduleRepository(session)
+        self.assert_uses_index(
+            repository.get_reprisal_schedules, "ix_reprisal_schedule_scheduled_for"
+        )
@@ -0,0 +1,219 @@
+from collections import Counter
+from array import array
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from reprise.db import MotifSchedule
+from reprise.scheduler import (
+    BalancedScheduler,
+    LeitnerScheduler,
+    SM2Scheduler,
+    WeightedScheduler,
+    get_scheduler,
+)
+from tests.factories import (
+    cloze_deletion_factory,
+    motif_factory,
+    motif_schedule_factory,
+)
+
+
+class TestBalancedScheduler:
+    def test_select(self, session):
+        motifs = motif_factory(session=session).create_batch(3)
+
+        scheduler = BalancedScheduler(session)
+        assert scheduler.select(limit=2) == motifs[:2]
+
+    def test_record_is_noop(self, session):
+        motif = motif_factory(session=session).create()
+
+        BalancedScheduler(session).record([motif], reprised_at=datetime.now())
+        assert session.get(MotifSchedule, motif.uuid).interval_days == 0
+
+
+class TestLeitnerScheduler:
+    @pytest.fixture
+    def scheduler(self, session):
+        return LeitnerScheduler(session)
+
+    def test_select_due_oldest_first(self, scheduler, session):
+        now = datetime.now()
+        due = motif_schedule_factory(session=session).create(
+            due_at=now - timedelta(days=2)
+        )
+        motif_schedule_factory(session=session).create(due_at=now + timedelta(days=1))
+        # a new motif is due from when it's created
+        new = motif_factory(session=session).create(created_at=now - timedelta(days=1))
+
+        motifs = scheduler.select(limit=5, now=now)
+        assert [motif.uuid for motif in motifs] == [due.motif_uuid, new.uuid]
+
+    def test_select_limit(self, scheduler, session):
+        now = datetime.now()
+        due = motif_schedule_factory(session=session).create(
+            due_at=now - timedelta(days=2)
+        )
+        motif_factory(session=session).create(created_at=now - timedelta(days=1))
+
+        [motif] = scheduler.select(limit=1, now=now)
+        assert motif.uuid == due.motif_uuid
+
+    def test_record_promotes_box(self, scheduler, session):
+        motif = motif_factory(session=session).create()
+        reprised_at = datetime.now()
+
+        for box, interval in enumerate(LeitnerScheduler.box_intervals, start=1):
+            scheduler.record([motif], reprised_at=reprised_at)
+            assert session.get(MotifSchedule, motif.uuid).box == box
+            assert session.get(
+                MotifSchedule, motif.uuid
+            ).due_at == reprised_at + timedelta(days=interval)
+
+        # the last box is sticky
+        scheduler.record([motif], reprised_at=reprised_at)
+        assert session.get(MotifSchedule, motif.uuid).box == len(
+            LeitnerScheduler.box_intervals
+        )
+
+
+class TestSM2Scheduler:
+    def test_record_intervals(self, session):
+        motif = motif_factory(session=session).create()
+        scheduler = SM2Scheduler(session)
+        reprised_at = datetime.now()
+
+        intervals = []
+        for _ in range(3):
+            scheduler.record([motif], reprised_at=reprised_at)
+            intervals.append(session.get(MotifSchedule, motif.uuid).interval_days)
+
+        assert intervals == [1, 6, 15]
+        assert session.get(MotifSchedule, motif.uuid).repetitions == 3
+        assert session.get(MotifSchedule, motif.uuid).ease_factor == pytest.approx(2.5)
+        assert session.get(MotifSchedule, motif.uuid).due_at == reprised_at + timedelta(
+            days=15
+        )
+
+    def test_record_failed_recall(self, session):
+        motif = motif_factory(session=session).create()
+        motif_schedule = motif_schedule_factory(session=session).create(
+            motif=motif, repetitions=4, interval_days=30, ease_factor=2.5
+        )
+        reprised_at = datetime.now()
+
+        SM2Scheduler(session, quality=1).record([motif], reprised_at=reprised_at)
+        assert motif_schedule.repetitions == 0
+        assert motif_schedule.interval_days == 1
+        assert motif_schedule.ease_factor == pytest.approx(1.96)
+
+    def test_ease_factor_floor(self, session):
+        motif = motif_factory(session=session).create()
+        motif_schedule = motif_schedule_factory(session=session).create(
+            motif=motif, ease_factor=1.3
+        )
+
+        SM2Scheduler(session, quality=0).record([motif], reprised_at=datetime.now())
+        assert motif_schedule.ease_factor == 1.3
+
+
+class TestWeightedScheduler:
+    def test_select_is_reproducible(self, session):
+        motif_factory(session=session).create_batch(20)
+
+        selections = [WeightedScheduler(session, seed=7).select(5) for _ in range(2)]
+        assert selections[0] == selections[1]
+        assert len(set(selections[0])) == 5
+
+    def test_select_exclude(self, session):
+        motifs = motif_factory(session=session).create_batch(3)
+
+        selected = WeightedScheduler(session).select(5, exclude=[motifs[0].uuid])
+        assert sorted(selected, key=motifs.index) == motifs[1:]
+
+    def test_select_favours_heavier_motifs(self, session):
+        now = datetime.now()
+        stale = motif_factory(session=session).create(created_at=now - timedelta(1000))
+        motif_factory(session=session).create_batch(
+            5, created_at=now, reprisal_count=10, last_reprised_at=now
+        )
+
+        scheduler = WeightedScheduler(session, seed=0)
+        picks = [scheduler.select(1, now=now)[0] for _ in range(20)]
+        assert picks.count(stale) > 15
+
+    def test_sample_without_replacement(self):
+        scheduler = WeightedScheduler(session=None, seed=1)
+
+        # once the dominant weight is chosen, later draws skip past it
+        indices = scheduler.sample(array("d", [1e12, 1, 1]), k=3)
+        assert sorted(indices) == [0, 1, 2]
+
+    def test_sample_is_proportional_to_remaining_weight(self):
+        scheduler = WeightedScheduler(session=None, seed=0)
+
+        # after the first pick, the second is drawn from what's left
+        draws = [scheduler.sample(array("d", [1, 0, 2, 1]), k=2) for _ in range(4000)]
+        assert all(0 < len(set(draw)) == 2 and 1 not in draw for draw in draws)
+        firsts = Counter(draw[0] for draw in draws)
+        assert firsts[2] / len(draws) == pytest.approx(0.5, abs=0.05)
+        seconds = Counter(draw[1] for draw in draws if draw[0] == 2)
+        assert seconds[0] / firsts[2] == pytest.approx(0.5, abs=0.05)
+
+    @pytest.mark.parametrize(
+        "weights,k,expected_count",
+        [([1.0, 2.0], 5, 2), ([], 5, 0), ([0.0, 0.0], 1, 0)],
+    )
+    def test_sample_exhausts_weights(self, weights, k, expected_count):
+        scheduler = WeightedScheduler(session=None)
+        assert len(scheduler.sample(array("d", weights), k)) == expected_count
+
+    def test_seed_from_settings(self):
+        with patch("reprise.settings.REPRISE_SEED", 3):
+            draws = [WeightedScheduler(session=None).random.random() for _ in range(2)]
+        assert draws[0] == draws[1]
+
+    def test_choose_cloze_deletion_is_reproducible(self, session):
+        cloze_deletions = cloze_deletion_factory(session=session).create_batch(10)
+
+        choices = [
+            WeightedScheduler(session, seed=5).choose_cloze_deletion(cloze_deletions)
+            for _ in range(2)
+        ]
+        assert choices[0] == choices[1]
+
+    def test_record_is_noop(self, session):
+        motif = motif_factory(session=session).create()
+
+        WeightedScheduler(session).record([motif], reprised_at=datetime.now())
+        assert session.get(MotifSchedule, motif.uuid).interval_days == 0
+
+
+@pytest.mark.parametrize(
+    "name,scheduler_class",
+    [
+        ("balanced", BalancedScheduler),
+        ("leitner", LeitnerScheduler),
+        ("sm2", SM2Scheduler),
+        ("weighted", WeightedScheduler),
+    ],
+)
+def test_get_scheduler(session, name, scheduler_class):
+    assert isinstance(get_scheduler(name, session), scheduler_class)
+
+
+def test_get_scheduler_unknown(session):
+    with pytest.raises(ValueError) as exc_info:
+        get_scheduler("unknown", session)
+    assert str(exc_info.value) == "Unknown scheduler unknown"
+
+
+def test_motif_schedule_deleted_with_motif(session):
+    motif = motif_factory(session=session).create()
+    motif_schedule_factory(session=session).create(motif=motif)
+
+    session.delete(motif)
+    session.flush()
+    assert session.query(MotifSchedule).count() == 0
@@ -1,8 +1,11 @@
 from unittest.mock import patch
 
 import pytest
+from sqlalchemy import event
 
 from reprise.agent import MaskTuples
+from reprise.scheduler import BalancedScheduler, LeitnerScheduler
+from reprise.db import MotifSchedule, engine
 from reprise.service import Service
 from tests.factories import cloze_deletion_factory, motif_factory
 
@@ -22,6 +25,7 @@ class TestService:
         service = Service(session)
 
         service.reprise()
+        session.refresh(motifs[0], ["reprisals"])
         set_1_uuid = motifs[0].reprisals[0].set_uuid
         reprisals = service.reprise()
 
@@ -29,6 +33,115 @@ class TestService:
         set_2_uuid = reprisals[0].set_uuid
         assert set_2_uuid != set_1_uuid
 
+    def test_reprise_prefers_least_reprised_motifs(self, session):
+        motifs = motif_factory(session=session).create_batch(8)
+
+        service = Service(session)
+        first_set = service.reprise()
+        second_set = service.reprise()
+
+        assert [reprisal.motif for reprisal in first_set] == motifs[:5]
+        assert [reprisal.motif for reprisal in second_set] == motifs[5:]
+
+    def test_reprise_reprisal_count(self, session):
+        motif_factory(session=session).create_batch(10)
+
+        service = Service(session)
+        assert len(service.reprise(reprisal_count=8)) == 8
+
+    def test_reprise_round_trips(self, session):
+        motifs = motif_factory(session=session).create_batch(10)
+        for motif in motifs[::2]:
+            cloze_deletion_factory(session=session).create(motif=motif)
+        service = Service(session)
+
+        statements = []
+
+        def listener(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            service.reprise()
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        # check the queue, select motifs, select cloze deletions, insert set,
+        # update counters
+        assert len(statements) == 5
+
+    def test_fill_queue(self, session):
+        motifs = motif_factory(session=session).create_batch(12)
+
+        service = Service(session)
+        assert service.fill_queue(depth=3) == 3
+        assert service.fill_queue(depth=3) == 0
+
+        queued_motifs = [
+            [motif for motif, _ in service.reprisal_queue_repository.pop_queued_set()]
+            for _ in range(3)
+        ]
+        assert queued_motifs == [motifs[:5], motifs[5:10], motifs[10:]]
+
+    def test_fill_queue_without_motifs(self, session):
+        assert Service(session).fill_queue(depth=3) == 0
+
+    def test_reprise_serves_queued_set(self, session):
+        motifs = motif_factory(session=session).create_batch(10)
+
+        service = Service(session)
+        service.reprisal_queue_repository.add_queued_set([(motifs[7], None)])
+
+        reprisals = service.reprise()
+        assert [reprisal.motif for reprisal in reprisals] == [motifs[7]]
+        assert motifs[7].reprisal_count == 1
+        assert service.reprisal_queue_repository.get_queued_set_count() == 0
+
+    def test_preview(self, session):
+        motifs = motif_factory(session=session).create_batch(10)
+
+        service = Service(session)
+        assert [motif for motif, _ in service.preview()] == motifs[:5]
+        assert all(motif.reprisal_count == 0 for motif in motifs)
+
+    def test_preview_peeks_queue(self, session):
+        motifs = motif_factory(session=session).create_batch(10)
+
+        service = Service(session)
+        service.reprisal_queue_repository.add_queued_set([(motifs[7], None)])
+
+        assert service.preview() == [(motifs[7], None)]
+        assert service.reprisal_queue_repository.get_queued_set_count() == 1
+
+    def test_reprise_reprisal_count_skips_queue(self, session):
+        motifs = motif_factory(session=session).create_batch(10)
+
+        service = Service(session)
+        service.reprisal_queue_repository.add_queued_set([(motifs[7], None)])
+
+        assert len(service.reprise(reprisal_count=8)) == 8
+        assert service.reprisal_queue_repository.get_queued_set_count() == 1
+
+    def test_reprise_uses_configured_scheduler(self, session):
+        with patch("reprise.settings.REPRISE_SCHEDULER", "leitner"):
+            service = Service(session)
+        assert isinstance(service.scheduler, LeitnerScheduler)
+
+        assert isinstance(Service(session).scheduler, BalancedScheduler)
+
+    def test_reprise_records_schedule(self, session):
+        motifs = motif_factory(session=session).create_batch(2)
+
+        service = Service(session, scheduler=LeitnerScheduler(session))
+        service.reprise()
+
+        assert all(session.get(MotifSchedule, motif.uuid).box == 1 for motif in motifs)
+        assert service.reprise() == []  # nothing is due until tomorrow
+
+    def test_reprise_without_motifs(self, session):
+        service = Service(session)
+        assert service.reprise() == []
+
     def test_reprise_gets_cloze_deletions(self, session):
         motifs = motif_factory(session=session).create_batch(5)
         for motif in motifs:
@@ -47,6 +160,7 @@ class TestService:
 
         motif_content = "George Washington was the first president"
         motif = motif_factory(session=session).create(content=motif_content)
+        session.refresh(motif, ["cloze_deletions"])
         assert len(motif.cloze_deletions) == 0
 
         service = Service(session)
@@ -60,7 +174,7 @@ class TestService:
         assert cloze_deletions[1].motif_uuid == motif.uuid
 
         # Check that the motif now has both cloze deletions
-        session.refresh(motif)
+        session.refresh(motif, ["cloze_deletions"])
         assert len(motif.cloze_deletions) == 2
         # The order might not be guaranteed, so we'll check both possibilities
         mask_tuples_list = [cd.mask_tuples for cd in motif.cloze_deletions]
@@ -73,6 +187,7 @@ class TestService:
         mock_agent_run_sync.side_effect = Exception("API Error")
 
         motif = motif_factory(session=session).create()
+        session.refresh(motif, ["cloze_deletions"])
         assert len(motif.cloze_deletions) == 0
 
         service = Service(session)